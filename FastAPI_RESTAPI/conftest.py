@@ -0,0 +1,3 @@
+# load_test.py подходит под шаблон *_test.py: без исключения pytest импортирует его, а с ним и движки базы,
+# раньше, чем test_api.py успеет выбрать временную базу
+collect_ignore = ["load_test.py"]
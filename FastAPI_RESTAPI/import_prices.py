@@ -0,0 +1,93 @@
+"""
+Импорт товаров из прайс-листов в public.products.
+
+Импорт только добавляет новые товары: из прайс-листа в таблицу попадает
+лишь название, которое и служит ключом сопоставления, а остаток и
+доступность уже существующего товара ведут магазин и корзины, и импорт
+не должен их затирать. Обновлять у существующих товаров нечего, поэтому
+вместо ON CONFLICT DO UPDATE используется ON CONFLICT DO NOTHING, и
+повторный импорт ничего не меняет.
+
+Базам, созданным до появления уникального индекса по product_name,
+нужна миграция migrations/001_products_unique_name.sql.
+
+Запуск: python import_prices.py ПАПКА [--stock 0] [--batch-size 500] [--method auto|insert|copy]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "price_list_analyzer"))
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from streaming import iter_records
+from models.models import ProductDB
+from repository.repository import ProductsRepository
+
+PRODUCT_NAME_LENGTH = 100
+# SQLSTATE invalid_column_reference: у ON CONFLICT (product_name) нет уникального индекса
+MISSING_UNIQUE_INDEX = "42P10"
+MIGRATION = "migrations/001_products_unique_name.sql"
+
+
+class ImportStats:
+    def __init__(self):
+        self.offers = 0
+        self.errors = {}
+
+
+def to_products(file_path: str, stock: int, stats: ImportStats) -> Iterator[ProductDB]:
+    # Прайс-листы читаются построчно прямо в пачки вставки; повторы названий пропускает
+    # сама база, поэтому по названиям в памяти ничего не копится.
+    for name, *_ in iter_records(file_path, stats.errors):
+        name = name[:PRODUCT_NAME_LENGTH].strip()
+        if name:
+            stats.offers += 1
+            product = ProductDB()
+            product.product_name = name
+            product.product_cnt = stock
+            product.is_available = stock > 0
+            yield product
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import price lists into public.products. Only products with new names are inserted: "
+                    "a price list has no other column of public.products, and stock and availability of "
+                    "existing products belong to the shop, so existing rows are never updated and "
+                    "re-running an import changes nothing.",
+        epilog=f"Databases created before the unique index on product_name need {MIGRATION} first.")
+    parser.add_argument("path", nargs="?", default="", help="folder with price*.csv files")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per multi-row INSERT")
+    parser.add_argument("--method", choices=("auto", "insert", "copy"), default="auto",
+                        help="COPY is available on PostgreSQL with psycopg2 only")
+    parser.add_argument("--stock", type=int, default=0,
+                        help="stock of newly added products; stock of existing products is never changed")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = ImportStats()
+    use_copy = None if args.method == "auto" else args.method == "copy"
+    try:
+        added = ProductsRepository.import_products(to_products(args.path, args.stock, stats), args.batch_size,
+                                                   use_copy)
+    except (ValueError, SQLAlchemyError) as e:
+        print(f"Import failed: {e}")
+        if getattr(getattr(e, "orig", None), "pgcode", None) == MISSING_UNIQUE_INDEX:
+            print(f"public.products has no unique index on product_name; apply {MIGRATION} first")
+        return
+    seconds = time.perf_counter() - start
+
+    for report in stats.errors.values():
+        for line in report.lines():
+            print(line)
+    print(f"Imported {stats.offers} offers in {seconds:.2f}s "
+          f"({stats.offers / seconds if seconds else 0:,.0f} rows/s); {added} new products, "
+          f"existing products left unchanged")
+
+
+if __name__ == "__main__":
+    main()
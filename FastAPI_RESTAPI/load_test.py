@@ -0,0 +1,419 @@
+"""
+Нагрузочный тест: синхронный и асинхронный доступ к базе и атомарное оформление корзины.
+
+По умолчанию запросы идут к временной базе SQLite с искусственной задержкой
+каждого запроса, --database-url позволяет проверить настоящий PostgreSQL.
+При импорте модуля база берётся из DATABASE_URL, как и во всём приложении.
+
+Запуск: python load_test.py [--database-url URL] [--checkout] [--requests 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare throughput of the sync and async database paths")
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL; default is a temporary SQLite stand-in")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight")
+    parser.add_argument("--rows", type=int, default=1000, help="users and products seeded into the SQLite stand-in")
+    parser.add_argument("--db-latency", type=float, default=0.01,
+                        help="seconds added to every SQLite statement to emulate a networked database")
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--checkout", action="store_true",
+                        help="check concurrent cart checkouts for oversold stock instead of measuring lookups; "
+                             "exits with status 1 if the atomic checkout oversells")
+    parser.add_argument("--checkout-products", type=int, default=10, help="products all checkouts compete for")
+    parser.add_argument("--stock", type=int, default=100, help="starting stock of every checkout product")
+    return parser.parse_args(argv)
+
+
+def use_database(database_url: Optional[str], pool_size: int) -> Optional[tempfile.TemporaryDirectory]:
+    # Возвращает временную папку базы SQLite, если адрес базы не задан ни аргументом, ни DATABASE_URL
+    tmp_dir = None
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    elif "DATABASE_URL" not in os.environ:
+        tmp_dir = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir.name, 'load_test.db')}"
+    os.environ["DATABASE_ECHO"] = "0"
+    os.environ["DATABASE_POOL_SIZE"] = str(pool_size)
+    return tmp_dir
+
+
+# База выбирается до того, как модули приложения ниже создадут движки
+if __name__ == "__main__":
+    args = parse_args()
+    tmp_dir = use_database(args.database_url, args.pool_size)
+
+import httpx
+import uvicorn
+from fastapi import APIRouter, HTTPException
+from sqlalchemy import event, text
+
+from main import app
+from models.models import User, Product, ProductDB, CartDB, CartPayload
+from repository.base import engine, async_engine
+from repository.async_repository import AsyncUsersRepository, AsyncProductsRepository, AsyncCartRepository
+from repository.repository import UsersRepository, ProductsRepository
+from routes.routes import to_user, to_product
+
+SQLITE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS users (id integer primary key, login varchar(100), email varchar(100), age integer)",
+    """CREATE TABLE IF NOT EXISTS products (id integer primary key, product_name varchar(100) unique,
+                                            product_cnt integer, is_available boolean)""",
+    """CREATE TABLE IF NOT EXISTS carts (id integer primary key, user_id integer, product_id integer,
+                                         product_count integer)""",
+]
+
+# Маршруты в том виде, в каком они были до асинхронных репозиториев: блокирующие вызовы в async-обработчиках
+sync_router = APIRouter()
+
+
+@sync_router.get("/users/{user_id}", response_model=User)
+async def sync_get_user(user_id: int):
+    db_user = UsersRepository.get_user_by_id(user_id)
+    if not db_user:
+        raise HTTPException(status_code=404)
+    return to_user(db_user)
+
+
+@sync_router.get("/products/{product_id}", response_model=Product)
+async def sync_get_product(product_id: int):
+    db_product = ProductsRepository.get_product(product_id)
+    if not db_product:
+        raise HTTPException(status_code=404)
+    return to_product(db_product)
+
+
+app.include_router(sync_router, prefix="/sync")
+
+# Обновление корзины в том виде, в каком оно было до CartRepository.checkout: чтение и отдельные записи
+# по каждому товару, каждая в своей сессии, поэтому одновременные покупатели могут забрать один и тот же остаток
+legacy_router = APIRouter()
+
+
+@legacy_router.put("/carts/{user_id}", response_model=dict)
+async def legacy_update_cart(user_id: int, cart_items: List[CartPayload]):
+    if not await AsyncUsersRepository.get_user_by_id(user_id):
+        raise HTTPException(status_code=404)
+    for cart_item in cart_items:
+        product = await AsyncProductsRepository.get_product(cart_item.product_id)
+        if not product or not product.is_available or product.product_cnt < cart_item.product_count:
+            raise HTTPException(status_code=400)
+        await AsyncProductsRepository.update_product_count(cart_item.product_id,
+                                                           product.product_cnt - cart_item.product_count)
+        cart = CartDB()
+        cart.user_id = user_id
+        cart.product_id = cart_item.product_id
+        cart.product_count = cart_item.product_count
+        await AsyncCartRepository.create_cart(cart)
+    return {}
+
+
+app.include_router(legacy_router, prefix="/legacy")
+
+CHECKOUT_PRODUCT_PATTERN = "checkout product %"
+RESET_CHECKOUT_STOCK = text("""UPDATE public.products SET product_cnt=:stock, is_available=true
+                               WHERE product_name LIKE :pattern""")
+DELETE_CHECKOUT_CARTS = text("""DELETE FROM public.carts WHERE product_id IN
+                                (SELECT id FROM public.products WHERE product_name LIKE :pattern)""")
+SELECT_CHECKOUT_STOCK = text("""SELECT products.id, products.product_cnt, products.is_available,
+                                       COALESCE(SUM(carts.product_count), 0) AS sold
+                                FROM public.products AS products
+                                LEFT JOIN public.carts AS carts ON carts.product_id = products.id
+                                WHERE products.product_name LIKE :pattern
+                                GROUP BY products.id, products.product_cnt, products.is_available
+                                ORDER BY products.id""")
+
+
+def prepare_sqlite(rows: int):
+    with engine.begin() as connection:
+        for statement in SQLITE_SCHEMA:
+            connection.execute(text(statement))
+        if connection.execute(text("SELECT count(*) FROM users")).scalar() == 0:
+            connection.execute(text("INSERT INTO users (login, email, age) VALUES (:login, :email, :age)"),
+                               [{"login": f"user{i}", "email": f"user{i}@mail.com", "age": 20 + i % 50}
+                                for i in range(rows)])
+            connection.execute(text("""INSERT INTO products (product_name, product_cnt, is_available)
+                                       VALUES (:product_name, :product_cnt, true)"""),
+                               [{"product_name": f"product {i}", "product_cnt": 100} for i in range(rows)])
+
+
+def emulate_latency(latency: float):
+    # Задержка выполняется в потоке, выполняющем запрос: в потоке цикла событий для синхронного пути
+    # и в рабочем потоке aiosqlite для асинхронного, как и ожидание ответа по сети
+    def slow_statement(_):
+        time.sleep(latency)
+
+    @event.listens_for(engine, "connect")
+    def delay_sync(dbapi_connection, _):
+        dbapi_connection.set_trace_callback(slow_statement)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def delay_async(dbapi_connection, _):
+        dbapi_connection.run_async(lambda connection: connection.set_trace_callback(slow_statement))
+
+    engine.dispose()
+
+
+def wait_for_locks(timeout: float = 120):
+    # PostgreSQL ждёт блокировки строк сколько потребуется, а SQLite по умолчанию сдаётся через 5 с,
+    # которые очередь одновременных оформлений за единственной блокировкой записи легко превышает
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def busy_timeout(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+        finally:
+            cursor.close()
+
+
+def serve(port: int, db_latency: float):
+    if engine.dialect.name == "sqlite":
+        wait_for_locks()
+        if db_latency > 0:
+            emulate_latency(db_latency)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, db_latency: float) -> multiprocessing.Process:
+    # Отдельный процесс, чтобы генератор нагрузки не боролся с сервером за GIL
+    server = multiprocessing.Process(target=serve, args=(port, db_latency), daemon=True)
+    server.start()
+    while server.is_alive():
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+    raise SystemExit("server failed to start")
+
+
+async def run_scenario(base_url: str, paths: List[str], concurrency: int) -> Dict[str, float]:
+    latencies = []
+    errors = 0
+    queue = iter(paths)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            for path in queue:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": len(paths) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def run_repository_scenario(call, ids: List[int], concurrency: int) -> Dict[str, float]:
+    # Вызовы репозиториев без HTTP; синхронный вызов выполняется внутри сопрограммы, как в прежних маршрутах
+    latencies = []
+    queue = iter(ids)
+
+    async def worker():
+        for i in queue:
+            start = time.perf_counter()
+            result = call(i)
+            if asyncio.iscoroutine(result):
+                await result
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await async_engine.dispose()
+
+    latencies.sort()
+    return {
+        "rps": len(ids) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": 0,
+    }
+
+
+def reset_checkout_products(count: int, stock: int) -> List[int]:
+    products = []
+    for i in range(count):
+        product = ProductDB()
+        product.product_name = CHECKOUT_PRODUCT_PATTERN.replace("%", str(i))
+        product.product_cnt = stock
+        products.append(product)
+    ProductsRepository.import_products(products)
+    with engine.begin() as connection:
+        connection.execute(RESET_CHECKOUT_STOCK, {"pattern": CHECKOUT_PRODUCT_PATTERN, "stock": stock})
+        connection.execute(DELETE_CHECKOUT_CARTS, {"pattern": CHECKOUT_PRODUCT_PATTERN})
+        return [row.id for row in connection.execute(SELECT_CHECKOUT_STOCK, {"pattern": CHECKOUT_PRODUCT_PATTERN})]
+
+
+def check_stock(stock: int) -> Dict[str, int]:
+    # Каждая единица товара в корзине должна списаться с остатка ровно один раз, а доступность - следовать остатку
+    with engine.connect() as connection:
+        rows = connection.execute(SELECT_CHECKOUT_STOCK, {"pattern": CHECKOUT_PRODUCT_PATTERN}).all()
+    return {
+        "sold": sum(row.sold for row in rows),
+        "oversold": sum(max(row.sold - stock, 0) for row in rows),
+        "inconsistent": sum(row.sold + row.product_cnt != stock or bool(row.is_available) != (row.product_cnt > 0)
+                            for row in rows),
+    }
+
+
+async def run_checkout_scenario(base_url: str, requests: List[tuple], concurrency: int) -> Dict[str, float]:
+    latencies = []
+    errors = 0
+    accepted = 0
+    queue = iter(requests)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors, accepted
+            for path, basket in queue:
+                start = time.perf_counter()
+                try:
+                    response = await client.put(path, json=basket)
+                    if response.status_code == 200:
+                        accepted += sum(item["product_count"] for item in basket)
+                    elif response.status_code != 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": len(requests) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+        "accepted": accepted,
+    }
+
+
+def checkout_main(base_url: str, user_ids: List[int], args: argparse.Namespace) -> bool:
+    # Корзины из 1-3 товаров в сумме просят намного больше, чем есть на складе.
+    # Возвращает False, если атомарное оформление продало лишнее, потеряло корзину или рассогласовало
+    # остаток и доступность; прежнее обновление продаёт лишнее заведомо и служит только для сравнения.
+    passed = True
+    print(f"{args.checkout_products} products x {args.stock} in stock")
+    print(f"{'scenario':26} | {'req/s':>8} | {'p50, ms':>8} | {'p99, ms':>8} | {'errors':>6} | "
+          f"{'accepted':>8} | {'sold':>6} | {'oversold':>8} | {'inconsistent':>12}")
+    print("-" * 118)
+    for name, prefix in (("legacy", "/legacy"), ("atomic", "")):
+        product_ids = reset_checkout_products(args.checkout_products, args.stock)
+        requests = []
+        for _ in range(args.requests):
+            products = random.sample(product_ids, min(random.randint(1, 3), len(product_ids)))
+            basket = [{"product_id": product_id, "product_count": random.randint(1, 3)} for product_id in products]
+            requests.append((f"{prefix}/carts/{random.choice(user_ids)}", basket))
+
+        result = asyncio.run(run_checkout_scenario(base_url, requests, args.concurrency))
+        stock = check_stock(args.stock)
+        print(f"{'checkout ' + name:26} | {result['rps']:8.0f} | {result['p50']:8.1f} | {result['p99']:8.1f} | "
+              f"{result['errors']:6} | {result['accepted']:8} | {stock['sold']:6} | {stock['oversold']:8} | "
+              f"{stock['inconsistent']:12}")
+        if prefix == "" and (stock["oversold"] or stock["inconsistent"] or stock["sold"] != result["accepted"]):
+            passed = False
+    return passed
+
+
+def print_result(name: str, result: Dict[str, float]):
+    print(f"{name:26} | {result['rps']:8.0f} | {result['p50']:8.1f} | {result['p99']:8.1f} | {result['errors']:6}")
+
+
+def main(args: argparse.Namespace, tmp_dir: Optional[tempfile.TemporaryDirectory]):
+    if engine.dialect.name == "sqlite":
+        prepare_sqlite(args.rows)
+        ids = {"users": list(range(1, args.rows + 1)), "products": list(range(1, args.rows + 1))}
+    else:
+        ids = {"users": [user.id for user in UsersRepository.get_users()],
+               "products": [product.id for product in ProductsRepository.get_products()]}
+        if not ids["users"] or not ids["products"]:
+            raise SystemExit("public.users or public.products is empty; apply pg_init.sql first")
+
+    port = free_port()
+    server = start_server(port, args.db_latency)
+    base_url = f"http://127.0.0.1:{port}"
+
+    print(f"{engine.url.render_as_string()} | {args.requests} requests | concurrency {args.concurrency} | "
+          f"pool {args.pool_size} | db latency {args.db_latency * 1000:g} ms")
+    if args.checkout:
+        try:
+            passed = checkout_main(base_url, ids["users"], args)
+        finally:
+            server.terminate()
+            server.join()
+            if tmp_dir is not None:
+                tmp_dir.cleanup()
+        if not passed:
+            raise SystemExit("atomic checkout oversold or left stock inconsistent")
+        return
+
+    print(f"{'scenario':26} | {'req/s':>8} | {'p50, ms':>8} | {'p99, ms':>8} | {'errors':>6}")
+    print("-" * 68)
+    try:
+        for resource in ("users", "products"):
+            requests = [random.choice(ids[resource]) for _ in range(args.requests)]
+            for name, prefix in (("sync", "/sync"), ("async", "")):
+                paths = [f"{prefix}/{resource}/{i}" for i in requests]
+                print_result(f"http {name} {resource}", asyncio.run(run_scenario(base_url, paths, args.concurrency)))
+    finally:
+        server.terminate()
+        server.join()
+
+    # Те же запросы без HTTP, чтобы пути к базе сравнивались без затрат процессора на сервер
+    if engine.dialect.name == "sqlite" and args.db_latency > 0:
+        emulate_latency(args.db_latency)
+    calls = {
+        "users": (UsersRepository.get_user_by_id, AsyncUsersRepository.get_user_by_id),
+        "products": (ProductsRepository.get_product, AsyncProductsRepository.get_product),
+    }
+    try:
+        for resource, (sync_call, async_call) in calls.items():
+            requests = [random.choice(ids[resource]) for _ in range(args.requests)]
+            for name, call in (("sync", sync_call), ("async", async_call)):
+                print_result(f"repository {name} {resource}",
+                             asyncio.run(run_repository_scenario(call, requests, args.concurrency)))
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main(args, tmp_dir)
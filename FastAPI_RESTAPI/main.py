@@ -1,9 +1,19 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 import uvicorn
+from repository.base import dispose_async_engine
 from routes.routes import user_router, product_router, cart_router
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    yield
+    # При остановке закрываются соединения пула
+    await dispose_async_engine()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.include_router(user_router, prefix="/users")
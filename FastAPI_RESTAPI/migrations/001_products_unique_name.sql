@@ -0,0 +1,45 @@
+-- Уникальный индекс по product_name, на который опирается импорт прайс-листов
+-- (INSERT ... ON CONFLICT (product_name) в import_prices.py).
+-- Для баз, созданных pg_init.sql до появления индекса. Повторы названий
+-- сливаются в товар с наименьшим id: остатки складываются, товар доступен,
+-- если был доступен хотя бы один из повторов и остаток больше нуля, а позиции
+-- корзин переносятся на оставшийся товар. Повторный запуск ничего не меняет.
+--
+-- psql -d diploma -f migrations/001_products_unique_name.sql
+
+begin;
+
+-- Новые повторы не должны появиться, пока они сливаются
+lock table public.products, public.carts in share row exclusive mode;
+
+create temporary table product_duplicates on commit drop as
+select id, keep_id
+from (select id, min(id) over (partition by product_name) as keep_id
+      from public.products
+      where product_name is not null) as products
+where id <> keep_id;
+
+update public.products as products
+set product_cnt = merged.product_cnt,
+    is_available = merged.is_available
+from (select min(id) as keep_id,
+             sum(coalesce(product_cnt, 0)) as product_cnt,
+             bool_or(coalesce(is_available, false)) and sum(coalesce(product_cnt, 0)) > 0 as is_available
+      from public.products
+      where product_name is not null
+      group by product_name
+      having count(*) > 1) as merged
+where products.id = merged.keep_id;
+
+update public.carts as carts
+set product_id = duplicates.keep_id
+from product_duplicates as duplicates
+where carts.product_id = duplicates.id;
+
+delete from public.products as products
+using product_duplicates as duplicates
+where products.id = duplicates.id;
+
+create unique index if not exists products_product_name_key on public.products (product_name);
+
+commit;
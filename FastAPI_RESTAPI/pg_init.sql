@@ -12,6 +12,9 @@ create table public.products (
     is_available boolean
 );
 
+-- Для баз, созданных без этого индекса: migrations/001_products_unique_name.sql
+create unique index if not exists products_product_name_key on public.products (product_name);
+
 create table public.carts (
     id serial primary key,
     user_id integer,
@@ -0,0 +1,246 @@
+from typing import AsyncIterator, Dict, List, Optional
+
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+
+from models.models import UserDB, ProductDB, CartDB
+from repository.base import get_async_session
+from repository.repository import (
+    SELECT_ALL_USERS, SELECT_USER_BY_ID, SELECT_USERS_PAGE, SELECT_USERS_AFTER, INSERT_USER, UPDATE_USER,
+    DELETE_USER,
+    SELECT_ALL_PRODUCTS, SELECT_PRODUCT_BY_ID, SELECT_PRODUCTS_PAGE, SELECT_PRODUCTS_AFTER, INSERT_PRODUCT,
+    UPDATE_PRODUCT, UPDATE_PRODUCT_COUNT, UPDATE_PRODUCT_AVAILABILITY, DELETE_PRODUCT,
+    SELECT_CARTS_BY_USER_ID, INSERT_USER_CART, UPDATE_USER_CART, DELETE_CART,
+    CHECKOUT_ATTEMPTS, CheckoutConflict, is_transient_conflict, checkout_statement, checkout_parameters,
+    checkout_cart_rows,
+)
+
+# Строк, получаемых из серверного курсора за одно обращение при потоковой выдаче
+STREAM_BATCH_SIZE = 500
+
+
+# Те же запросы и возвращаемые значения, что и у синхронных репозиториев в repository.py; каждый вызов
+# берёт соединение из асинхронного пула, поэтому ожидание базы не блокирует цикл событий.
+
+
+def _user_from(row) -> UserDB:
+    user = UserDB()
+    user.id = row.id
+    user.login = row.login
+    user.email = row.email
+    user.age = row.age
+    return user
+
+
+def _product_from(row) -> ProductDB:
+    product = ProductDB()
+    product.id = row.id
+    product.product_name = row.product_name
+    product.product_cnt = row.product_cnt
+    product.is_available = row.is_available
+    return product
+
+
+def _cart_from(row) -> CartDB:
+    cart = CartDB()
+    cart.id = row.id
+    cart.user_id = row.user_id
+    cart.product_id = row.product_id
+    cart.product_name = row.product_name
+    cart.product_count = row.product_count
+    return cart
+
+
+async def _stream(statement, query_parameters: dict, batch_size: int) -> AsyncIterator[List[RowMapping]]:
+    # Строки приходят из серверного курсора пачками, поэтому память не растёт вместе с таблицей
+    async with get_async_session() as session:
+        result = await session.stream(statement, query_parameters)
+        async for batch in result.mappings().partitions(batch_size):
+            yield batch
+
+
+async def _execute(statement, query_parameters: dict) -> bool:
+    async with get_async_session() as session:
+        try:
+            await session.execute(statement, query_parameters)
+            await session.commit()
+        except SQLAlchemyError:
+            await session.rollback()
+            return False
+
+    return True
+
+
+class AsyncUsersRepository:
+    @staticmethod
+    async def get_users() -> List[UserDB]:
+        async with get_async_session() as session:
+            result_set = (await session.execute(SELECT_ALL_USERS)).all()
+
+        return [_user_from(result) for result in result_set]
+
+    @staticmethod
+    async def get_users_page(after_id: int, limit: int) -> List[UserDB]:
+        async with get_async_session() as session:
+            result_set = (await session.execute(SELECT_USERS_PAGE, {"after_id": after_id, "limit": limit})).all()
+
+        return [_user_from(result) for result in result_set]
+
+    @staticmethod
+    def stream_users(after_id: int = 0, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[List[RowMapping]]:
+        return _stream(SELECT_USERS_AFTER, {"after_id": after_id}, batch_size)
+
+    @staticmethod
+    async def get_user_by_id(user_id: int) -> Optional[UserDB]:
+        async with get_async_session() as session:
+            result = (await session.execute(SELECT_USER_BY_ID, {"id": user_id})).fetchone()
+
+        return None if result is None else _user_from(result)
+
+    @staticmethod
+    async def create_user(user: UserDB) -> bool:
+        query_parameters = {
+            "login": user.login,
+            "email": user.email,
+            "age": user.age
+        }
+        return await _execute(INSERT_USER, query_parameters)
+
+    @staticmethod
+    async def update_user(user_id: int, login: str, email: str, age: int) -> bool:
+        query_parameters = {
+            "id": user_id,
+            "login": login,
+            "email": email,
+            "age": age
+        }
+        return await _execute(UPDATE_USER, query_parameters)
+
+    @staticmethod
+    async def delete_user(user_id: int) -> bool:
+        return await _execute(DELETE_USER, {"id": user_id})
+
+
+class AsyncProductsRepository:
+    @staticmethod
+    async def get_products() -> List[ProductDB]:
+        async with get_async_session() as session:
+            result_set = (await session.execute(SELECT_ALL_PRODUCTS)).all()
+
+        return [_product_from(result) for result in result_set]
+
+    @staticmethod
+    async def get_products_page(after_id: int, limit: int) -> List[ProductDB]:
+        async with get_async_session() as session:
+            result_set = (await session.execute(SELECT_PRODUCTS_PAGE, {"after_id": after_id, "limit": limit})).all()
+
+        return [_product_from(result) for result in result_set]
+
+    @staticmethod
+    def stream_products(after_id: int = 0, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[List[RowMapping]]:
+        return _stream(SELECT_PRODUCTS_AFTER, {"after_id": after_id}, batch_size)
+
+    @staticmethod
+    async def get_product(product_id: int) -> Optional[ProductDB]:
+        async with get_async_session() as session:
+            result = (await session.execute(SELECT_PRODUCT_BY_ID, {"id": product_id})).fetchone()
+
+        return None if result is None else _product_from(result)
+
+    @staticmethod
+    async def create_product(product: ProductDB) -> bool:
+        query_parameters = {
+            "product_name": product.product_name,
+            "product_cnt": product.product_cnt,
+            "is_available": product.product_cnt != 0
+        }
+        return await _execute(INSERT_PRODUCT, query_parameters)
+
+    @staticmethod
+    async def update_product_count(product_id: int, count: int) -> bool:
+        query_parameters = {
+            "id": product_id,
+            "product_cnt": count,
+            "is_available": count > 0
+        }
+        return await _execute(UPDATE_PRODUCT_COUNT, query_parameters)
+
+    @staticmethod
+    async def update_product_availability(product_id: int, availability: bool) -> bool:
+        query_parameters = {
+            "id": product_id,
+            "is_available": availability
+        }
+        return await _execute(UPDATE_PRODUCT_AVAILABILITY, query_parameters)
+
+    @staticmethod
+    async def update_product(product_id: int, product_name: str, product_cnt: int, is_available: bool) -> bool:
+        query_parameters = {
+            "id": product_id,
+            "product_name": product_name,
+            "product_cnt": product_cnt,
+            "is_available": is_available
+        }
+        return await _execute(UPDATE_PRODUCT, query_parameters)
+
+    @staticmethod
+    async def delete_product(product_id: int) -> bool:
+        return await _execute(DELETE_PRODUCT, {"id": product_id})
+
+
+class AsyncCartRepository:
+    @staticmethod
+    async def get_cart_by_user_id(user_id: int) -> List[CartDB]:
+        async with get_async_session() as session:
+            result_set = (await session.execute(SELECT_CARTS_BY_USER_ID, {"user_id": user_id})).all()
+
+        return [_cart_from(result) for result in result_set]
+
+    @staticmethod
+    async def create_cart(cart: CartDB) -> bool:
+        query_parameters = {
+            "user_id": cart.user_id,
+            "product_id": cart.product_id,
+            "product_count": cart.product_count,
+        }
+        return await _execute(INSERT_USER_CART, query_parameters)
+
+    @staticmethod
+    async def update_cart(cart: CartDB) -> bool:
+        query_parameters = {
+            "id": cart.id,
+            "user_id": cart.user_id,
+            "product_id": cart.product_id,
+            "product_count": cart.product_count,
+        }
+        return await _execute(UPDATE_USER_CART, query_parameters)
+
+    @staticmethod
+    async def checkout(user_id: int, items: Dict[int, int]) -> bool:
+        # То же списание по принципу "всё или ничего" и те же повторы, что и в CartRepository.checkout
+        for _ in range(CHECKOUT_ATTEMPTS):
+            async with get_async_session() as session:
+                try:
+                    dialect_name = session.bind.dialect.name
+                    statement = checkout_statement(dialect_name, len(items))
+                    reserved = (await session.execute(statement, checkout_parameters(user_id, items))).all()
+                    if len(reserved) != len(items):
+                        await session.rollback()
+                        return False
+                    if dialect_name != "postgresql":
+                        await session.execute(INSERT_USER_CART, checkout_cart_rows(user_id, items))
+                    await session.commit()
+                    return True
+                except DBAPIError as e:
+                    await session.rollback()
+                    if not is_transient_conflict(e):
+                        raise
+                except SQLAlchemyError:
+                    await session.rollback()
+                    raise
+
+        raise CheckoutConflict(f"Checkout for user with ID {user_id} conflicted with concurrent checkouts")
+
+    @staticmethod
+    async def delete_cart(cart_id: int) -> bool:
+        return await _execute(DELETE_CART, {"id": cart_id})
@@ -1,7 +1,10 @@
-from typing import List
+import csv
+import io
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
 
-from sqlalchemy import text
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import TextClause, text
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
 
 from models.models import UserDB, ProductDB, CartDB
 from repository.base import get_session
@@ -9,6 +12,9 @@ from repository.base import get_session
 
 SELECT_ALL_USERS    = text("SELECT * FROM public.users")
 SELECT_USER_BY_ID   = text("SELECT * FROM public.users WHERE id=:id")
+SELECT_USERS_PAGE   = text("""SELECT id, login, email, age FROM public.users
+                              WHERE id > :after_id ORDER BY id LIMIT :limit""")
+SELECT_USERS_AFTER  = text("SELECT id, login, email, age FROM public.users WHERE id > :after_id ORDER BY id")
 INSERT_USER         = text("INSERT INTO public.users (login, email, age) VALUES (:login, :email, :age)")
 UPDATE_USER         = text("UPDATE public.users SET login=:login, email=:email, age=:age WHERE id=:id")
 DELETE_USER         = text("DELETE FROM public.users WHERE id=:id")
@@ -16,6 +22,10 @@ DELETE_USER         = text("DELETE FROM public.users WHERE id=:id")
 
 SELECT_ALL_PRODUCTS         = text("SELECT * FROM public.products")
 SELECT_PRODUCT_BY_ID        = text("SELECT * FROM public.products WHERE id=:id")
+SELECT_PRODUCTS_PAGE        = text("""SELECT id, product_name, product_cnt, is_available FROM public.products
+                                      WHERE id > :after_id ORDER BY id LIMIT :limit""")
+SELECT_PRODUCTS_AFTER       = text("""SELECT id, product_name, product_cnt, is_available FROM public.products
+                                      WHERE id > :after_id ORDER BY id""")
 INSERT_PRODUCT              = text("""INSERT INTO public.products (product_name, product_cnt, is_available)
                                       VALUES (:product_name, :product_cnt, :is_available)""")
 UPDATE_PRODUCT              = text("""UPDATE public.products 
@@ -27,6 +37,19 @@ UPDATE_PRODUCT_COUNT        = text("UPDATE public.products SET product_cnt=:prod
                                    " is_available=:is_available WHERE id=:id")
 UPDATE_PRODUCT_AVAILABILITY = text("UPDATE public.products SET is_available=:is_available WHERE id=:id")
 DELETE_PRODUCT              = text("DELETE FROM public.products WHERE id=:id")
+# Импорт только добавляет товары с новыми названиями: кроме названия, из прайс-листа обновлять нечего,
+# а остаток и доступность существующих товаров ведут магазин и корзины. ON CONFLICT требует уникального
+# индекса по product_name: он есть в pg_init.sql, существующим базам нужна migrations/001_products_unique_name.sql
+INSERT_NEW_PRODUCTS         = """INSERT INTO public.products (product_name, product_cnt, is_available)
+                                 VALUES {values}
+                                 ON CONFLICT (product_name) DO NOTHING"""
+CREATE_PRODUCTS_STAGING     = text("""CREATE TEMPORARY TABLE products_import
+                                      (product_name varchar(100), product_cnt integer, is_available boolean)
+                                      ON COMMIT DROP""")
+COPY_PRODUCTS_STAGING       = "COPY products_import (product_name, product_cnt, is_available) FROM STDIN WITH (FORMAT csv)"
+INSERT_NEW_PRODUCTS_FROM_STAGING = text("""INSERT INTO public.products (product_name, product_cnt, is_available)
+                                           SELECT product_name, product_cnt, is_available FROM products_import
+                                           ON CONFLICT (product_name) DO NOTHING""")
 
 
 SELECT_CARTS_BY_USER_ID     = text("""SELECT carts.id               AS id, 
@@ -43,6 +66,35 @@ UPDATE_USER_CART            = text("""UPDATE public.carts
                            SET user_id=:user_id, product_id=:product_id, product_count=:product_count 
                            WHERE id=:id""")
 DELETE_CART                 = text("DELETE FROM public.carts WHERE id=:id")
+# Остаток списывается, только если товар доступен и его хватает, и проверяется это тем же запросом, который
+# его уменьшает, поэтому одновременные оформления не заберут оба последние единицы. {items} - строка на товар.
+RESERVE_CART_PRODUCTS       = """UPDATE public.products AS products
+                                 SET product_cnt=products.product_cnt - items.product_count,
+                                     is_available=products.product_cnt - items.product_count > 0
+                                 FROM ({items}) AS items
+                                 WHERE products.id=items.product_id
+                                   AND products.is_available
+                                   AND products.product_cnt >= items.product_count
+                                   AND EXISTS (SELECT 1 FROM public.users WHERE id=CAST(:user_id AS integer))"""
+CART_ITEMS                  = """SELECT column1 AS product_id, column2 AS product_count
+                                 FROM (VALUES {values}) AS item_values"""
+# PostgreSQL блокирует строки в порядке, в котором их просматривает UPDATE, а не в порядке {values}, поэтому
+# строки товаров сначала блокируются по возрастанию id: одновременные оформления ждут друг друга, а не
+# взаимоблокируются
+LOCKED_CART_ITEMS           = """SELECT item_values.column1 AS product_id, item_values.column2 AS product_count
+                                 FROM (VALUES {values}) AS item_values
+                                 JOIN public.products AS locked ON locked.id=item_values.column1
+                                 ORDER BY locked.id
+                                 FOR UPDATE OF locked"""
+# PostgreSQL: списание и строки корзины одним запросом через изменяющий данные CTE
+CHECKOUT_CART               = """WITH reserved AS ({reserve}
+                                                   RETURNING products.id AS product_id, items.product_count)
+                                 INSERT INTO public.carts (user_id, product_id, product_count)
+                                 SELECT CAST(:user_id AS integer), product_id, product_count FROM reserved
+                                 RETURNING product_id"""
+# В SQLite нет изменяющих данные CTE: строки корзины вставляются после списания в той же транзакции
+RESERVE_CART_PRODUCTS_ONLY  = """{reserve}
+                                 RETURNING products.id AS product_id"""
 
 
 class UsersRepository:
@@ -273,6 +325,64 @@ class ProductsRepository:
         finally:
             session.close()
 
+    @staticmethod
+    def import_products(products: Iterable[ProductDB], batch_size: int = 500, use_copy: Optional[bool] = None) -> int:
+        # Товары сопоставляются по product_name; названия, которые уже есть в таблице, в том числе повторы
+        # внутри импорта, пропускаются, поэтому повторный импорт таблицу не меняет. products читается
+        # пачками, и весь импорт - одна транзакция. Возвращает количество новых товаров.
+        session = get_session()
+        try:
+            if use_copy is None:
+                # COPY во временную таблицу и один INSERT ... SELECT - самый быстрый путь на PostgreSQL
+                use_copy = session.get_bind().dialect.driver == "psycopg2"
+            elif use_copy and session.get_bind().dialect.driver != "psycopg2":
+                raise ValueError("COPY import requires PostgreSQL with the psycopg2 driver")
+
+            if use_copy:
+                count = ProductsRepository._copy_products(session, products, batch_size * 100)
+            else:
+                count = 0
+                statements = {}
+                for batch in _batches(products, batch_size):
+                    statement = statements.get(len(batch))
+                    if statement is None:
+                        values = ", ".join(f"(:product_name_{i}, :product_cnt_{i}, :is_available_{i})"
+                                           for i in range(len(batch)))
+                        statement = statements[len(batch)] = text(INSERT_NEW_PRODUCTS.format(values=values))
+
+                    query_parameters = {}
+                    for i, product in enumerate(batch):
+                        query_parameters[f"product_name_{i}"] = product.product_name
+                        query_parameters[f"product_cnt_{i}"] = product.product_cnt
+                        query_parameters[f"is_available_{i}"] = product.product_cnt != 0
+                    count += session.execute(statement, query_parameters).rowcount
+
+            session.commit()
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        return count
+
+    @staticmethod
+    def _copy_products(session, products: Iterable[ProductDB], chunk_size: int) -> int:
+        session.execute(CREATE_PRODUCTS_STAGING)
+        cursor = session.connection().connection.cursor()
+        try:
+            for chunk in _batches(products, chunk_size):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for product in chunk:
+                    writer.writerow((product.product_name, product.product_cnt, product.product_cnt != 0))
+                buffer.seek(0)
+                cursor.copy_expert(COPY_PRODUCTS_STAGING, buffer)
+        finally:
+            cursor.close()
+        return session.execute(INSERT_NEW_PRODUCTS_FROM_STAGING).rowcount
+
 
 class CartRepository:
     @staticmethod
@@ -338,6 +448,38 @@ class CartRepository:
 
         return True
 
+    @staticmethod
+    def checkout(user_id: int, items: Dict[int, int]) -> bool:
+        # items - количество каждого product_id для корзины. Либо одной транзакцией списываются все товары
+        # и вставляются все строки корзины, либо ничего не меняется и возвращается False.
+        # Транзакция, проигравшая взаимоблокировку или конфликт сериализации, повторяется; если проиграли
+        # все попытки, выбрасывается CheckoutConflict.
+        for _ in range(CHECKOUT_ATTEMPTS):
+            session = get_session()
+            try:
+                dialect_name = session.get_bind().dialect.name
+                statement = checkout_statement(dialect_name, len(items))
+                reserved = session.execute(statement, checkout_parameters(user_id, items)).all()
+                if len(reserved) != len(items):
+                    session.rollback()
+                    return False
+                if dialect_name != "postgresql":
+                    session.execute(INSERT_USER_CART, checkout_cart_rows(user_id, items))
+                session.commit()
+                return True
+
+            except DBAPIError as e:
+                session.rollback()
+                if not is_transient_conflict(e):
+                    raise
+            except SQLAlchemyError:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
+        raise CheckoutConflict(f"Checkout for user with ID {user_id} conflicted with concurrent checkouts")
+
     @staticmethod
     def delete_cart(cart_id: int) -> bool:
         session = get_session()
@@ -354,3 +496,56 @@ class CartRepository:
             session.close()
 
         return True
+
+
+# Попыток оформления, которое проигрывает взаимоблокировки или конфликты сериализации
+CHECKOUT_ATTEMPTS = 3
+# SQLSTATE serialization_failure и deadlock_detected: транзакция откачена, и её можно повторить
+TRANSIENT_CONFLICT_CODES = frozenset({"40001", "40P01"})
+
+
+class CheckoutConflict(Exception):
+    pass
+
+
+def is_transient_conflict(error: DBAPIError) -> bool:
+    # psycopg2 и asyncpg сообщают код в pgcode, psycopg - в sqlstate
+    code = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    return code in TRANSIENT_CONFLICT_CODES
+
+
+_checkout_statements = {}
+
+
+def checkout_statement(dialect_name: str, size: int) -> TextClause:
+    # Запросы кэшируются по диалекту и количеству товаров, как и пачки импорта
+    key = (dialect_name == "postgresql", size)
+    statement = _checkout_statements.get(key)
+    if statement is None:
+        values = ", ".join(f"(CAST(:product_id_{i} AS integer), CAST(:product_count_{i} AS integer))"
+                           for i in range(size))
+        items = (LOCKED_CART_ITEMS if key[0] else CART_ITEMS).format(values=values)
+        reserve = RESERVE_CART_PRODUCTS.format(items=items)
+        template = CHECKOUT_CART if key[0] else RESERVE_CART_PRODUCTS_ONLY
+        statement = _checkout_statements[key] = text(template.format(reserve=reserve))
+    return statement
+
+
+def checkout_parameters(user_id: int, items: Dict[int, int]) -> dict:
+    # Товары идут по возрастанию id, в порядке блокировки LOCKED_CART_ITEMS
+    query_parameters = {"user_id": user_id}
+    for i, (product_id, product_count) in enumerate(sorted(items.items())):
+        query_parameters[f"product_id_{i}"] = product_id
+        query_parameters[f"product_count_{i}"] = product_count
+    return query_parameters
+
+
+def checkout_cart_rows(user_id: int, items: Dict[int, int]) -> List[dict]:
+    return [{"user_id": user_id, "product_id": product_id, "product_count": product_count}
+            for product_id, product_count in sorted(items.items())]
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -1,12 +1,19 @@
-from typing import List
-from fastapi import APIRouter, Path, HTTPException, status
+import json
+from typing import AsyncIterator, Callable, List, Optional, Union
+from fastapi import APIRouter, Path, Query, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from models.models import User, Product, Cart, UserDB, ProductDB, CartDB, CartPayload
-from repository.repository import UsersRepository, CartRepository, ProductsRepository
+from repository.async_repository import AsyncUsersRepository, AsyncCartRepository, AsyncProductsRepository
+from repository.repository import CheckoutConflict
 
 user_router = APIRouter()
 product_router = APIRouter()
 cart_router = APIRouter()
 
+MAX_PAGE_SIZE = 1000
+# Значение, которое клиент передаёт в after_id, чтобы получить следующую страницу
+NEXT_PAGE_HEADER = "X-Next-After-Id"
+
 
 def to_user_db(user: User) -> UserDB:
     db_user = UserDB()
@@ -48,35 +55,75 @@ def to_cart(db_cart: CartDB) -> Cart:
     return Cart.parse_obj(db_cart.__dict__())
 
 
+def _set_next_page(response: Response, rows: list, limit: int):
+    # За полной страницей могут быть ещё строки; неполная страница - последняя
+    if len(rows) == limit:
+        response.headers[NEXT_PAGE_HEADER] = str(rows[-1].id)
+
+
+def _product_row(row) -> dict:
+    # SQLite возвращает логические значения числами
+    return {
+        "id": row["id"],
+        "product_name": row["product_name"],
+        "product_cnt": row["product_cnt"],
+        "is_available": bool(row["is_available"]),
+    }
+
+
+def _ndjson(batches: AsyncIterator[list], to_dict: Callable = dict) -> StreamingResponse:
+    async def lines():
+        async for batch in batches:
+            yield "".join(json.dumps(to_dict(row), ensure_ascii=False) + "\n" for row in batch)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _json_list(batches: AsyncIterator[list], to_dict: Callable = dict) -> StreamingResponse:
+    # Тот же JSON-массив, что и прежний ответ со всеми строками, но собранный по пачкам курсора
+    async def chunks():
+        separator = "["
+        async for batch in batches:
+            for row in batch:
+                yield separator + json.dumps(to_dict(row), ensure_ascii=False)
+                separator = ","
+        yield "[]" if separator == "[" else "]"
+
+    return StreamingResponse(chunks(), media_type="application/json")
+
+
 # Users routing
 
 @user_router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
 async def add_user(user: User):
     """Создание нового пользователя"""
-    existing_user = UsersRepository.get_user_by_id(user.id)
+    existing_user = await AsyncUsersRepository.get_user_by_id(user.id)
 
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"User with ID {user.id} already exists")
     db_user = to_user_db(user)
-    created_user = UsersRepository.create_user(db_user)
+    created_user = await AsyncUsersRepository.create_user(db_user)
     return created_user
 
 
 @user_router.get("/", response_model=List[User])
-async def retrieve_users():
-    """Возвращает список всех пользователей"""
-    db_users = UsersRepository.get_users()
-    users = []
-    for u in db_users:
-        user = User.parse_obj(u.__dict__())
-        users.append(user)
-    return users
+async def retrieve_users(response: Response, after_id: int = Query(0, ge=0),
+                         limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), stream: bool = False):
+    """Возвращает пользователей с id больше after_id: без limit - всех, с limit - страницу; stream=true - в NDJSON"""
+    if stream:
+        return _ndjson(AsyncUsersRepository.stream_users(after_id))
+    if limit is None:
+        return _json_list(AsyncUsersRepository.stream_users(after_id))
+
+    db_users = await AsyncUsersRepository.get_users_page(after_id, limit)
+    _set_next_page(response, db_users, limit)
+    return [u.__dict__() for u in db_users]
 
 
 @user_router.get("/{user_id}", response_model=User)
 async def get_single_user(user_id: int):
     """Возвращает информацию о пользователе по ID"""
-    db_user = UsersRepository.get_user_by_id(user_id)
+    db_user = await AsyncUsersRepository.get_user_by_id(user_id)
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID {user_id} does not exist")
     return to_user(db_user)
@@ -85,19 +132,19 @@ async def get_single_user(user_id: int):
 @user_router.put("/{user_id}", response_model=User)
 async def update_user(user_id: int, user: User):
     """Обновление информации о пользователе по ID"""
-    existing_user = UsersRepository.get_user_by_id(user_id)
+    existing_user = await AsyncUsersRepository.get_user_by_id(user_id)
 
     if not existing_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID {user_id} does not exist")
 
-    result = UsersRepository.update_user(user_id, user.login, user.email, user.age)
+    result = await AsyncUsersRepository.update_user(user_id, user.login, user.email, user.age)
     return result
 
 
 @user_router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_single_user(user_id: int):
     """Удаление пользователя по ID"""
-    result = UsersRepository.delete_user(user_id)
+    result = await AsyncUsersRepository.delete_user(user_id)
 
     if not result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID {user_id} does not exist")
@@ -109,24 +156,28 @@ async def delete_single_user(user_id: int):
 async def add_product(product: Product):
     """Создает новый продукт"""
     db_product = to_product_db(product)
-    result = ProductsRepository.create_product(db_product)
+    result = await AsyncProductsRepository.create_product(db_product)
     return result
 
 
 @product_router.get("/", response_model=List[Product])
-async def retrieve_products():
-    """Возвращает список всех продуктов"""
-    db_products = ProductsRepository.get_products()
-    products = []
-    for p in db_products:
-        products.append(to_product(p))
-    return products
+async def retrieve_products(response: Response, after_id: int = Query(0, ge=0),
+                            limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), stream: bool = False):
+    """Возвращает продукты с id больше after_id: без limit - все, с limit - страницу; stream=true - в NDJSON"""
+    if stream:
+        return _ndjson(AsyncProductsRepository.stream_products(after_id), _product_row)
+    if limit is None:
+        return _json_list(AsyncProductsRepository.stream_products(after_id), _product_row)
+
+    db_products = await AsyncProductsRepository.get_products_page(after_id, limit)
+    _set_next_page(response, db_products, limit)
+    return [p.__dict__() for p in db_products]
 
 
 @product_router.get("/{product_id}", response_model=Product)
 async def get_single_product(product_id: int):
     """Возвращает продукт по ID"""
-    db_product = ProductsRepository.get_product(product_id)
+    db_product = await AsyncProductsRepository.get_product(product_id)
 
     if not db_product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -138,21 +189,21 @@ async def get_single_product(product_id: int):
 @product_router.put("/{product_id}", response_model=Product)
 async def update_product(product_id: int, product_data: Product):
     """Обновляет данные существующего продукта"""
-    existing_product = ProductsRepository.get_product(product_id)
+    existing_product = await AsyncProductsRepository.get_product(product_id)
 
     if not existing_product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Product with ID {product_id} does not exist")
 
-    result = ProductsRepository.update_product(product_id, product_data.product_name, product_data.product_cnt,
-                                               product_data.is_available)
+    result = await AsyncProductsRepository.update_product(product_id, product_data.product_name,
+                                                          product_data.product_cnt, product_data.is_available)
     return result
 
 
 @product_router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_single_product(product_id: int):
     """Удаляет продукт по ID"""
-    result = ProductsRepository.delete_product(product_id)
+    result = await AsyncProductsRepository.delete_product(product_id)
 
     if not result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -162,19 +213,10 @@ async def delete_single_product(product_id: int):
 # Cart routing
 
 
-def _cart_from(user_id: int, product_id: int, product_count: int) -> CartDB:
-    """Это вспомогательная функция для создания объекта корзины"""
-    db_cart = CartDB()
-    db_cart.user_id = user_id
-    db_cart.product_id = product_id
-    db_cart.product_count = product_count
-    return db_cart
-
-
 @cart_router.get("/{user_id}", response_model=List[Cart])
 async def get_cart_by_user(user_id: int):
     """Получение всех товаров в корзине для данного пользователя"""
-    db_carts = CartRepository.get_cart_by_user_id(user_id)
+    db_carts = await AsyncCartRepository.get_cart_by_user_id(user_id)
 
     if len(db_carts) == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No carts found for user with ID {user_id}")
@@ -185,31 +227,31 @@ async def get_cart_by_user(user_id: int):
 
 
 @cart_router.put("/{user_id}", response_model=dict)
-async def update_cart(user_id: int, cart_item: CartPayload):
-    """Обновление корзины с добавлением товара"""
-    user = UsersRepository.get_user_by_id(user_id)
-
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID {user_id} does not exist")
-
-    # Получаем продукты из репозитория
-    product = ProductsRepository.get_product(cart_item.product_id)
-
-    if not product or not product.is_available:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product not available or does not exist")
-
-    # Проверяем доступное количество
-    if product.product_cnt < cart_item.product_count:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not enough product available")
-
-    # Обновляем количество товаров
-    ProductsRepository.update_product_count(cart_item.product_id, product.product_cnt - cart_item.product_count)
-
-    if product.product_cnt == 0:
-        ProductsRepository.update_product_availability(cart_item.product_id, False)
-
-    current_cart = _cart_from(user_id, cart_item.product_id, cart_item.product_count)
-    CartRepository.create_cart(current_cart)
+async def update_cart(user_id: int, cart_items: Union[CartPayload, List[CartPayload]]):
+    """Обновление корзины с добавлением одного или нескольких товаров"""
+    if isinstance(cart_items, CartPayload):
+        cart_items = [cart_items]
+    if not cart_items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No products to add to the cart")
+    if any(item.product_count <= 0 for item in cart_items):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product count must be positive")
+
+    # Повторяющиеся товары складываются в одну позицию
+    items = {}
+    for item in cart_items:
+        items[item.product_id] = items.get(item.product_id, 0) + item.product_count
+
+    # Списание остатков и добавление в корзину выполняются одной транзакцией: всё или ничего
+    try:
+        checked_out = await AsyncCartRepository.checkout(user_id, items)
+    except CheckoutConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if not checked_out:
+        if not await AsyncUsersRepository.get_user_by_id(user_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"User with ID {user_id} does not exist")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Product not available, does not exist or not enough product available")
 
     return {"message": f"Cart for user with ID {user_id} updated successfully"}
 
@@ -217,7 +259,7 @@ async def update_cart(user_id: int, cart_item: CartPayload):
 @cart_router.delete("/{cart_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_single_cart(cart_id: int):
     """Удаление товара из корзины"""
-    result = CartRepository.delete_cart(cart_id)
+    result = await AsyncCartRepository.delete_cart(cart_id)
 
     if not result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Cart with ID {cart_id} does not exist")
@@ -0,0 +1,186 @@
+"""
+Проверка постраничной выдачи и атомарного оформления корзины через HTTP.
+
+По умолчанию запросы идут к временной базе SQLite; если задан DATABASE_URL,
+проверяется эта база, например PostgreSQL с применённым pg_init.sql.
+
+Запуск: python -m unittest test_api
+"""
+import asyncio
+import os
+import random
+import tempfile
+import unittest
+
+# База выбирается до того, как модули приложения создадут движки
+tmp_dir = None
+if "DATABASE_URL" not in os.environ:
+    tmp_dir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir.name, 'test_api.db')}"
+os.environ["DATABASE_ECHO"] = "0"
+
+import httpx
+from sqlalchemy import text
+
+from load_test import prepare_sqlite, wait_for_locks, reset_checkout_products, check_stock
+from main import app
+from repository.base import engine, dispose_async_engine
+from repository.async_repository import STREAM_BATCH_SIZE
+from routes.routes import MAX_PAGE_SIZE, NEXT_PAGE_HEADER
+
+CHECKOUT_PRODUCTS = 5
+CHECKOUT_STOCK = 20
+
+
+def setUpModule():
+    if engine.dialect.name == "sqlite":
+        # Строк больше, чем в одной пачке курсора, чтобы ответ без limit собирался из нескольких пачек
+        prepare_sqlite(STREAM_BATCH_SIZE * 2 + 100)
+        wait_for_locks()
+
+
+def tearDownModule():
+    engine.dispose()
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+class ApiTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        # Соединения асинхронного пула привязаны к циклу событий теста
+        await dispose_async_engine()
+
+
+class PaginationTest(ApiTestCase):
+    async def read_pages(self, resource: str, limit: int) -> list:
+        rows = []
+        params = {"limit": limit}
+        while True:
+            response = await self.client.get(f"/{resource}/", params=params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page), limit)
+            rows.extend(page)
+            if NEXT_PAGE_HEADER not in response.headers:
+                return rows
+            self.assertEqual(len(page), limit)
+            params["after_id"] = response.headers[NEXT_PAGE_HEADER]
+
+    async def test_pages_match_full_list(self):
+        """Страницы по after_id в сумме дают тот же список, что и ответ без limit."""
+        for resource, table in (("users", "users"), ("products", "products")):
+            with self.subTest(resource=resource):
+                with engine.connect() as connection:
+                    count = connection.execute(text(f"SELECT count(*) FROM public.{table}")).scalar()
+
+                response = await self.client.get(f"/{resource}/")
+                self.assertEqual(response.status_code, 200)
+                full = response.json()
+                self.assertEqual(len(full), count)
+                ids = [row["id"] for row in full]
+                self.assertEqual(ids, sorted(set(ids)))
+
+                self.assertEqual(await self.read_pages(resource, 97), full)
+                self.assertEqual(await self.read_pages(resource, MAX_PAGE_SIZE), full)
+
+    async def test_after_id(self):
+        full = (await self.client.get("/products/")).json()
+        after_id = full[len(full) // 2]["id"]
+
+        response = await self.client.get("/products/", params={"after_id": after_id})
+        self.assertEqual(response.json(), full[len(full) // 2 + 1:])
+
+        response = await self.client.get("/products/", params={"after_id": after_id, "limit": 3})
+        self.assertEqual(response.json(), full[len(full) // 2 + 1:len(full) // 2 + 4])
+        self.assertEqual(response.headers[NEXT_PAGE_HEADER], str(full[len(full) // 2 + 3]["id"]))
+
+        response = await self.client.get("/products/", params={"after_id": full[-1]["id"]})
+        self.assertEqual(response.json(), [])
+
+    async def test_invalid_limit(self):
+        for limit in (0, MAX_PAGE_SIZE + 1):
+            with self.subTest(limit=limit):
+                response = await self.client.get("/users/", params={"limit": limit})
+                self.assertEqual(response.status_code, 422)
+
+
+class CheckoutTest(ApiTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.product_ids = reset_checkout_products(CHECKOUT_PRODUCTS, CHECKOUT_STOCK)
+        users = (await self.client.get("/users/", params={"limit": 50})).json()
+        self.user_ids = [user["id"] for user in users]
+
+    async def put_cart(self, user_id: int, basket: list) -> httpx.Response:
+        return await self.client.put(f"/carts/{user_id}", json=basket)
+
+    async def test_concurrent_checkouts(self):
+        """Одновременные корзины из нескольких товаров не продают лишнего и не рассогласуют остатки."""
+        rng = random.Random(1)
+        baskets = []
+        for _ in range(120):
+            products = rng.sample(self.product_ids, rng.randint(1, 3))
+            baskets.append((rng.choice(self.user_ids),
+                            [{"product_id": product_id, "product_count": rng.randint(1, 3)}
+                             for product_id in products]))
+
+        responses = await asyncio.gather(*(self.put_cart(user_id, basket) for user_id, basket in baskets))
+
+        self.assertTrue(all(response.status_code in (200, 400) for response in responses))
+        accepted = sum(item["product_count"] for response, (_, basket) in zip(responses, baskets)
+                       if response.status_code == 200 for item in basket)
+        stock = check_stock(CHECKOUT_STOCK)
+        self.assertEqual(stock["oversold"], 0)
+        self.assertEqual(stock["inconsistent"], 0)
+        self.assertEqual(stock["sold"], accepted)
+        self.assertGreater(accepted, 0)
+
+    async def test_all_or_nothing(self):
+        """Корзина, которой не хватает одного из товаров, не списывает и остальные."""
+        first, second = self.product_ids[:2]
+        basket = [{"product_id": first, "product_count": 1},
+                  {"product_id": second, "product_count": CHECKOUT_STOCK + 1}]
+
+        response = await self.put_cart(self.user_ids[0], basket)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(check_stock(CHECKOUT_STOCK)["sold"], 0)
+        self.assertEqual((await self.client.get(f"/products/{first}")).json()["product_cnt"], CHECKOUT_STOCK)
+
+    async def test_sell_out(self):
+        """Повторы товара складываются, а проданный целиком товар становится недоступным."""
+        product_id = self.product_ids[0]
+        basket = [{"product_id": product_id, "product_count": CHECKOUT_STOCK // 2},
+                  {"product_id": product_id, "product_count": CHECKOUT_STOCK - CHECKOUT_STOCK // 2}]
+
+        response = await self.put_cart(self.user_ids[0], basket)
+
+        self.assertEqual(response.status_code, 200)
+        product = (await self.client.get(f"/products/{product_id}")).json()
+        self.assertEqual((product["product_cnt"], product["is_available"]), (0, False))
+        response = await self.put_cart(self.user_ids[1], [{"product_id": product_id, "product_count": 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(check_stock(CHECKOUT_STOCK), {"sold": CHECKOUT_STOCK, "oversold": 0, "inconsistent": 0})
+
+    async def test_invalid_payloads(self):
+        product_id = self.product_ids[0]
+        cases = [
+            (self.user_ids[0], [], 400, "No products to add to the cart"),
+            (self.user_ids[0], [{"product_id": product_id, "product_count": 0}], 400,
+             "Product count must be positive"),
+            (0, [{"product_id": product_id, "product_count": 1}], 404, "User with ID 0 does not exist"),
+        ]
+        for user_id, basket, status_code, detail in cases:
+            with self.subTest(detail=detail):
+                response = await self.put_cart(user_id, basket)
+                self.assertEqual(response.status_code, status_code)
+                self.assertEqual(response.json()["detail"], detail)
+        self.assertEqual(check_stock(CHECKOUT_STOCK)["sold"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
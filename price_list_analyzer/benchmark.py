@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры времени и памяти основных операций PriceMachine на синтетических прайсах.
+
+Для каждого масштаба генерируются прайс-листы (generate_prices.py), после
+чего замеряются load_prices, search_products и export_to_html. Время
+берётся как лучшее из нескольких повторов без трассировки памяти, а пик
+памяти - отдельным прогоном под tracemalloc, чтобы трассировка не искажала
+время. Результаты сохраняются в JSON по коммиту git, что позволяет
+сравнивать коммиты между собой.
+
+Запуск:
+    python benchmark.py 10k 100k 1m        замерить и сохранить результаты
+    python benchmark.py --compare A B      сравнить сохранённые результаты коммитов
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from generate_prices import generate_prices, parse_scale
+from price_machine import PriceMachine
+
+# Файл с результатами замеров по коммитам
+RESULTS_FILENAME = 'benchmark_results.json'
+
+# Запросы поиска: подстрока, поле сортировки, количество результатов
+SEARCH_QUERIES = [
+    ('сыр', 'price_per_kg', None),
+    ('молоко', 'price', 20),
+    ('голландский', '-price_per_kg', 100),
+    ('ГОСТ', 'name', None),
+    ('чай', 'weight', 20),
+]
+
+# Результаты одного масштаба: операция -> показатели
+StageResults = Dict[str, Dict[str, float]]
+
+
+def current_commit() -> str:
+    """Возвращает короткий хеш текущего коммита с пометкой о незакоммиченных изменениях."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=directory,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no', '.'], cwd=directory,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if dirty else commit
+
+
+def measure_time(action: Callable[[], object], repeat: int) -> float:
+    """Возвращает лучшее время выполнения action из repeat попыток."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_memory(action: Callable[[], object]) -> float:
+    """Возвращает пик памяти, выделенной во время action, в мегабайтах."""
+    tracemalloc.start()
+    try:
+        action()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1 << 20)
+
+
+def measure(action: Callable[[], object], rows: int, repeat: int, memory: bool) -> Dict[str, float]:
+    """Замеряет одну операцию."""
+    seconds = measure_time(action, repeat)
+    result = {'seconds': seconds, 'rows_per_second': rows / seconds if seconds else 0.0}
+    if memory:
+        result['peak_mb'] = measure_memory(action)
+    return result
+
+
+def run_scale(directory: str, rows: int, repeat: int = 3, memory: bool = True, workers: int = 1) -> StageResults:
+    """
+    Замеряет операции на прайсах из directory.
+
+    Пик памяти при workers > 1 учитывает только основной процесс.
+    """
+    def load() -> PriceMachine:
+        pm = PriceMachine()
+        # Сообщения об ошибочных строках выводятся в никуда, чтобы не засорять отчёт
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            pm.load_prices(directory, workers=workers)
+        return pm
+
+    results = {'load_prices': measure(load, rows, repeat, memory)}
+
+    pm = load()
+    loaded = len(pm.products)
+
+    def search():
+        for term, sort_by, limit in SEARCH_QUERIES:
+            pm.search_products(term, sort_by, limit=limit)
+
+    results['search_products'] = measure(search, loaded, repeat, memory)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'output.html')
+        results['export_to_html'] = measure(lambda: pm.export_to_html(output, open_in_browser=False),
+                                            loaded, repeat, memory)
+
+    return results
+
+
+def load_results(path: str) -> Dict[str, dict]:
+    """Читает сохранённые результаты; отсутствующий файл - пустые результаты."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_results(path: str, commit: str, scales: Dict[str, StageResults]) -> None:
+    """Добавляет результаты коммита к сохранённым, заменяя прежние замеры тех же масштабов."""
+    results = load_results(path)
+    entry = results.setdefault(commit, {'scales': {}})
+    entry['date'] = datetime.now().isoformat(timespec='seconds')
+    entry['scales'].update(scales)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def print_results(scales: Dict[str, StageResults]) -> None:
+    """Выводит таблицу результатов замеров."""
+    print(f"{'Строк':>10} | {'Операция':16} | {'Время, с':>9} | {'Строк/с':>12} | {'Пик, МБ':>8}")
+    print("-" * 68)
+    for rows, stages in scales.items():
+        for stage, result in stages.items():
+            peak = f"{result['peak_mb']:8.1f}" if 'peak_mb' in result else f"{'-':>8}"
+            print(f"{rows:>10} | {stage:16} | {result['seconds']:9.3f} | "
+                  f"{result['rows_per_second']:12,.0f} | {peak}")
+
+
+def compare(results: Dict[str, dict], base: str, head: str) -> List[Tuple[str, str, str, float, float]]:
+    """
+    Сравнивает замеры двух коммитов по общим масштабам и операциям.
+
+    Returns:
+        Список (масштаб, операция, показатель, значение base, значение head).
+    """
+    for commit in (base, head):
+        if commit not in results:
+            raise ValueError(f"Нет сохранённых результатов для коммита {commit}")
+
+    rows = []
+    base_scales = results[base]['scales']
+    head_scales = results[head]['scales']
+    for scale in sorted(base_scales.keys() & head_scales.keys(), key=int):
+        for stage, base_result in base_scales[scale].items():
+            head_result = head_scales[scale].get(stage)
+            if head_result is None:
+                continue
+            for metric in ('seconds', 'peak_mb'):
+                if metric in base_result and metric in head_result:
+                    rows.append((scale, stage, metric, base_result[metric], head_result[metric]))
+    return rows
+
+
+def print_comparison(results: Dict[str, dict], base: str, head: Optional[str]) -> None:
+    """Выводит изменение показателей между коммитами base и head."""
+    if not results:
+        raise ValueError("Нет сохранённых результатов")
+    if head is None:
+        # По умолчанию base сравнивается с последним сохранённым коммитом
+        head = max(results, key=lambda commit: results[commit]['date'])
+
+    rows = compare(results, base, head)
+    print(f"{base} -> {head}")
+    print(f"{'Строк':>10} | {'Операция':16} | {'Показатель':10} | {base[:12]:>12} | {head[:12]:>12} | {'Изменение':>9}")
+    print("-" * 86)
+    for scale, stage, metric, before, after in rows:
+        change = f"{(after - before) / before:+9.1%}" if before else f"{'-':>9}"
+        print(f"{scale:>10} | {stage:16} | {metric:10} | {before:12.3f} | {after:12.3f} | {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности PriceMachine")
+    parser.add_argument('scales', nargs='*', type=parse_scale, default=[10_000, 100_000],
+                        help="количество строк: 10k, 1m, 10m или число")
+    parser.add_argument('--files', type=int, default=4, help="количество прайс-листов")
+    parser.add_argument('--repeat', type=int, default=3, help="количество повторов для замера времени")
+    parser.add_argument('--workers', type=int, default=1, help="процессов для load_prices")
+    parser.add_argument('--no-memory', action='store_true', help="не замерять пик памяти")
+    parser.add_argument('--data-dir', help="папка для сгенерированных прайсов; по умолчанию временная")
+    parser.add_argument('--results', default=RESULTS_FILENAME, help="файл с результатами замеров")
+    parser.add_argument('--compare', nargs='+', metavar='COMMIT',
+                        help="сравнить сохранённые результаты коммитов BASE [HEAD] и выйти")
+    args = parser.parse_args()
+
+    if args.compare:
+        if len(args.compare) > 2:
+            parser.error("--compare принимает один или два коммита")
+        results = load_results(args.results)
+        try:
+            print_comparison(results, args.compare[0], args.compare[1] if len(args.compare) > 1 else None)
+        except ValueError as e:
+            print(f"Ошибка: {e}")
+        return
+
+    commit = current_commit()
+    scales = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.scales:
+            directory = os.path.join(args.data_dir or tmp, f"rows_{rows}")
+            if not os.path.isdir(directory):
+                print(f"Генерация {rows} строк...")
+                generate_prices(directory, rows, args.files)
+            print(f"Замер {rows} строк...")
+            scales[str(rows)] = run_scale(directory, rows, args.repeat, not args.no_memory, args.workers)
+
+    print_results(scales)
+    save_results(args.results, commit, scales)
+    print(f"Результаты коммита {commit} сохранены в {args.results}")
+
+
+if __name__ == '__main__':
+    main()
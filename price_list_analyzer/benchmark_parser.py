@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Сравнение скорости разбора прайс-листа: прежний разбор через csv.DictReader
+и пакетный разбор PriceMachine._process_file.
+
+Запуск: python benchmark_parser.py [количество строк]
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+
+from price_machine import PriceMachine, ErrorReport
+
+
+def write_sample(path: str, rows: int) -> None:
+    """Записывает прайс-лист с десятичными запятыми и редкими ошибочными строками."""
+    random.seed(1)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['товар', 'цена', 'вес'])
+        for i in range(rows):
+            price = f"{random.uniform(10, 5000):.2f}".replace('.', ',')
+            weight = f"{random.uniform(0.05, 10):.3f}".replace('.', ',')
+            if i % 1000 == 999:
+                price = 'нет'
+            writer.writerow([f"Товар {i} в упаковке", price, weight])
+
+
+def parse_dictreader(path: str) -> int:
+    """Прежний способ разбора: словарь на каждую строку и разбор чисел поштучно."""
+    names, prices, weights, errors = [], array('d'), array('d'), []
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f, delimiter=',')
+        product_col, price_col, weight_col = PriceMachine._identify_columns(reader.fieldnames)
+        for row in reader:
+            try:
+                name = row[product_col].strip()
+                price = float(row[price_col].replace(',', '.'))
+                weight = float(row[weight_col].replace(',', '.'))
+            except (ValueError, KeyError) as e:
+                errors.append(f"Ошибка в строке: {row}. Ошибка: {e}")
+                continue
+            names.append(name)
+            prices.append(price)
+            weights.append(weight)
+    return len(names)
+
+
+def parse_fast(path: str) -> int:
+    """Пакетный разбор по номерам столбцов."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        names, _, _ = PriceMachine._process_file(csv.reader(f), os.path.basename(path), ErrorReport())
+    return len(names)
+
+
+def measure(parse, path: str, repeat: int = 3) -> float:
+    """Возвращает лучшее время разбора файла из repeat попыток."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'price_benchmark.csv')
+        write_sample(path, rows)
+
+        if parse_dictreader(path) != parse_fast(path):
+            raise RuntimeError("Способы разбора вернули разное количество строк")
+
+        baseline = measure(parse_dictreader, path)
+        fast = measure(parse_fast, path)
+
+    print(f"Строк в файле: {rows}")
+    print(f"{'Способ':12} | {'Время, с':>9} | {'Строк/с':>12}")
+    print("-" * 40)
+    print(f"{'DictReader':12} | {baseline:9.3f} | {rows / baseline:12,.0f}")
+    print(f"{'Пакетный':12} | {fast:9.3f} | {rows / fast:12,.0f}")
+    print(f"Ускорение: {baseline / fast:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
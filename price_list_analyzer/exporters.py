@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковые экспортёры отсортированных продуктов в машиночитаемые форматы.
+
+Все экспортёры принимают один и тот же поток записей PriceRecord - из
+загруженного PriceMachine или из внешней сортировки streaming.py - и
+пишут его по мере поступления, не собирая в памяти. Формат выбирается по
+расширению файла:
+
+    .csv    - CSV с заголовком, десятичная точка
+    .jsonl  - JSON Lines, один объект на строку
+    .pmcol  - сжатый колоночный файл, читается через iter_columnar
+    .html   - HTML-таблица
+"""
+import csv
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate, islice
+from typing import Callable, Dict, Generator, Iterable, List
+
+from html_export import WRITE_BUFFER_SIZE, write_record_table
+from product_store import PriceRecord
+
+# Названия полей записи в порядке PriceRecord
+FIELDS = ('name', 'price', 'weight', 'source_file', 'price_per_kg')
+
+COLUMNAR_MAGIC = b'PMCOL01\0'
+COLUMNAR_VERSION = 1
+# Количество строк в одной группе колоночного файла
+COLUMNAR_GROUP_ROWS = 65536
+COLUMNAR_COMPRESSION_LEVEL = 6
+# Количество строк, передаваемых csv.writer за один вызов
+_WRITE_BATCH_ROWS = 4096
+# Длина JSON-подвала
+_FOOTER_SIZE = struct.Struct('<Q')
+# Числа в колоночном файле хранятся в порядке little-endian на любой платформе
+_SWAP_BYTES = sys.byteorder != 'little'
+
+
+def write_csv(filename: str, records: Iterable[PriceRecord]) -> int:
+    """
+    Записывает записи в CSV с заголовком FIELDS.
+
+    Returns:
+        Количество записанных строк.
+    """
+    count = 0
+    records = iter(records)
+    with open(filename, 'w', encoding='utf-8', newline='', buffering=WRITE_BUFFER_SIZE) as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        # Пачки записываются одним вызовом writerows, без цикла на Python по каждой строке
+        while batch := list(islice(records, _WRITE_BATCH_ROWS)):
+            writer.writerows(batch)
+            count += len(batch)
+    return count
+
+
+def write_jsonl(filename: str, records: Iterable[PriceRecord]) -> int:
+    """
+    Записывает записи в JSON Lines: по объекту с полями FIELDS на строку.
+
+    Числа записываются через repr, что даёт кратчайшее точное представление,
+    а строки экранируются json.dumps, так что json.loads восстанавливает
+    записи без потерь. NaN и бесконечности, которые repr записал бы как
+    недопустимые в JSON nan и inf, записываются так же, как их пишет
+    json.dumps: NaN, Infinity и -Infinity.
+
+    Returns:
+        Количество записанных строк.
+    """
+    template = '{{"name": {}, "price": {!r}, "weight": {!r}, "source_file": {}, "price_per_kg": {!r}}}\n'.format
+    # Для строк с NaN и бесконечностями числа заранее переводятся в текст json.dumps
+    special_template = '{{"name": {}, "price": {}, "weight": {}, "source_file": {}, "price_per_kg": {}}}\n'.format
+    dumps = json.dumps
+    # Имена файлов повторяются, поэтому экранируются один раз
+    quoted_files: Dict[str, str] = {}
+    count = 0
+    with open(filename, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        write = f.write
+        for count, (name, price, weight, source_file, price_per_kg) in enumerate(records, 1):
+            quoted_file = quoted_files.get(source_file)
+            if quoted_file is None:
+                quoted_file = quoted_files[source_file] = dumps(source_file, ensure_ascii=False)
+            # x - x равно 0.0 для конечных чисел и NaN для NaN и бесконечностей
+            if price - price or weight - weight or price_per_kg - price_per_kg:
+                write(special_template(dumps(name, ensure_ascii=False), dumps(price), dumps(weight), quoted_file,
+                                       dumps(price_per_kg)))
+            else:
+                write(template(dumps(name, ensure_ascii=False), price, weight, quoted_file, price_per_kg))
+    return count
+
+
+def write_columnar(filename: str, records: Iterable[PriceRecord], group_rows: int = COLUMNAR_GROUP_ROWS) -> int:
+    """
+    Записывает записи в сжатый колоночный файл.
+
+    Записи делятся на группы по group_rows строк. В группе каждый столбец
+    хранится отдельным блоком, сжатым zlib: названия - общей строкой UTF-8
+    и массивом длин, числа - массивами double, файлы-источники - номерами
+    в словаре файлов. В конце файла лежит JSON-подвал со смещениями блоков,
+    его длина и сигнатура, поэтому файл пишется за один проход, а в памяти
+    держится только одна группа.
+
+    Returns:
+        Количество записанных строк.
+    """
+    if group_rows <= 0:
+        raise ValueError("Размер группы должен быть положительным")
+
+    source_files: Dict[str, int] = {}
+    groups: List[dict] = []
+    count = 0
+
+    tmp_path = f"{filename}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(COLUMNAR_MAGIC)
+            group: List[PriceRecord] = []
+            for record in records:
+                group.append(record)
+                if len(group) == group_rows:
+                    groups.append(_write_group(f, group, source_files))
+                    count += len(group)
+                    group = []
+            if group:
+                groups.append(_write_group(f, group, source_files))
+                count += len(group)
+
+            footer = json.dumps({
+                'version': COLUMNAR_VERSION,
+                'rows': count,
+                'fields': FIELDS,
+                'source_files': list(source_files),
+                'groups': groups,
+            }, ensure_ascii=False).encode('utf-8')
+            f.write(footer)
+            f.write(_FOOTER_SIZE.pack(len(footer)))
+            f.write(COLUMNAR_MAGIC)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return count
+
+
+def _write_group(f, group: List[PriceRecord], source_files: Dict[str, int]) -> dict:
+    """Записывает одну группу строк и возвращает её описание для подвала."""
+    names, prices, weights, files, price_per_kg = zip(*group)
+    file_ids = array('I', [source_files.setdefault(name, len(source_files)) for name in files])
+
+    columns = {
+        'name': ''.join(names).encode('utf-8'),
+        'name_length': _little_endian(array('I', map(len, names))),
+        'price': _little_endian(array('d', prices)),
+        'weight': _little_endian(array('d', weights)),
+        'source_file': _little_endian(file_ids),
+        'price_per_kg': _little_endian(array('d', price_per_kg)),
+    }
+
+    description = {'rows': len(group), 'columns': {}}
+    for field, raw in columns.items():
+        data = zlib.compress(raw, COLUMNAR_COMPRESSION_LEVEL)
+        description['columns'][field] = [f.tell(), len(data)]
+        f.write(data)
+    return description
+
+
+def _little_endian(column: array) -> bytes:
+    """Возвращает байты массива в порядке little-endian независимо от платформы."""
+    if _SWAP_BYTES:
+        column.byteswap()
+    return column.tobytes()
+
+
+def iter_columnar(filename: str) -> Generator[PriceRecord, None, None]:
+    """
+    Построчно читает колоночный файл, записанный write_columnar.
+
+    В памяти одновременно находится только одна группа строк.
+
+    Raises:
+        ValueError: Если файл повреждён или записан в несовместимом формате.
+    """
+    with open(filename, 'rb') as f:
+        footer = _read_footer(f)
+        source_files = footer['source_files']
+
+        for group in footer['groups']:
+            def column(field: str) -> bytes:
+                offset, size = group['columns'][field]
+                f.seek(offset)
+                return zlib.decompress(f.read(size))
+
+            def numbers(field: str, typecode: str) -> array:
+                values = array(typecode)
+                values.frombytes(column(field))
+                if _SWAP_BYTES:
+                    values.byteswap()
+                return values
+
+            names_blob = column('name').decode('utf-8')
+            offsets = list(accumulate(numbers('name_length', 'I'), initial=0))
+            names = [names_blob[start:end] for start, end in zip(offsets, offsets[1:])]
+            prices = numbers('price', 'd')
+            weights = numbers('weight', 'd')
+            files = [source_files[i] for i in numbers('source_file', 'I')]
+            price_per_kg = numbers('price_per_kg', 'd')
+
+            if not len(names) == len(prices) == len(weights) == len(files) == len(price_per_kg) == group['rows'] \
+                    or offsets[-1] != len(names_blob):
+                raise ValueError(f"Повреждённая группа строк в {filename}")
+            yield from zip(names, prices, weights, files, price_per_kg)
+
+
+def _read_footer(f) -> dict:
+    """Читает и проверяет подвал колоночного файла."""
+    tail = len(COLUMNAR_MAGIC) + _FOOTER_SIZE.size
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    if size < len(COLUMNAR_MAGIC) + tail or f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Файл не является колоночным экспортом")
+
+    f.seek(size - tail)
+    footer_size, = _FOOTER_SIZE.unpack(f.read(_FOOTER_SIZE.size))
+    if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC or footer_size > size - len(COLUMNAR_MAGIC) - tail:
+        raise ValueError("Повреждённый подвал колоночного файла")
+
+    f.seek(size - tail - footer_size)
+    footer = json.loads(f.read(footer_size).decode('utf-8'))
+    if footer.get('version') != COLUMNAR_VERSION:
+        raise ValueError(f"Неподдерживаемая версия колоночного файла: {footer.get('version')}")
+    return footer
+
+
+# Расширение файла -> экспортёр
+EXPORTERS: Dict[str, Callable[[str, Iterable[PriceRecord]], int]] = {
+    '.csv': write_csv,
+    '.jsonl': write_jsonl,
+    '.pmcol': write_columnar,
+    '.html': write_record_table,
+}
+
+
+def exporter_for(filename: str) -> Callable[[str, Iterable[PriceRecord]], int]:
+    """
+    Возвращает экспортёр для расширения filename.
+
+    Raises:
+        ValueError: Если расширение не поддерживается.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    exporter = EXPORTERS.get(extension)
+    if exporter is None:
+        raise ValueError(f"Неподдерживаемый формат экспорта: {extension or filename}. "
+                         f"Доступны: {', '.join(EXPORTERS)}")
+    return exporter
+
+
+def export_records(filename: str, records: Iterable[PriceRecord]) -> int:
+    """
+    Записывает поток записей в формате, соответствующем расширению filename.
+
+    Returns:
+        Количество записанных строк.
+    """
+    return exporter_for(filename)(filename, records)
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Генератор синтетических прайс-листов для проверки производительности.
+
+Файлы price_NNN.csv похожи на настоящие: заголовки берутся из допустимых
+названий столбцов PriceMachine в разном регистре и порядке, рядом лежат
+лишние столбцы, цены и веса записываются то с точкой, то с десятичной
+запятой, а небольшая доля строк содержит ошибки.
+
+Запуск: python generate_prices.py 1m [папка] [--files N] [--bad-rate 0.001] [--seed 1]
+"""
+import argparse
+import csv
+import os
+import random
+from typing import Iterator, List, Tuple
+
+from price_machine import PriceMachine
+
+# Сокращённые обозначения масштабов
+SCALE_SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+# Доля ошибочных строк по умолчанию
+DEFAULT_BAD_RATE = 0.001
+
+# Категории товаров: название, типичная цена за кг и возможные фасовки в кг
+_CATEGORIES = [
+    ('Сыр', 900, (0.2, 0.25, 0.4, 0.5, 1.0)),
+    ('Молоко', 90, (0.9, 0.93, 1.0, 1.4)),
+    ('Масло сливочное', 1100, (0.18, 0.2, 0.4)),
+    ('Творог', 450, (0.18, 0.2, 0.35, 0.5)),
+    ('Кефир', 110, (0.45, 0.9, 1.0)),
+    ('Колбаса', 750, (0.3, 0.4, 0.5, 1.0)),
+    ('Крупа гречневая', 120, (0.8, 0.9, 1.0, 5.0)),
+    ('Рис', 140, (0.8, 0.9, 1.0, 5.0)),
+    ('Макароны', 160, (0.4, 0.45, 0.5, 1.0)),
+    ('Сахар', 85, (0.9, 1.0, 5.0)),
+    ('Чай чёрный', 2000, (0.05, 0.1, 0.25)),
+    ('Кофе молотый', 2400, (0.1, 0.25, 1.0)),
+    ('Мука пшеничная', 65, (1.0, 2.0, 5.0)),
+    ('Печенье', 380, (0.12, 0.2, 0.3)),
+    ('Шоколад', 1300, (0.08, 0.09, 0.1, 0.2)),
+]
+_VARIETIES = ['Российский', 'Голландский', 'классический', 'домашний', 'отборный', 'высший сорт',
+              'фермерский', 'натуральный', 'ГОСТ', 'с орехами', 'обезжиренный', 'Премиум']
+_BRANDS = ['Простоквашино', 'Весёлый молочник', 'Мираторг', 'Макфа', 'Увелка', 'Агуша',
+           'Красная цена', 'Каждый день', 'Экомилк', 'Брест-Литовск', 'Алтай', 'Кубань']
+# Лишние столбцы, которые встречаются в настоящих прайсах
+_EXTRA_COLUMNS = ['№', 'артикул', 'поставщик', 'остаток', 'примечание']
+# Ошибочные значения цены и веса
+_BAD_VALUES = ['', 'нет', 'по запросу', '-', '1.2.3']
+
+
+def parse_scale(text: str) -> int:
+    """Переводит масштаб вида '10k', '1m' или '250000' в количество строк."""
+    text = text.strip().lower().replace('_', '')
+    multiplier = SCALE_SUFFIXES.get(text[-1:], 1)
+    if multiplier > 1:
+        text = text[:-1]
+    try:
+        rows = int(float(text) * multiplier)
+    except ValueError:
+        raise ValueError(f"Некорректный масштаб: {text}") from None
+    if rows <= 0:
+        raise ValueError("Количество строк должно быть положительным")
+    return rows
+
+
+def random_headers(rng: random.Random) -> Tuple[List[str], Tuple[int, int, int]]:
+    """
+    Выбирает заголовки для одного файла.
+
+    Returns:
+        Заголовки и позиции столбцов названия, цены и веса.
+    """
+    # Множества сортируются, чтобы выбор не зависел от хеширования строк
+    columns = [rng.choice(sorted(names)) for names in
+               (PriceMachine.PRODUCT_COLUMNS, PriceMachine.PRICE_COLUMNS, PriceMachine.WEIGHT_COLUMNS)]
+    columns = [name.capitalize() if rng.random() < 0.5 else name for name in columns]
+    headers = columns + rng.sample(_EXTRA_COLUMNS, rng.randint(0, 3))
+    rng.shuffle(headers)
+    return headers, tuple(headers.index(name) for name in columns)
+
+
+def _format_number(rng: random.Random, value: float, digits: int, decimal_comma: bool) -> str:
+    """Записывает число с точкой или десятичной запятой."""
+    text = f"{value:.{digits}f}"
+    return text.replace('.', ',') if decimal_comma else text
+
+
+def generate_rows(rng: random.Random, rows: int, headers: List[str], positions: Tuple[int, int, int],
+                  bad_rate: float = DEFAULT_BAD_RATE) -> Iterator[List[str]]:
+    """Порождает строки одного прайс-листа без накопления их в памяти."""
+    name_pos, price_pos, weight_pos = positions
+    decimal_comma = rng.random() < 0.7
+
+    for number in range(1, rows + 1):
+        category, price_per_kg, weights = rng.choice(_CATEGORIES)
+        weight = rng.choice(weights)
+        price = weight * price_per_kg * rng.uniform(0.6, 1.6)
+
+        row = [''] * len(headers)
+        for i, header in enumerate(headers):
+            if header == '№':
+                row[i] = str(number)
+            elif header == 'артикул':
+                row[i] = f"A{rng.randrange(10 ** 7):07d}"
+            elif header == 'остаток':
+                row[i] = str(rng.randrange(500))
+        row[name_pos] = f"{category} {rng.choice(_VARIETIES)} {rng.choice(_BRANDS)} {weight * 1000:g} г"
+        row[price_pos] = _format_number(rng, price, 2, decimal_comma)
+        row[weight_pos] = _format_number(rng, weight, 3, decimal_comma)
+
+        if rng.random() < bad_rate:
+            kind = rng.randrange(3)
+            if kind == 0:
+                row[price_pos] = rng.choice(_BAD_VALUES)
+            elif kind == 1:
+                row[weight_pos] = rng.choice(_BAD_VALUES)
+            else:
+                # Обрезанная строка
+                del row[max(price_pos, weight_pos):]
+        yield row
+
+
+def generate_prices(directory: str, rows: int, files: int = 4, bad_rate: float = DEFAULT_BAD_RATE,
+                    seed: int = 1) -> List[str]:
+    """
+    Записывает rows строк, поровну разложенных по files прайс-листам.
+
+    При одинаковом seed получаются одинаковые файлы.
+
+    Returns:
+        Пути записанных файлов.
+    """
+    if files <= 0:
+        raise ValueError("Количество файлов должно быть положительным")
+
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+
+    for i in range(files):
+        file_rows = rows // files + (1 if i < rows % files else 0)
+        path = os.path.join(directory, f"price_{i:03d}.csv")
+        headers, positions = random_headers(rng)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(generate_rows(rng, file_rows, headers, positions, bad_rate))
+        paths.append(path)
+
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация синтетических прайс-листов")
+    parser.add_argument('scale', type=parse_scale, help="количество строк: 10k, 1m, 10m или число")
+    parser.add_argument('directory', nargs='?', default='synthetic_prices', help="папка для файлов")
+    parser.add_argument('--files', type=int, default=4, help="количество файлов")
+    parser.add_argument('--bad-rate', type=float, default=DEFAULT_BAD_RATE, help="доля ошибочных строк")
+    parser.add_argument('--seed', type=int, default=1, help="начальное значение генератора")
+    args = parser.parse_args()
+
+    paths = generate_prices(args.directory, args.scale, args.files, args.bad_rate, args.seed)
+    print(f"Записано {args.scale} строк в {len(paths)} файлов в {args.directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+import os
+from html import escape
+from typing import Iterable, TextIO, Sequence
+
+from product_store import ProductStore, PriceRecord
+
+# Размер буфера записи HTML-файлов
+WRITE_BUFFER_SIZE = 1 << 20
+
+HTML_HEAD = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>{title}</title>
+            <style>
+                table {{ width: 100%; border-collapse: collapse; }}
+                th, td {{ padding: 8px; text-align: left; border-bottom: 1px solid #ddd; }}
+                tr:hover {{ background-color: #f5f5f5; }}
+                th {{ background-color: #4CAF50; color: white; }}
+            </style>
+        </head>
+        <body>
+            <h2>{heading}</h2>
+"""
+
+TABLE_HEAD = """
+            <table>
+                <tr>
+                    <th>№</th>
+                    <th>Название</th>
+                    <th>Цена</th>
+                    <th>Вес (кг)</th>
+                    <th>Файл</th>
+                    <th>Цена за кг</th>
+                </tr>
+"""
+
+TABLE_ROW = """
+                <tr>
+                    <td>{0}</td>
+                    <td>{1}</td>
+                    <td>{2:.2f}</td>
+                    <td>{3:.3f}</td>
+                    <td>{4}</td>
+                    <td>{5:.2f}</td>
+                </tr>
+"""
+
+TABLE_FOOT = """
+            </table>
+"""
+
+PAGE_NAV = """
+            <p>{prev} | <a href="index.html">Оглавление</a> | {next}</p>
+"""
+
+INDEX_HEAD = """
+            <table>
+                <tr>
+                    <th>Страница</th>
+                    <th>Позиции</th>
+                    <th>Мин. цена за кг</th>
+                    <th>Макс. цена за кг</th>
+                </tr>
+"""
+
+INDEX_ROW = """
+                <tr>
+                    <td><a href="{file}">Страница {page}</a></td>
+                    <td>{first}–{last}</td>
+                    <td>{min_price:.2f}</td>
+                    <td>{max_price:.2f}</td>
+                </tr>
+"""
+
+HTML_FOOT = """
+        </body>
+        </html>
+"""
+
+
+def write_product_rows(f: TextIO, store: ProductStore, rows: Iterable[int], first_number: int = 1) -> None:
+    """
+    Построчно записывает строки хранилища в HTML-таблицу.
+
+    Названия продуктов и файлов экранируются, строки пишутся сразу в файл,
+    поэтому документ целиком в памяти не собирается.
+    """
+    names = store.names
+    prices = store.prices
+    weights = store.weights
+    price_per_kg = store.price_per_kg
+    file_ids = store.file_ids
+    source_files = [escape(name) for name in store.source_files]
+    row_template = TABLE_ROW.format
+    write = f.write
+
+    for idx, row in enumerate(rows, first_number):
+        write(row_template(idx, escape(names[row]), prices[row], weights[row],
+                           source_files[file_ids[row]], price_per_kg[row]))
+
+
+def write_records(f: TextIO, records: Iterable[PriceRecord], first_number: int = 1) -> int:
+    """
+    Построчно записывает в HTML-таблицу записи (название, цена, вес, файл, цена за кг).
+
+    Returns:
+        Количество записанных строк.
+    """
+    row_template = TABLE_ROW.format
+    write = f.write
+    count = 0
+
+    for count, (name, price, weight, source_file, price_per_kg) in enumerate(records, 1):
+        write(row_template(count + first_number - 1, escape(name), price, weight, escape(source_file), price_per_kg))
+
+    return count
+
+
+def write_record_table(filename: str, records: Iterable[PriceRecord], title: str = 'Сравнение цен') -> int:
+    """
+    Записывает HTML-страницу с таблицей из потока записей, не собирая их в память.
+
+    Количество позиций заранее неизвестно, поэтому оно выводится под таблицей.
+
+    Returns:
+        Количество записанных позиций.
+    """
+    with open(filename, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(HTML_HEAD.format(title=escape(title), heading=escape(title)))
+        f.write(TABLE_HEAD)
+        count = write_records(f, records)
+        f.write(TABLE_FOOT)
+        f.write(f"\n            <p>Всего {count} позиций</p>\n")
+        f.write(HTML_FOOT)
+    return count
+
+
+def write_product_table(filename: str, store: ProductStore, rows: Iterable[int], heading: str,
+                        title: str = 'Сравнение цен') -> None:
+    """Записывает HTML-страницу с таблицей продуктов."""
+    with open(filename, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(HTML_HEAD.format(title=escape(title), heading=escape(heading)))
+        f.write(TABLE_HEAD)
+        write_product_rows(f, store, rows)
+        f.write(TABLE_FOOT)
+        f.write(HTML_FOOT)
+
+
+def page_filename(page: int) -> str:
+    """Возвращает имя файла страницы отчёта."""
+    return f"page_{page:05d}.html"
+
+
+def write_paged_report(directory: str, store: ProductStore, rows: Sequence[int], page_size: int = 1000,
+                       title: str = 'Сравнение цен') -> str:
+    """
+    Записывает отчёт в виде набора HTML-страниц и страницы оглавления.
+
+    Строки делятся на страницы по page_size в переданном порядке, так что
+    размер каждой страницы ограничен независимо от размера каталога.
+
+    Returns:
+        Путь к странице оглавления.
+    """
+    if page_size <= 0:
+        raise ValueError("Размер страницы должен быть положительным")
+
+    os.makedirs(directory, exist_ok=True)
+    pages = max(1, -(-len(rows) // page_size))
+    price_per_kg = store.price_per_kg
+    index_path = os.path.join(directory, 'index.html')
+
+    with open(index_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as index:
+        index.write(HTML_HEAD.format(title=escape(title),
+                                     heading=escape(f"{title} (всего {len(rows)} позиций, {pages} стр.)")))
+        index.write(INDEX_HEAD)
+
+        for page in range(1, pages + 1):
+            start = (page - 1) * page_size
+            chunk = rows[start:start + page_size]
+            _write_page(os.path.join(directory, page_filename(page)), store, chunk, page, pages, start, title)
+
+            if chunk:
+                index.write(INDEX_ROW.format(file=page_filename(page), page=page,
+                                             first=start + 1, last=start + len(chunk),
+                                             min_price=price_per_kg[chunk[0]],
+                                             max_price=price_per_kg[chunk[-1]]))
+
+        index.write(TABLE_FOOT)
+        index.write(HTML_FOOT)
+
+    return index_path
+
+
+def _write_page(filename: str, store: ProductStore, rows: Sequence[int], page: int, pages: int,
+                start: int, title: str) -> None:
+    """Записывает одну страницу отчёта со ссылками на соседние страницы."""
+    prev_link = f'<a href="{page_filename(page - 1)}">&larr; Назад</a>' if page > 1 else '&larr; Назад'
+    next_link = f'<a href="{page_filename(page + 1)}">Вперёд &rarr;</a>' if page < pages else 'Вперёд &rarr;'
+    nav = PAGE_NAV.format(prev=prev_link, next=next_link)
+
+    with open(filename, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(HTML_HEAD.format(title=escape(title), heading=escape(f"{title}: страница {page} из {pages}")))
+        f.write(nav)
+        f.write(TABLE_HEAD)
+        write_product_rows(f, store, rows, first_number=start + 1)
+        f.write(TABLE_FOOT)
+        f.write(nav)
+        f.write(HTML_FOOT)
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+import argparse
+import os
+from typing import Dict, List, Optional, Tuple
+
+from price_machine import PriceMachine, FileChanges
+from product_store import Product
+from search_index import ValueRange
+from offers import OfferGroup
+from streaming import stream_export, DEFAULT_MAX_ROWS_IN_MEMORY
+from snapshot import SNAPSHOT_FILENAME
+from profiling import Profiler
+from service import CatalogService, serve, address
+
+# Количество результатов поиска, выводимых за один раз
+PAGE_SIZE = 20
+
+# Поля для поиска по диапазону и их названия в запросах
+RANGE_PROMPTS = {'price': 'Цена', 'weight': 'Вес (кг)', 'price_per_kg': 'Цена за кг'}
+
+
+def print_changes(changes: FileChanges) -> None:
+    """Выводит сводку изменений в папке с прайсами."""
+    for title, names in (("Добавлены", changes.added), ("Изменены", changes.modified),
+                         ("Удалены", changes.deleted)):
+        if names:
+            print(f"{title}: {', '.join(names)}")
+
+
+def read_range(title: str) -> ValueRange:
+    """Запрашивает у пользователя границы диапазона; пустой ввод - граница не задана."""
+    low = input(f"{title} от (Enter - без ограничения): ").strip().replace(',', '.')
+    high = input(f"{title} до (Enter - без ограничения): ").strip().replace(',', '.')
+    return float(low) if low else None, float(high) if high else None
+
+
+def print_results(pm: PriceMachine, search_term: str, ranges: Optional[Dict[str, ValueRange]] = None) -> None:
+    """Постранично выводит результаты поиска."""
+    # Найденные строки сортируются один раз, страницы берутся из готового списка
+    total, rows = pm.search_rows(search_term, ranges=ranges)
+
+    if not total:
+        print("Ничего не найдено")
+        return
+
+    print(f"\nНайдено {total} продуктов:")
+    print(f"{'№':3} | {'Название':40} | {'Цена':8} | {'Вес':6} | {'Цена/кг':8} | Файл")
+    print("-" * 90)
+
+    for offset in range(0, total, PAGE_SIZE):
+        page = [pm.products[row] for row in rows[offset:offset + PAGE_SIZE]]
+        for idx, product in enumerate(page, offset + 1):
+            print(f"{idx:3} | {product.name[:40]:40} | {product.price:8.2f} | "
+                  f"{product.weight:6.3f} | {product.price_per_kg:8.2f} | {product.source_file}")
+
+        if offset + PAGE_SIZE < total and input("Enter - следующие результаты, q - в меню: ").strip():
+            break
+
+
+def print_offers(groups: List[OfferGroup]) -> None:
+    """Постранично выводит сравнение предложений поставщиков."""
+    if not groups:
+        print("Нет продуктов, которые предлагают несколько поставщиков")
+        return
+
+    print(f"\nПродуктов с предложениями нескольких поставщиков: {len(groups)}")
+    print(f"{'Продукт':40} | {'Пост.':5} | {'Мин/кг':8} | {'Медиана':8} | {'Макс/кг':8} | Лучший файл")
+    print("-" * 100)
+
+    for offset in range(0, len(groups), PAGE_SIZE):
+        for group in groups[offset:offset + PAGE_SIZE]:
+            print(f"{group.name[:40]:40} | {group.suppliers:5} | {group.min_price_per_kg:8.2f} | "
+                  f"{group.median_price_per_kg:8.2f} | {group.max_price_per_kg:8.2f} | {group.best_source_file}")
+
+        if offset + PAGE_SIZE < len(groups) and input("Enter - следующие результаты, q - в меню: ").strip():
+            break
+
+
+def print_matches(matches: List[Tuple[Product, float]]) -> None:
+    """Выводит результаты нечёткого поиска с оценкой сходства."""
+    if not matches:
+        print("Ничего не найдено")
+        return
+
+    print(f"{'Сходство':8} | {'Название':40} | {'Цена':8} | {'Вес':6} | {'Цена/кг':8} | Файл")
+    print("-" * 95)
+    for product, score in matches:
+        print(f"{score:8.0%} | {product.name[:40]:40} | {product.price:8.2f} | "
+              f"{product.weight:6.3f} | {product.price_per_kg:8.2f} | {product.source_file}")
+
+
+def run_stream_export(args: argparse.Namespace) -> None:
+    """Потоковый экспорт без загрузки прайсов в память."""
+    errors = {}
+    try:
+        count = stream_export(args.path, args.stream_export, args.search,
+                              max_rows_in_memory=args.max_rows, errors=errors)
+    except Exception as e:
+        print(f"Ошибка при экспорте: {e}")
+        return
+
+    for report in errors.values():
+        for line in report.lines():
+            print(line)
+    print(f"Экспортировано {count} позиций в {args.stream_export}")
+
+
+def run_service(args: argparse.Namespace) -> None:
+    """Запускает HTTP-сервис запросов к прайсам."""
+    snapshot = os.path.join(args.path or os.getcwd(), SNAPSHOT_FILENAME)
+    service = CatalogService(args.path, snapshot, workers=os.cpu_count() or 1,
+                             reload_interval=args.reload_interval)
+    try:
+        serve(service, *args.serve)
+    except Exception as e:
+        print(f"Ошибка при запуске сервиса: {e}")
+
+
+def parse_args() -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(description="Сравнение цен из прайс-листов")
+    parser.add_argument('--stream-export', '--stream-html', dest='stream_export', metavar='FILE',
+                        help="потоково экспортировать прайсы без загрузки в память и выйти; "
+                             "формат по расширению: .csv, .jsonl, .pmcol, .html")
+    parser.add_argument('--serve', metavar='[HOST:]PORT', type=address,
+                        help="загрузить прайсы один раз и отвечать на запросы по HTTP")
+    parser.add_argument('--reload-interval', type=float, default=30.0,
+                        help="как часто сервис проверяет папку на изменения, в секундах")
+    parser.add_argument('--path', default='', help="папка с прайсами для потокового экспорта и сервиса")
+    parser.add_argument('--search', default='', help="экспортировать только продукты с этим текстом в названии")
+    parser.add_argument('--max-rows', type=int, default=DEFAULT_MAX_ROWS_IN_MEMORY,
+                        help="сколько строк держать в памяти при сортировке")
+    parser.add_argument('--profile', action='store_true',
+                        help="замерять этапы загрузки, поиска и экспорта и вывести сводку при выходе")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="замерять также пик памяти (медленнее)")
+    parser.add_argument('--profile-json', metavar='FILE', help="сохранить отчёт о замерах в JSON")
+    return parser.parse_args()
+
+
+def print_profile(profiler: Profiler, json_path: Optional[str]) -> None:
+    """Выводит сводку замеров и сохраняет отчёт в JSON."""
+    if not profiler.stages:
+        return
+    print("\nЗамеры по этапам:")
+    print(profiler.summary())
+    if json_path:
+        try:
+            profiler.save(json_path)
+            print(f"Отчёт о замерах сохранён в {json_path}")
+        except OSError as e:
+            print(f"Не удалось сохранить отчёт о замерах: {e}")
+
+
+def main():
+    """Основной интерфейс программы."""
+    args = parse_args()
+    if args.stream_export:
+        run_stream_export(args)
+        return
+    if args.serve:
+        run_service(args)
+        return
+
+    profiler = Profiler(enabled=args.profile or bool(args.profile_json), memory=args.profile_memory)
+    try:
+        interactive(PriceMachine(profiler))
+    finally:
+        print_profile(profiler, args.profile_json)
+        profiler.close()
+
+
+def interactive(pm: PriceMachine) -> None:
+    """Интерактивная работа с прайсами через меню."""
+    print("=== Price Comparison Tool ===")
+
+    # Загрузка данных
+    path = input("Введите путь к папке с прайсами (Enter для текущей директории): ").strip()
+    try:
+        snapshot = os.path.join(path or os.getcwd(), SNAPSHOT_FILENAME)
+        pm.load_prices(path if path else None, workers=os.cpu_count() or 1, snapshot=snapshot)
+        print(f"Загружено {len(pm.products)} продуктов из {len(pm._processed_files)} файлов")
+    except Exception as e:
+        print(f"Ошибка при загрузке данных: {e}")
+        return
+
+    # Поиск
+    while True:
+        print("\n1. Поиск продуктов")
+        print("2. Экспорт в HTML, CSV, JSON Lines или колоночный файл")
+        print("3. Выход")
+        print("4. Постраничный HTML-отчёт")
+        print("5. Следить за папкой с прайсами")
+        print("6. Поиск по диапазону цены, веса и цены за кг")
+        print("7. Самые дешёвые предложения по продуктам")
+        print("8. Нечёткий поиск (с опечатками и сокращениями)")
+
+        choice = input("Выберите действие: ").strip()
+
+        if choice == '1':
+            search_term = input("Введите текст для поиска: ").strip()
+            if not search_term:
+                print("Введите непустой поисковый запрос")
+                continue
+
+            print_results(pm, search_term)
+
+        elif choice == '2':
+            filename = input("Введите имя файла для экспорта (.html, .csv, .jsonl, .pmcol; "
+                             "по умолчанию output.html): ").strip() or 'output.html'
+            try:
+                if filename.lower().endswith('.html'):
+                    pm.export_to_html(filename)
+                else:
+                    pm.export(filename)
+                print(f"Данные экспортированы в {filename}")
+            except (OSError, ValueError) as e:
+                print(f"Ошибка при экспорте: {e}")
+
+        elif choice == '4':
+            directory = input("Введите папку для отчёта (по умолчанию report): ").strip() or 'report'
+            index_path = pm.export_report(directory)
+            print(f"Отчёт сохранён, оглавление: {index_path}")
+
+        elif choice == '5':
+            print("Слежение за папкой запущено, для остановки нажмите Ctrl+C")
+            try:
+                pm.watch(path if path else None, workers=os.cpu_count() or 1, on_change=print_changes)
+            except KeyboardInterrupt:
+                print(f"\nСлежение остановлено. Загружено {len(pm.products)} продуктов "
+                      f"из {len(pm._processed_files)} файлов")
+                try:
+                    pm.save_snapshot(snapshot)
+                except OSError as e:
+                    print(f"Не удалось сохранить снимок {snapshot}: {e}")
+
+        elif choice == '6':
+            ranges = {}
+            for field, title in RANGE_PROMPTS.items():
+                try:
+                    bounds = read_range(title)
+                except ValueError:
+                    print("Границы диапазона должны быть числами")
+                    break
+                if bounds != (None, None):
+                    ranges[field] = bounds
+            else:
+                search_term = input("Введите текст для поиска (Enter - любое название): ").strip()
+                print_results(pm, search_term, ranges)
+
+        elif choice == '7':
+            search_term = input("Введите текст для поиска (Enter - все продукты): ").strip()
+            print_offers(pm.cheapest_offers(search_term, min_suppliers=2))
+
+        elif choice == '8':
+            search_term = input("Введите текст для поиска: ").strip()
+            if not search_term:
+                print("Введите непустой поисковый запрос")
+                continue
+            print_matches(pm.fuzzy_search_products(search_term, limit=PAGE_SIZE, stemming=True))
+
+        elif choice == '3':
+            print("Работа завершена.")
+            break
+
+        else:
+            print("Некорректный ввод. Попробуйте снова.")
+
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import re
+from array import array
+from dataclasses import dataclass
+from statistics import median
+from typing import List, Dict, Iterable, Optional
+
+from product_store import ProductStore
+
+# Десятичная запятая между цифрами
+_DECIMAL_COMMA_RE = re.compile(r'(?<=\d),(?=\d)')
+# Количество с единицей измерения: "500 г", "1.5кг", "0.9 l"
+_QUANTITY_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(кг|kg|гр|г|g|мл|ml|л|l)(?![a-zа-я])')
+# Всё, кроме букв, цифр, точки и процента, заменяется пробелом
+_PUNCTUATION_RE = re.compile(r'[^\w.%]+|_')
+_SPACES_RE = re.compile(r'\s+')
+
+# Единица измерения -> (каноническая единица, множитель)
+_UNITS = {
+    'кг': ('кг', 1), 'kg': ('кг', 1),
+    'г': ('кг', 0.001), 'гр': ('кг', 0.001), 'g': ('кг', 0.001),
+    'л': ('л', 1), 'l': ('л', 1),
+    'мл': ('л', 0.001), 'ml': ('л', 0.001),
+}
+
+
+def _canonical_quantity(match: re.Match) -> str:
+    """Переводит количество в килограммы или литры."""
+    unit, factor = _UNITS[match.group(2)]
+    value = float(match.group(1)) * factor
+    return f" {value:g}{unit} "
+
+
+def normalize_name(name: str) -> str:
+    """
+    Приводит название продукта к виду, по которому сравниваются предложения.
+
+    Регистр и буква "ё" выравниваются, знаки препинания и лишние пробелы
+    убираются, а количества переводятся в килограммы или литры, так что
+    "Сыр  Российский, 500 г" и "сыр российский 0,5кг" дают одно и то же.
+    """
+    text = name.casefold().replace('ё', 'е')
+    text = _DECIMAL_COMMA_RE.sub('.', text)
+    text = _QUANTITY_RE.sub(_canonical_quantity, text)
+    text = _PUNCTUATION_RE.sub(' ', text)
+    return _SPACES_RE.sub(' ', text).strip(' .')
+
+
+@dataclass
+class OfferGroup:
+    """Сводка предложений одного продукта от разных поставщиков."""
+    name: str
+    offers: int
+    suppliers: int
+    min_price_per_kg: float
+    median_price_per_kg: float
+    max_price_per_kg: float
+    best_name: str
+    best_source_file: str
+
+
+def cheapest_offers(store: ProductStore, rows: Optional[Iterable[int]] = None,
+                    min_suppliers: int = 1) -> List[OfferGroup]:
+    """
+    Группирует предложения по нормализованному названию и находит самое дешёвое в каждой группе.
+
+    Строки проходятся один раз: для каждой группы в словаре копятся номера
+    строк, а названия нормализуются один раз на каждое различное название.
+    Строки с нулевой ценой за кг (без веса) не учитываются.
+
+    Args:
+        store: Хранилище продуктов
+        rows: Номера строк для группировки. По умолчанию - все строки хранилища.
+        min_suppliers: Минимальное количество разных файлов-поставщиков в группе
+
+    Returns:
+        Группы, отсортированные по нормализованному названию
+    """
+    names = store.names
+    price_per_kg = store.price_per_kg
+    file_ids = store.file_ids
+
+    normalized: Dict[str, str] = {}
+    groups: Dict[str, array] = {}
+
+    for row in store.rows() if rows is None else rows:
+        if price_per_kg[row] <= 0:
+            continue
+        name = names[row]
+        key = normalized.get(name)
+        if key is None:
+            key = normalized[name] = normalize_name(name)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = array('I')
+        group.append(row)
+
+    result = []
+    for key in sorted(groups):
+        group = groups[key]
+        suppliers = len({file_ids[row] for row in group})
+        if suppliers < min_suppliers:
+            continue
+
+        values = sorted(price_per_kg[row] for row in group)
+        best = min(group, key=price_per_kg.__getitem__)
+        result.append(OfferGroup(
+            name=key,
+            offers=len(group),
+            suppliers=suppliers,
+            min_price_per_kg=values[0],
+            median_price_per_kg=median(values),
+            max_price_per_kg=values[-1],
+            best_name=names[best],
+            best_source_file=store.source_files[file_ids[best]]
+        ))
+
+    return result
@@ -0,0 +1,793 @@
+# -*- coding: utf-8 -*-
+import os
+import csv
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Optional, Generator, Iterator, Callable
+from array import array
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+import webbrowser
+from pathlib import Path
+
+from product_store import Product, ProductStore
+from search_index import TrigramIndex, SortedIndex, ValueRange
+from html_export import write_product_table, write_paged_report
+from exporters import exporter_for
+from snapshot import FileStat, save_snapshot, load_snapshot
+from offers import OfferGroup, cheapest_offers
+from profiling import Profiler, StageStats, NULL_PROFILER
+
+
+# Разобранные столбцы одного файла: названия, цены, веса
+ParsedColumns = Tuple[List[str], array, array]
+
+
+@dataclass
+class FileChanges:
+    """Изменения в папке с прайсами с момента предыдущей загрузки."""
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.deleted)
+
+
+@dataclass
+class ErrorReport:
+    """Отчёт об ошибках разбора одного файла с ограниченным числом сохраняемых сообщений."""
+    limit: int = 20
+    count: int = 0
+    messages: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def add(self, message: str) -> None:
+        """Учитывает ошибку, сохраняя текст только первых limit сообщений."""
+        self.count += 1
+        if len(self.messages) < self.limit:
+            self.messages.append(message)
+
+    def lines(self) -> List[str]:
+        """Возвращает сохранённые сообщения и строку о пропущенных."""
+        if self.count > len(self.messages):
+            return self.messages + [f"... и ещё {self.count - len(self.messages)} ошибок"]
+        return list(self.messages)
+
+
+class PriceMachine:
+    """Класс для работы с прайс-листами."""
+
+    # Допустимые названия столбцов
+    PRODUCT_COLUMNS = {'товар', 'название', 'наименование', 'продукт', 'product'}
+    PRICE_COLUMNS = {'розница', 'цена', 'price', 'retail'}
+    WEIGHT_COLUMNS = {'вес', 'масса', 'фасовка', 'weight', 'масса, кг'}
+
+    # Доля удалённых строк, при превышении которой хранилище уплотняется
+    COMPACT_RATIO = 0.25
+
+    # Поля, по которым строятся индексы для запросов по диапазону
+    RANGE_FIELDS = ('price', 'weight', 'price_per_kg')
+
+    # Количество строк, разбираемых за одну пачку
+    PARSE_CHUNK_ROWS = 4096
+    # Разделитель значений при пакетном разборе чисел
+    _BATCH_SEPARATOR = '\x1f'
+
+    def __init__(self, profiler: Optional[Profiler] = None):
+        """
+        Инициализация машины обработки цен.
+
+        Args:
+            profiler: Профилировщик, в который записываются замеры этапов
+                загрузки, поиска и экспорта. По умолчанию замеры не ведутся.
+        """
+        self.profiler = profiler or NULL_PROFILER
+        self.products = ProductStore()
+        self._index = TrigramIndex()
+        # Загруженные файлы и их размер и время изменения на момент чтения
+        self._processed_files: Dict[str, FileStat] = {}
+        # Файлы, которые не удалось прочитать, с теми же сведениями
+        self._failed_files: Dict[str, FileStat] = {}
+        # Отчёты об ошибках последней загрузки каждого файла
+        self.errors: Dict[str, ErrorReport] = {}
+        # Индексы для запросов по диапазону и версия хранилища, по которой они построены
+        self._sorted_indexes: Dict[str, Tuple[int, SortedIndex]] = {}
+
+    def load_prices(self, file_path: str = '', workers: int = 1, snapshot: Optional[str] = None) -> None:
+        """
+        Загружает данные из всех CSV-файлов с 'price' в названии.
+
+        Уже загруженные файлы, которые с тех пор не менялись, повторно не
+        читаются. Строки изменённых файлов заменяются новыми, а строки
+        удалённых файлов убираются.
+
+        Args:
+            file_path: Путь к директории с файлами. По умолчанию - текущая директория.
+            workers: Количество процессов для параллельной загрузки файлов.
+                При значении 1 файлы читаются последовательно.
+            snapshot: Путь к файлу снимка. Если снимок есть, из него берутся
+                данные файлов, которые не менялись с момента его записи, а
+                разбираются только новые и изменённые файлы. После загрузки
+                снимок обновляется.
+
+        Raises:
+            ValueError: Если директория не существует.
+            FileNotFoundError: Если нет подходящих файлов.
+        """
+        path = self._price_dir(file_path)
+        files = self._price_files(path)
+
+        if not files:
+            raise FileNotFoundError(f"Не найдено CSV-файлов с 'price' в названии в {path}")
+
+        with self.profiler.stage('load_prices') as stage:
+            self._sync(files, workers, snapshot)
+            stage.rows = len(self.products)
+
+    def refresh(self, file_path: str = '', workers: int = 1, snapshot: Optional[str] = None) -> FileChanges:
+        """
+        Приводит загруженные данные в соответствие с текущим содержимым папки.
+
+        В отличие от load_prices, пустая папка не считается ошибкой: строки
+        всех ранее загруженных файлов просто удаляются.
+
+        Returns:
+            Списки добавленных, изменённых и удалённых файлов.
+        """
+        path = self._price_dir(file_path)
+        with self.profiler.stage('refresh') as stage:
+            changes = self._sync(self._price_files(path), workers, snapshot)
+            stage.rows = len(self.products)
+        return changes
+
+    def watch(self, file_path: str = '', interval: float = 5.0, workers: int = 1,
+              on_change: Optional[Callable[[FileChanges], None]] = None) -> None:
+        """
+        Следит за папкой с прайсами и применяет изменения файлов по мере их появления.
+
+        Папка опрашивается раз в interval секунд; перечитываются только
+        добавленные и изменённые файлы. Работает до прерывания (Ctrl+C).
+        Снимок во время наблюдения не обновляется, его стоит сохранить
+        через save_snapshot после выхода.
+
+        Args:
+            on_change: Вызывается после каждого опроса, при котором что-то изменилось.
+        """
+        while True:
+            changes = self.refresh(file_path, workers)
+            if changes and on_change is not None:
+                on_change(changes)
+            time.sleep(interval)
+
+    def save_snapshot(self, path: str) -> None:
+        """Сохраняет загруженные данные и индекс поиска в файл снимка."""
+        self._compact()
+        save_snapshot(path, self.products, self._index, self._processed_files)
+
+    def pending_changes(self, file_path: str = '') -> FileChanges:
+        """
+        Сравнивает содержимое папки с загруженными данными, ничего не загружая.
+
+        Returns:
+            Файлы, которые будут добавлены, перечитаны и удалены при refresh.
+        """
+        path = self._price_dir(file_path)
+        return self._changes(self._file_stats(self._price_files(path)))
+
+    def build_indexes(self) -> None:
+        """Заранее строит индексы для запросов по диапазону, чтобы первые запросы не ждали их построения."""
+        for field in self.RANGE_FIELDS:
+            self._sorted_index(field)
+
+    @staticmethod
+    def _price_dir(file_path: str) -> Path:
+        """Проверяет и возвращает папку с прайсами."""
+        path = Path(file_path) if file_path else Path.cwd()
+
+        if not path.exists():
+            raise ValueError(f"Директория не существует: {path}")
+
+        return path
+
+    @staticmethod
+    def _price_files(path: Path) -> List[Path]:
+        """Возвращает отсортированный список прайс-листов в папке."""
+        return sorted(f for f in path.glob('*') if 'price' in f.name.lower() and f.suffix == '.csv')
+
+    @staticmethod
+    def _file_stats(files: List[Path]) -> Dict[str, FileStat]:
+        """Возвращает размер и время изменения каждого из файлов."""
+        stats = {}
+        for f in files:
+            try:
+                stats[f.name] = _file_stat(f)
+            except OSError:
+                # Файл удалили между просмотром папки и чтением
+                pass
+        return stats
+
+    def _changes(self, stats: Dict[str, FileStat]) -> FileChanges:
+        """Сравнивает сведения о файлах папки с загруженными."""
+        return FileChanges(
+            added=[name for name in stats if name not in self._processed_files],
+            modified=[name for name, stat in self._processed_files.items()
+                      if name in stats and stats[name] != stat],
+            deleted=[name for name in self._processed_files if name not in stats]
+        )
+
+    def _sync(self, files: List[Path], workers: int, snapshot: Optional[str]) -> FileChanges:
+        """Загружает новые и изменённые файлы и убирает строки изменённых и удалённых."""
+        profiler = self.profiler
+        with profiler.stage('sync.scan'):
+            stats = self._file_stats(files)
+
+        restored = True
+        if snapshot and not self._processed_files:
+            with profiler.stage('sync.snapshot_restore') as stage:
+                restored = self._restore_snapshot(snapshot)
+                stage.rows = len(self.products)
+
+        changes = self._changes(stats)
+
+        with profiler.stage('sync.remove_stale'), _deferred_interrupt():
+            stale = changes.modified + changes.deleted
+            self.products.remove_files(stale)
+            for name in stale:
+                del self._processed_files[name]
+
+        # Файлы, которые уже не удалось прочитать, повторно читаются только после изменения
+        files = [f for f in files if f.name in stats and f.name not in self._processed_files
+                 and self._failed_files.get(f.name) != stats[f.name]]
+
+        load = partial(_load_price_file, profile=profiler.enabled, profile_memory=profiler.memory)
+        with profiler.stage('sync.load_files', bytes_read=sum(stats[f.name][0] for f in files)) as stage:
+            if workers > 1 and len(files) > 1:
+                # Файлы раздаются пулу процессов, а результаты собираются в порядке
+                # списка files, поэтому итог не зависит от того, какой процесс
+                # закончил работу первым.
+                with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+                    stage.rows = self._merge_results(files, executor.map(load, files), stats)
+            else:
+                stage.rows = self._merge_results(files, map(load, files), stats)
+
+        if self.products.dead_rows > self.products.row_count * self.COMPACT_RATIO:
+            with profiler.stage('sync.compact'):
+                self._compact()
+
+        if snapshot and (changes or not restored):
+            try:
+                with profiler.stage('sync.snapshot_save', rows=len(self.products)):
+                    self.save_snapshot(snapshot)
+            except OSError as e:
+                print(f"Не удалось сохранить снимок {snapshot}: {e}")
+
+        return changes
+
+    def _restore_snapshot(self, path: str) -> bool:
+        """
+        Загружает данные из снимка.
+
+        Returns:
+            True, если снимок удалось прочитать.
+        """
+        loaded = load_snapshot(path)
+        if loaded is None:
+            return False
+
+        self.products, self._index, self._processed_files = loaded
+        self._sorted_indexes = {}
+        return True
+
+    def _compact(self) -> None:
+        """Физически убирает удалённые строки из хранилища и индекса."""
+        with _deferred_interrupt():
+            mapping = self.products.compact()
+            if mapping is not None:
+                self._index.remap(mapping)
+
+    def _merge_results(self, files: List[Path],
+                       results: Iterator[Tuple[Optional[ParsedColumns], ErrorReport, Optional[Dict[str, StageStats]]]],
+                       stats: Dict[str, FileStat]) -> int:
+        """
+        Добавляет результаты разбора файлов и выводит сводку ошибок.
+
+        Returns:
+            Количество добавленных строк.
+        """
+        added = 0
+        for file, (columns, errors, timings) in zip(files, results):
+            self.profiler.merge(timings)
+            if errors:
+                self.errors[file.name] = errors
+                for line in errors.lines():
+                    print(line)
+            else:
+                self.errors.pop(file.name, None)
+            if columns is not None:
+                with self.profiler.stage('sync.index', rows=len(columns[0])):
+                    # Триграммы разбираются заранее, а хранилище, индекс и список
+                    # загруженных файлов меняются вместе: прерывание не может
+                    # оставить их рассогласованными, в том числе в снимке.
+                    prepared = self._index.prepare(columns[0])
+                    with _deferred_interrupt():
+                        self.products.extend(*columns, source_file=file.name)
+                        self._index.merge(*prepared)
+                        self._processed_files[file.name] = stats[file.name]
+                        self._failed_files.pop(file.name, None)
+                added += len(columns[0])
+            else:
+                self._failed_files[file.name] = stats[file.name]
+        return added
+
+    @classmethod
+    def _process_file(cls, reader: Iterator[List[str]], filename: str, errors: ErrorReport,
+                      profiler: Profiler = NULL_PROFILER) -> ParsedColumns:
+        """Обрабатывает данные из одного файла."""
+        names: List[str] = []
+        prices = array('d')
+        weights = array('d')
+
+        for chunk_names, chunk_prices, chunk_weights in cls._iter_chunks(reader, filename, errors, profiler):
+            names.extend(chunk_names)
+            prices.extend(chunk_prices)
+            weights.extend(chunk_weights)
+
+        return names, prices, weights
+
+    @classmethod
+    def _iter_chunks(cls, reader: Iterator[List[str]], filename: str, errors: ErrorReport,
+                     profiler: Profiler = NULL_PROFILER) -> Generator[ParsedColumns, None, None]:
+        """
+        Построчно читает файл и отдаёт разобранные столбцы пачками по PARSE_CHUNK_ROWS строк.
+
+        Номера нужных столбцов определяются один раз по заголовку, после чего
+        строки разбираются пачками: значения цены и веса всей пачки
+        склеиваются в одну строку, десятичные запятые заменяются за один вызов
+        replace, и строка разбивается обратно. Если в пачке есть ошибка,
+        её значения проверяются по одному, и ошибочные строки попадают в отчёт.
+        Пустые строки пропускаются, как в csv.DictReader.
+        """
+        try:
+            headers = next(row for row in reader if row)
+            with profiler.stage('process_file.detect_columns'):
+                product_idx, price_idx, weight_idx = cls._column_indices(headers)
+        except StopIteration:
+            errors.add(f"Пропускаем файл {filename}: файл пуст")
+            return
+        except ValueError as e:
+            errors.add(f"Пропускаем файл {filename}: {e}")
+            return
+
+        sep = cls._BATCH_SEPARATOR
+        while True:
+            rows = list(islice(reader, cls.PARSE_CHUNK_ROWS))
+            if not rows:
+                break
+            chunk = [row for row in rows if row]
+            if not chunk:
+                continue
+
+            names: List[str] = []
+            prices = array('d')
+            weights = array('d')
+
+            try:
+                chunk_names = [row[product_idx].strip() for row in chunk]
+                price_texts = sep.join([row[price_idx] for row in chunk]).replace(',', '.').split(sep)
+                weight_texts = sep.join([row[weight_idx] for row in chunk]).replace(',', '.').split(sep)
+                if len(price_texts) != len(chunk) or len(weight_texts) != len(chunk):
+                    raise ValueError("Разделитель пачки встретился в данных")
+            except (ValueError, IndexError):
+                # Короткие строки или разделитель внутри значений - разбираем пачку построчно
+                cls._process_rows(chunk, (product_idx, price_idx, weight_idx), names, prices, weights, errors)
+                yield names, prices, weights
+                continue
+
+            try:
+                prices.extend(map(float, price_texts))
+                weights.extend(map(float, weight_texts))
+            except ValueError:
+                prices = array('d')
+                weights = array('d')
+                cls._process_values(chunk, chunk_names, price_texts, weight_texts, names, prices, weights, errors)
+                yield names, prices, weights
+                continue
+
+            yield chunk_names, prices, weights
+
+    @staticmethod
+    def _process_values(rows: List[List[str]], row_names: List[str], price_texts: List[str],
+                        weight_texts: List[str], names: List[str], prices: array, weights: array,
+                        errors: ErrorReport) -> None:
+        """Поштучно разбирает уже подготовленные значения пачки, в которой есть ошибочные числа."""
+        for row, name, price_text, weight_text in zip(rows, row_names, price_texts, weight_texts):
+            try:
+                price = float(price_text)
+                weight = float(weight_text)
+            except ValueError as e:
+                errors.add(f"Ошибка в строке: {row}. Ошибка: {e}")
+                continue
+            names.append(name)
+            prices.append(price)
+            weights.append(weight)
+
+    @staticmethod
+    def _process_rows(rows: List[List[str]], indices: Tuple[int, int, int], names: List[str], prices: array,
+                      weights: array, errors: ErrorReport) -> None:
+        """Построчно разбирает пачку, в которой есть ошибочные строки."""
+        product_idx, price_idx, weight_idx = indices
+        for row in rows:
+            try:
+                name = row[product_idx].strip()
+                price = float(row[price_idx].replace(',', '.'))
+                weight = float(row[weight_idx].replace(',', '.'))
+            except (ValueError, IndexError) as e:
+                errors.add(f"Ошибка в строке: {row}. Ошибка: {e}")
+                continue
+            names.append(name)
+            prices.append(price)
+            weights.append(weight)
+
+    @classmethod
+    def _column_indices(cls, headers: List[str]) -> Tuple[int, int, int]:
+        """
+        Определяет номера нужных столбцов по заголовкам.
+
+        Returns:
+            Кортеж с номерами столбцов (товар, цена, вес)
+
+        Raises:
+            ValueError: Если не удалось определить столбцы
+        """
+        headers_lower = [h.strip().lower() for h in headers]
+        product_col, price_col, weight_col = cls._identify_columns(headers)
+        return headers_lower.index(product_col), headers_lower.index(price_col), headers_lower.index(weight_col)
+
+    @classmethod
+    def _identify_columns(cls, headers: List[str]) -> Tuple[str, str, str]:
+        """
+        Идентифицирует нужные столбцы по заголовкам.
+
+        Returns:
+            Кортеж с именами столбцов (товар, цена, вес)
+
+        Raises:
+            ValueError: Если не удалось определить столбцы
+        """
+        headers_lower = [h.strip().lower() for h in headers]
+
+        # Находим столбцы
+        product_col = cls._find_column(headers_lower, cls.PRODUCT_COLUMNS)
+        price_col = cls._find_column(headers_lower, cls.PRICE_COLUMNS)
+        weight_col = cls._find_column(headers_lower, cls.WEIGHT_COLUMNS)
+
+        return product_col, price_col, weight_col
+
+    @staticmethod
+    def _find_column(headers: List[str], possible_names: set) -> str:
+        """Находит столбец по возможным названиям."""
+        for name in possible_names:
+            if name in headers:
+                return headers[headers.index(name)]
+        raise ValueError(f"Не найден столбец с именем из {possible_names}")
+
+    def export_to_html(self, filename: str = 'output.html', open_in_browser: bool = True) -> None:
+        """
+        Экспортирует данные в HTML файл.
+
+        Args:
+            filename: Имя выходного файла
+            open_in_browser: Открыть ли файл в браузере автоматически
+        """
+        profiler = self.profiler
+        with profiler.stage('export_to_html', rows=len(self.products)):
+            with profiler.stage('export_to_html.sort', rows=len(self.products)):
+                sorted_rows = self.products.sorted_rows(self.products.rows())
+
+            with profiler.stage('export_to_html.write', rows=len(sorted_rows)):
+                write_product_table(filename, self.products, sorted_rows,
+                                    heading=f"Сравнение цен (всего {len(sorted_rows)} позиций)")
+
+        if open_in_browser:
+            webbrowser.open(filename)
+
+    def export(self, filename: str, search_term: str = '', sort_by: str = 'price_per_kg',
+               ranges: Optional[Dict[str, ValueRange]] = None) -> int:
+        """
+        Экспортирует отсортированные продукты в файл, формат которого определяется расширением.
+
+        Поддерживаются .csv, .jsonl, сжатый колоночный .pmcol и .html
+        (см. exporters.py). Строки пишутся потоком, без создания объектов Product.
+
+        Args:
+            search_term: Экспортировать только продукты с этой подстрокой в названии
+            sort_by: Поле для сортировки, как в search_products
+            ranges: Диапазоны значений, как в search_products
+
+        Returns:
+            Количество записанных позиций.
+
+        Raises:
+            ValueError: Если формат не поддерживается.
+        """
+        exporter = exporter_for(filename)
+        profiler = self.profiler
+        with profiler.stage('export') as stage:
+            rows = self._find_rows(search_term, ranges) if search_term or ranges else self.products.rows()
+
+            reverse = sort_by.startswith('-')
+            sort_field = sort_by.lstrip('-')
+            if sort_field not in ProductStore.COLUMNS:
+                sort_field = 'price_per_kg'
+
+            with profiler.stage('export.sort'):
+                rows = self.products.sorted_rows(rows, sort_field, reverse)
+            with profiler.stage('export.write', rows=len(rows)):
+                count = exporter(filename, self.products.records(rows))
+            stage.rows = count
+        return count
+
+    def export_report(self, directory: str = 'report', page_size: int = 1000,
+                      open_in_browser: bool = True) -> str:
+        """
+        Экспортирует данные в постраничный HTML-отчёт.
+
+        Все позиции сортируются по цене за кг и раскладываются по страницам
+        из page_size строк, а на странице index.html собирается оглавление
+        с диапазоном цен каждой страницы.
+
+        Args:
+            directory: Папка для файлов отчёта
+            page_size: Количество позиций на одной странице
+            open_in_browser: Открыть ли оглавление в браузере автоматически
+
+        Returns:
+            Путь к странице оглавления
+        """
+        sorted_rows = self.products.sorted_rows(self.products.rows())
+        index_path = write_paged_report(directory, self.products, sorted_rows, page_size)
+
+        if open_in_browser:
+            webbrowser.open(Path(index_path).resolve().as_uri())
+
+        return index_path
+
+    def search_products(self, search_term: str, sort_by: str = 'price_per_kg',
+                        limit: Optional[int] = None, offset: int = 0,
+                        ranges: Optional[Dict[str, ValueRange]] = None) -> List[Product]:
+        """
+        Ищет продукты по названию и диапазонам значений.
+
+        Args:
+            search_term: Строка для поиска. Пустая строка подходит под любое название.
+            sort_by: Поле для сортировки (name, price, weight, price_per_kg),
+                с префиксом '-' - по убыванию
+            limit: Максимальное количество возвращаемых продуктов. Если задано,
+                первые offset + limit продуктов отбираются без полной сортировки.
+            offset: Сколько первых продуктов пропустить
+            ranges: Диапазоны значений полей price, weight и price_per_kg
+                в виде {поле: (от, до)} с включёнными границами; None вместо
+                границы означает, что она не задана.
+
+        Returns:
+            Отсортированный список найденных продуктов
+
+        Raises:
+            ValueError: Если в ranges указано неизвестное поле.
+        """
+        rows = self.search_rows(search_term, sort_by, None if limit is None else offset + limit, ranges)[1]
+        return [self.products[row] for row in rows[offset:]]
+
+    def search_rows(self, search_term: str, sort_by: str = 'price_per_kg', limit: Optional[int] = None,
+                    ranges: Optional[Dict[str, ValueRange]] = None) -> Tuple[int, List[int]]:
+        """
+        Ищет строки продуктов по тем же условиям, что и search_products.
+
+        Поиск выполняется один раз, поэтому по результату можно и вывести
+        общее количество, и листать страницы, не повторяя поиск.
+
+        Args:
+            limit: Сколько первых строк вернуть; None - все найденные
+
+        Returns:
+            Количество найденных продуктов и номера строк в порядке сортировки,
+            продукты по ним выдаёт products[row]
+
+        Raises:
+            ValueError: Если в ranges указано неизвестное поле.
+        """
+        profiler = self.profiler
+        with profiler.stage('search_products') as stage:
+            with profiler.stage('search_products.find_rows'):
+                found = self._find_rows(search_term, ranges)
+            stage.rows = len(found)
+
+            if not found:
+                return 0, []
+
+            reverse = sort_by.startswith('-')
+            sort_field = sort_by.lstrip('-')
+
+            if sort_field not in ProductStore.COLUMNS:
+                sort_field = 'price_per_kg'
+
+            with profiler.stage('search_products.sort', rows=len(found)):
+                return len(found), self.products.sorted_rows(found, sort_field, reverse, limit)
+
+    def fuzzy_search_products(self, search_term: str, limit: int = 20, min_score: float = 0.5,
+                              stemming: bool = False) -> List[Tuple[Product, float]]:
+        """
+        Ищет продукты с названиями, похожими на запрос, допуская опечатки и сокращения.
+
+        Args:
+            search_term: Строка для поиска
+            limit: Максимальное количество возвращаемых продуктов
+            min_score: Минимальная доля триграмм запроса, найденных в названии, от 0 до 1
+            stemming: Отбрасывать окончания русских слов запроса, чтобы
+                находить другие формы слов
+
+        Returns:
+            Пары (продукт, оценка сходства) по убыванию оценки
+        """
+        alive = self.products.alive if self.products.dead_rows else None
+        matches = self._index.similar(search_term, limit, min_score, stemming, alive)
+        return [(self.products[row], score) for row, score in matches]
+
+    def count_products(self, search_term: str, ranges: Optional[Dict[str, ValueRange]] = None) -> int:
+        """Возвращает количество продуктов, подходящих под условия search_products."""
+        return len(self._find_rows(search_term, ranges))
+
+    def cheapest_offers(self, search_term: str = '', min_suppliers: int = 1) -> List[OfferGroup]:
+        """
+        Сравнивает предложения разных поставщиков по каждому продукту.
+
+        Args:
+            search_term: Если задан, сравниваются только продукты с этой подстрокой в названии
+            min_suppliers: Минимальное количество файлов-поставщиков для продукта
+
+        Returns:
+            Группы предложений с минимальной, медианной и максимальной ценой за кг
+            и файлом с самым дешёвым предложением
+        """
+        rows = self._find_rows(search_term) if search_term else None
+        return cheapest_offers(self.products, rows, min_suppliers)
+
+    def _find_rows(self, search_term: str, ranges: Optional[Dict[str, ValueRange]] = None) -> List[int]:
+        """
+        Возвращает номера неудалённых строк, подходящих под название и диапазоны.
+
+        Сначала выбирается самое избирательное условие: диапазон с наименьшим
+        числом строк по индексу или поиск по названию, если его оценка меньше.
+        Остальные условия проверяются только для отобранных строк.
+        """
+        ranges = {field: bounds for field, bounds in (ranges or {}).items()
+                  if bounds is not None and tuple(bounds) != (None, None)}
+        for field in ranges:
+            if field not in self.RANGE_FIELDS:
+                raise ValueError(f"Поиск по диапазону недоступен для поля: {field}")
+
+        if not ranges:
+            return self.products.live(self._index.search(search_term))
+
+        indexes = {field: self._sorted_index(field) for field in ranges}
+        field = min(ranges, key=lambda f: indexes[f].count(*ranges[f]))
+
+        if search_term and self._index.estimate(search_term) < indexes[field].count(*ranges[field]):
+            rows = self.products.live(self._index.search(search_term))
+            pending = ranges
+        else:
+            rows = indexes[field].range(*ranges[field])
+            if search_term:
+                rows = self._index.filter(rows, search_term)
+            pending = {f: bounds for f, bounds in ranges.items() if f != field}
+
+        for f, (low, high) in pending.items():
+            column = self.products.column(f)
+            low = float('-inf') if low is None else low
+            high = float('inf') if high is None else high
+            rows = [row for row in rows if low <= column[row] <= high]
+
+        return list(rows)
+
+    def _sorted_index(self, field: str) -> SortedIndex:
+        """Возвращает индекс поля для запросов по диапазону, перестраивая его после изменений данных."""
+        version = self.products.version
+        cached = self._sorted_indexes.get(field)
+        if cached is None or cached[0] != version:
+            cached = self._sorted_indexes[field] = (version, SortedIndex(self.products.column(field),
+                                                                         self.products.rows()))
+        return cached[1]
+
+
+@contextmanager
+def _deferred_interrupt() -> Generator[None, None, None]:
+    """
+    Откладывает Ctrl+C до конца блока.
+
+    Сигнал обрабатывается только в главном потоке, поэтому в остальных
+    потоках блок выполняется как есть.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    received = []
+    previous = signal.signal(signal.SIGINT, lambda signum, frame: received.append(frame))
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
+        if received and callable(previous):
+            previous(signal.SIGINT, received[0])
+
+
+def _file_stat(file: Path) -> FileStat:
+    """Возвращает размер и время изменения файла."""
+    stat = file.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _load_price_file(file: Path, profile: bool = False, profile_memory: bool = False
+                     ) -> Tuple[Optional[ParsedColumns], ErrorReport, Optional[Dict[str, StageStats]]]:
+    """
+    Читает и разбирает один прайс-лист.
+
+    Функция вынесена на уровень модуля, чтобы её можно было передать в пул процессов.
+
+    Args:
+        profile: Замерить чтение файла, определение столбцов и разбор.
+            Замеры возвращаются вместе с результатом, так как пул процессов
+            не видит профилировщик основного процесса.
+        profile_memory: Замерять также пик памяти.
+
+    Returns:
+        Кортеж (столбцы файла, отчёт об ошибках, замеры этапов или None).
+        Если файл прочитать не удалось, вместо столбцов возвращается None.
+    """
+    errors = ErrorReport()
+    profiler = Profiler(memory=profile_memory) if profile else NULL_PROFILER
+    read = StageStats(calls=1)
+    columns = None
+    try:
+        if profile:
+            read.bytes_read = file.stat().st_size
+        with profiler.stage('process_file', bytes_read=read.bytes_read) as stage, \
+                open(file, 'r', encoding='utf-8', newline='') as f:
+            # При замерах чтение отделяется от разбора: строки подаются
+            # csv.reader из блоков, время чтения которых учитывается отдельно
+            reader = csv.reader(_timed_lines(f, read) if profile else f, delimiter=',')
+            columns = PriceMachine._process_file(reader, file.name, errors, profiler)
+            stage.rows = len(columns[0])
+    except Exception as e:
+        errors.add(f"Ошибка при обработке файла {file}: {e}")
+    finally:
+        profiler.close()
+
+    if not profile:
+        return columns, errors, None
+    profiler.add('process_file.read', read)
+    return columns, errors, profiler.stages
+
+
+def _timed_lines(f, stats: StageStats, block_size: int = 1 << 20) -> Generator[str, None, None]:
+    """Читает файл блоками, учитывая время чтения в stats, и отдаёт его построчно."""
+    tail = ''
+    while True:
+        start = time.perf_counter()
+        block = f.read(block_size)
+        stats.seconds += time.perf_counter() - start
+        if not block:
+            break
+        lines = (tail + block).split('\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    if tail:
+        yield tail
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+import heapq
+import sys
+from array import array
+from dataclasses import dataclass
+from itertools import compress
+from typing import List, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+
+# Запись о продукте для потоковой обработки и экспорта: название, цена, вес, файл, цена за кг
+PriceRecord = Tuple[str, float, float, str, float]
+
+
+@dataclass
+class Product:
+    """Класс для хранения информации о продукте."""
+    name: str
+    price: float
+    weight: float
+    source_file: str
+    price_per_kg: float = 0.0
+
+    def __post_init__(self):
+        """Автоматически рассчитываем цену за кг при инициализации."""
+        self.price_per_kg = self.price / self.weight if self.weight > 0 else 0
+
+
+class ProductStore:
+    """
+    Колоночное хранилище продуктов.
+
+    Цены, веса и цены за кг лежат в типизированных массивах, имена продуктов
+    интернируются, а имена файлов-источников хранятся в словаре и
+    ссылаются из строк по номеру. Объекты Product создаются только по запросу.
+
+    Строки одного файла всегда занимают непрерывный диапазон. При удалении
+    файла его строки только помечаются удалёнными, чтобы номера остальных строк
+    не менялись; физически они убираются при уплотнении хранилища.
+    """
+
+    # Поля продукта и соответствующие им столбцы хранилища
+    COLUMNS = {'name': 'names', 'price': 'prices', 'weight': 'weights', 'price_per_kg': 'price_per_kg'}
+
+    def __init__(self):
+        """Создаёт пустое хранилище."""
+        self.names: List[str] = []
+        self.prices = array('d')
+        self.weights = array('d')
+        self.price_per_kg = array('d')
+        self.file_ids = array('I')
+        self.alive = bytearray()
+        self.source_files: List[str] = []
+        # Диапазоны строк загруженных файлов
+        self.segments: Dict[str, Tuple[int, int]] = {}
+        self.dead_rows = 0
+        # Увеличивается при каждом изменении строк, чтобы производные индексы знали, что устарели
+        self.version = 0
+        self._file_ids: Dict[str, int] = {}
+
+    @classmethod
+    def from_columns(cls, names: List[str], prices: array, weights: array, price_per_kg: array,
+                     file_ids: array, source_files: List[str],
+                     segments: Dict[str, Tuple[int, int]]) -> 'ProductStore':
+        """Создаёт хранилище из готовых столбцов без удалённых строк, например прочитанных из снимка."""
+        store = cls()
+        store.names = names
+        store.prices = prices
+        store.weights = weights
+        store.price_per_kg = price_per_kg
+        store.file_ids = file_ids
+        store.alive = bytearray(b'\x01') * len(names)
+        store.segments = dict(segments)
+        for source_file in source_files:
+            store._file_id(source_file)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.names) - self.dead_rows
+
+    def __getitem__(self, row: int) -> Product:
+        return self.product(row)
+
+    def __iter__(self) -> Iterator[Product]:
+        return (self.product(row) for row in self.rows())
+
+    @property
+    def row_count(self) -> int:
+        """Количество строк вместе с удалёнными, то есть граница номеров строк."""
+        return len(self.names)
+
+    def rows(self) -> Iterable[int]:
+        """Возвращает номера всех неудалённых строк по возрастанию."""
+        if not self.dead_rows:
+            return range(len(self.names))
+        return compress(range(len(self.names)), self.alive)
+
+    def live(self, rows: Iterable[int]) -> List[int]:
+        """Отбрасывает из rows удалённые строки."""
+        if not self.dead_rows:
+            return list(rows)
+        alive = self.alive
+        return [row for row in rows if alive[row]]
+
+    def extend(self, names: Sequence[str], prices: Sequence[float], weights: Sequence[float],
+               source_file: str) -> int:
+        """
+        Добавляет строки одного файла в хранилище.
+
+        Цена за кг рассчитывается одним проходом по всем добавляемым строкам.
+
+        Returns:
+            Номер первой добавленной строки.
+        """
+        # Прежние строки файла заменяются новыми
+        self.remove_files([source_file])
+
+        start = len(self.names)
+        file_id = self._file_id(source_file)
+
+        self.names.extend(map(sys.intern, names))
+        self.prices.extend(prices)
+        self.weights.extend(weights)
+        self.price_per_kg.extend([p / w if w > 0 else 0.0 for p, w in zip(prices, weights)])
+        self.file_ids.extend([file_id] * len(names))
+        self.alive.extend(b'\x01' * len(names))
+        self.segments[source_file] = (start, len(self.names))
+        self.version += 1
+
+        return start
+
+    def remove_files(self, source_files: Iterable[str]) -> int:
+        """
+        Помечает удалёнными строки, загруженные из указанных файлов.
+
+        Returns:
+            Количество удалённых строк.
+        """
+        removed = 0
+        for name in source_files:
+            segment = self.segments.pop(name, None)
+            if segment is not None:
+                start, end = segment
+                self.alive[start:end] = bytes(end - start)
+                removed += end - start
+        self.dead_rows += removed
+        if removed:
+            self.version += 1
+        return removed
+
+    def compact(self) -> Optional[array]:
+        """
+        Физически убирает удалённые строки.
+
+        Returns:
+            Массив, в котором для каждой прежней строки записан её новый номер
+            или -1 для удалённой строки. None, если удалённых строк не было.
+        """
+        if not self.dead_rows:
+            return None
+
+        mapping = array('q', [-1]) * len(self.names)
+        segments = {}
+        new_row = 0
+        for name, (start, end) in sorted(self.segments.items(), key=lambda item: item[1]):
+            mapping[start:end] = array('q', range(new_row, new_row + end - start))
+            segments[name] = (new_row, new_row + end - start)
+            new_row += end - start
+
+        keep = sorted(self.segments.values())
+        self.names = [name for start, end in keep for name in self.names[start:end]]
+        for attr in ('prices', 'weights', 'price_per_kg', 'file_ids'):
+            column = getattr(self, attr)
+            compacted = array(column.typecode)
+            for start, end in keep:
+                compacted.extend(column[start:end])
+            setattr(self, attr, compacted)
+
+        self.alive = bytearray(b'\x01') * len(self.names)
+        self.segments = segments
+        self.dead_rows = 0
+        self.version += 1
+        return mapping
+
+    def product(self, row: int) -> Product:
+        """Возвращает строку хранилища в виде объекта Product."""
+        return Product(
+            name=self.names[row],
+            price=self.prices[row],
+            weight=self.weights[row],
+            source_file=self.source_files[self.file_ids[row]],
+            price_per_kg=self.price_per_kg[row]
+        )
+
+    def records(self, rows: Iterable[int]) -> Iterator[PriceRecord]:
+        """Возвращает строки в виде кортежей PriceRecord, не создавая объектов Product."""
+        names, prices, weights = self.names, self.prices, self.weights
+        file_ids, source_files, price_per_kg = self.file_ids, self.source_files, self.price_per_kg
+        return ((names[row], prices[row], weights[row], source_files[file_ids[row]], price_per_kg[row])
+                for row in rows)
+
+    def column(self, field: str) -> Sequence:
+        """Возвращает столбец, по которому можно сортировать строки."""
+        if field not in self.COLUMNS:
+            raise ValueError(f"Неизвестное поле: {field}")
+        return getattr(self, self.COLUMNS[field])
+
+    def sorted_rows(self, rows: Iterable[int], field: str = 'price_per_kg', reverse: bool = False,
+                    limit: Optional[int] = None) -> List[int]:
+        """
+        Сортирует номера строк по значению поля.
+
+        Если задан limit, возвращаются только первые limit строк, которые
+        отбираются через кучу без сортировки всего набора. Порядок строк с
+        равными значениями такой же, как при полной сортировке.
+        """
+        key = self.column(field).__getitem__
+        if limit is None:
+            return sorted(rows, key=key, reverse=reverse)
+        if limit <= 0:
+            return []
+        select = heapq.nlargest if reverse else heapq.nsmallest
+        return select(limit, rows, key=key)
+
+    def _file_id(self, source_file: str) -> int:
+        """Возвращает номер файла-источника, регистрируя его при необходимости."""
+        file_id = self._file_ids.get(source_file)
+        if file_id is None:
+            file_id = self._file_ids[source_file] = len(self.source_files)
+            self.source_files.append(source_file)
+        return file_id
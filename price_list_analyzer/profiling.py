@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры по этапам работы PriceMachine: время, строки в секунду, прочитанные байты и пик памяти.
+
+Этап открывается контекстным менеджером Profiler.stage; вложенные этапы
+называются через точку ("load_prices.index") и входят во время
+объемлющего. Пик памяти считается через tracemalloc и включается только
+по запросу, так как трассировка заметно замедляет работу.
+
+Замеры не потокобезопасны: профилировщик рассчитан на одну загрузку или
+один запуск программы.
+"""
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+
+@dataclass
+class StageStats:
+    """Накопленные показатели одного этапа."""
+    calls: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+    bytes_read: int = 0
+    # Наибольший объём памяти, выделенной через tracemalloc во время этапа, в байтах
+    peak_memory: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def merge(self, other: 'StageStats') -> None:
+        """Добавляет показатели того же этапа, замеренные отдельно, например в другом процессе."""
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.rows += other.rows
+        self.bytes_read += other.bytes_read
+        self.peak_memory = max(self.peak_memory, other.peak_memory)
+
+
+# Выполняющиеся этапы всех профилировщиков процесса: пик tracemalloc общий
+_active: List['Stage'] = []
+
+
+class Stage:
+    """Выполняющийся этап. Количество строк и байт можно указать и после входа."""
+
+    __slots__ = ('profiler', 'name', 'rows', 'bytes_read', 'peak_memory', '_start')
+
+    def __init__(self, profiler: 'Profiler', name: str, rows: int = 0, bytes_read: int = 0):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+        self.bytes_read = bytes_read
+        self.peak_memory = 0
+        self._start = 0.0
+
+    def __enter__(self) -> 'Stage':
+        if tracemalloc.is_tracing():
+            # Пик до начала этапа запоминается для объемлющего этапа,
+            # после чего счётчик сбрасывается для этого
+            if _active:
+                _active[-1].peak_memory = max(_active[-1].peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        _active.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        seconds = time.perf_counter() - self._start
+        _active.pop()
+        if tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            if _active:
+                _active[-1].peak_memory = max(_active[-1].peak_memory, self.peak_memory)
+        self.profiler.add(self.name, StageStats(1, seconds, self.rows, self.bytes_read, self.peak_memory))
+
+
+class _NullStage:
+    """Этап выключенного профилировщика: ничего не замеряет."""
+
+    __slots__ = ('rows', 'bytes_read')
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+class Profiler:
+    """Собирает показатели этапов."""
+
+    def __init__(self, enabled: bool = True, memory: bool = False):
+        """
+        Args:
+            enabled: Выключенный профилировщик ничего не замеряет и почти не тратит времени.
+            memory: Замерять пик памяти через tracemalloc.
+        """
+        self.enabled = enabled
+        self.memory = memory and enabled
+        self.stages: Dict[str, StageStats] = {}
+        self._started_tracing = False
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stage(self, name: str, rows: int = 0, bytes_read: int = 0):
+        """Возвращает контекстный менеджер, замеряющий этап name."""
+        if not self.enabled:
+            return _NullStage()
+        return Stage(self, name, rows, bytes_read)
+
+    def add(self, name: str, stats: StageStats) -> None:
+        """Добавляет показатели этапа."""
+        current = self.stages.get(name)
+        if current is None:
+            self.stages[name] = StageStats(**asdict(stats))
+        else:
+            current.merge(stats)
+
+    def merge(self, stages: Optional[Dict[str, StageStats]]) -> None:
+        """Добавляет показатели, собранные другим профилировщиком."""
+        for name, stats in (stages or {}).items():
+            self.add(name, stats)
+
+    def close(self) -> None:
+        """Останавливает трассировку памяти, если её запускал этот профилировщик."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def report(self) -> dict:
+        """Возвращает показатели этапов в виде словаря для JSON."""
+        return {
+            'memory_traced': self.memory,
+            'stages': {name: dict(asdict(stats), rows_per_second=stats.rows_per_second)
+                       for name, stats in self.stages.items()},
+        }
+
+    def save(self, path: str) -> None:
+        """Записывает отчёт в JSON-файл."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def summary(self) -> str:
+        """Возвращает сводку по этапам в виде таблицы."""
+        lines = [f"{'Этап':36} | {'Вызовов':>7} | {'Время, с':>9} | {'Строк/с':>12} | {'МБ прочитано':>12} | {'Пик, МБ':>8}",
+                 "-" * 100]
+        for name in sorted(self.stages):
+            stats = self.stages[name]
+            peak = f"{stats.peak_memory / (1 << 20):8.1f}" if self.memory else f"{'-':>8}"
+            lines.append(f"{name:36} | {stats.calls:7} | {stats.seconds:9.3f} | {stats.rows_per_second:12,.0f} | "
+                         f"{stats.bytes_read / (1 << 20):12.1f} | {peak}")
+        return '\n'.join(lines)
+
+
+# Профилировщик по умолчанию: ничего не замеряет
+NULL_PROFILER = Profiler(enabled=False)
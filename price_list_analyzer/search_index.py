@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import List, Dict, Iterable, ItemsView, Optional, Sequence, Set, Tuple
+
+# Диапазон значений с включёнными границами; None - граница не задана
+ValueRange = Tuple[Optional[float], Optional[float]]
+
+
+_WORD_RE = re.compile(r'[\w%]+')
+
+# Окончания прилагательных и существительных, от длинных к коротким
+_RUSSIAN_ENDINGS = tuple(sorted({
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'его', 'ого',
+    'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+    'а', 'ев', 'ов', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ий', 'й', 'иям', 'ям',
+    'ием', 'ам', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+}, key=len, reverse=True))
+_RUSSIAN_VOWELS = set('аеиоуыэюяё')
+
+
+def trigrams(text: str) -> Set[str]:
+    """Возвращает множество триграмм строки."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def stem_russian(word: str) -> str:
+    """
+    Упрощённо отбрасывает окончание русского слова.
+
+    Снимается самое длинное окончание из списка, если в оставшейся основе
+    есть гласная и не меньше трёх букв: "российский", "российская" и
+    "российского" дают "российск".
+    """
+    for ending in _RUSSIAN_ENDINGS:
+        if word.endswith(ending):
+            stem = word[:-len(ending)]
+            if len(stem) >= 3 and _RUSSIAN_VOWELS.intersection(stem):
+                return stem
+    return word
+
+
+def query_trigrams(term: str, stemming: bool = False) -> Set[str]:
+    """
+    Возвращает триграммы запроса для нечёткого поиска.
+
+    Триграммы берутся по каждому слову отдельно, поэтому порядок слов и
+    знаки препинания между ними не влияют на результат.
+    """
+    words = _WORD_RE.findall(term.casefold())
+    if stemming:
+        words = [stem_russian(word) for word in words]
+    return set().union(*(trigrams(word) for word in words))
+
+
+class TrigramIndex:
+    """
+    Инвертированный индекс триграмм для поиска по подстроке.
+
+    Для каждой триграммы приведённого к нижнему регистру названия хранится
+    возрастающий массив номеров строк, в которых она встречается. Запрос
+    сначала сужается до строк из самого короткого списка, а затем каждая
+    строка-кандидат проверяется на точное вхождение подстроки.
+    """
+
+    def __init__(self):
+        """Создаёт пустой индекс."""
+        self.folded: List[str] = []
+        self._postings: Dict[str, array] = {}
+
+    @classmethod
+    def restore(cls, names: Iterable[str], postings: Dict[str, array]) -> 'TrigramIndex':
+        """Восстанавливает индекс из сохранённых списков строк без повторного разбора названий."""
+        index = cls()
+        index.folded = [name.casefold() for name in names]
+        index._postings = postings
+        return index
+
+    def __len__(self) -> int:
+        return len(self.folded)
+
+    def items(self) -> ItemsView[str, array]:
+        """Возвращает пары (триграмма, номера строк)."""
+        return self._postings.items()
+
+    def add(self, names: Iterable[str]) -> None:
+        """Добавляет в индекс названия, идущие следом за уже проиндексированными."""
+        self.merge(*self.prepare(names))
+
+    def prepare(self, names: Iterable[str]) -> Tuple[List[str], Dict[str, array]]:
+        """
+        Разбирает названия, идущие следом за уже проиндексированными, не меняя индекс.
+
+        Returns:
+            Приведённые названия и списки их строк по триграммам для merge.
+        """
+        folded_names = []
+        postings = {}
+        row = len(self.folded)
+        for name in names:
+            folded = name.casefold()
+            folded_names.append(folded)
+            for gram in trigrams(folded):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array('I')
+                posting.append(row)
+            row += 1
+        return folded_names, postings
+
+    def merge(self, folded_names: List[str], postings: Dict[str, array]) -> None:
+        """Добавляет в индекс результат prepare."""
+        self.folded.extend(folded_names)
+        own = self._postings
+        for gram, rows in postings.items():
+            posting = own.get(gram)
+            if posting is None:
+                own[gram] = rows
+            else:
+                posting.extend(rows)
+
+    def remap(self, mapping: array) -> None:
+        """
+        Перенумеровывает строки после удаления части строк из хранилища.
+
+        Args:
+            mapping: Новый номер для каждой прежней строки или -1 для удалённой.
+        """
+        self.folded = [name for row, name in enumerate(self.folded) if mapping[row] >= 0]
+
+        postings = {}
+        for gram, posting in self._postings.items():
+            remapped = array('I', [row for row in map(mapping.__getitem__, posting) if row >= 0])
+            if remapped:
+                postings[gram] = remapped
+        self._postings = postings
+
+    def search(self, term: str) -> List[int]:
+        """
+        Ищет строки, названия которых содержат подстроку term без учёта регистра.
+
+        Returns:
+            Номера найденных строк по возрастанию.
+        """
+        query = term.casefold()
+        grams = trigrams(query)
+
+        if not grams:
+            # Для запросов короче трёх символов индекс не помогает
+            return [row for row, name in enumerate(self.folded) if query in name]
+
+        candidates = min((self._postings.get(gram, ()) for gram in grams), key=len)
+        folded = self.folded
+        return [row for row in candidates if query in folded[row]]
+
+    def estimate(self, term: str) -> int:
+        """Возвращает верхнюю оценку количества строк, которые проверит search."""
+        grams = trigrams(term.casefold())
+        if not grams:
+            return len(self.folded)
+        return min(len(self._postings.get(gram, ())) for gram in grams)
+
+    def similar(self, term: str, limit: int = 20, min_score: float = 0.5, stemming: bool = False,
+                alive: Optional[Sequence[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Нечёткий поиск: ранжирует строки по доле общих с запросом триграмм.
+
+        Кандидаты берутся из списков строк самых редких триграмм запроса,
+        так что названия без общих с запросом триграмм не рассматриваются
+        вовсе. Оценка строки - доля триграмм запроса, найденных в названии; при
+        равной оценке выше идут названия короче, то есть с меньшим
+        количеством лишних триграмм.
+
+        Args:
+            limit: Максимальное количество результатов
+            min_score: Минимальная доля совпавших триграмм запроса
+            stemming: Отбрасывать окончания русских слов запроса
+            alive: Признаки неудалённых строк; строки с нулевым признаком пропускаются.
+
+        Returns:
+            Пары (номер строки, оценка от 0 до 1) по убыванию оценки.
+        """
+        grams = query_trigrams(term, stemming)
+        if not grams:
+            # Слишком короткий запрос: остаётся поиск по подстроке
+            rows = (row for row in self.search(term) if alive is None or alive[row])
+            return [(row, 1.0) for row in islice(rows, limit)]
+
+        postings = self._postings
+        total = len(grams)
+        needed = min(total, max(1, math.ceil(min_score * total)))
+
+        # Строка с needed общими триграммами обязательно встречается хотя бы
+        # в одном из total - needed + 1 самых коротких списков, поэтому
+        # кандидаты берутся только из них, а самые частые триграммы
+        # проверяются по самим названиям.
+        ordered = sorted(grams, key=lambda gram: len(postings.get(gram, ())))
+        candidates = set().union(*(postings.get(gram, ()) for gram in ordered[:total - needed + 1]))
+
+        folded = self.folded
+        # Названия повторяются у разных поставщиков, поэтому оценка считается один раз на название
+        scores: Dict[str, Tuple[int, float]] = {}
+        ranked = []
+        for row in candidates:
+            if alive is not None and not alive[row]:
+                continue
+            name = folded[row]
+            score = scores.get(name)
+            if score is None:
+                shared = sum(gram in name for gram in grams)
+                # Количество триграмм названия оценивается по его длине, чтобы не строить их множество
+                score = scores[name] = shared, shared / (total + max(len(name) - 2, shared) - shared)
+            if score[0] >= needed:
+                ranked.append((score, row))
+
+        best = heapq.nlargest(limit, ranked)
+        return [(row, shared / total) for (shared, _), row in best]
+
+    def filter(self, rows: Iterable[int], term: str) -> List[int]:
+        """Оставляет из rows строки, названия которых содержат подстроку term."""
+        query = term.casefold()
+        folded = self.folded
+        return [row for row in rows if query in folded[row]]
+
+
+class SortedIndex:
+    """
+    Вторичный индекс числового столбца для запросов по диапазону.
+
+    Хранит номера строк, упорядоченные по значению столбца, и сами значения
+    в том же порядке, так что границы диапазона находятся двоичным поиском,
+    а запрос выполняется за O(log n + k).
+    """
+
+    def __init__(self, column: Sequence[float], rows: Iterable[int]):
+        """Строит индекс по значениям column для строк rows."""
+        self.rows = array('I', sorted(rows, key=column.__getitem__))
+        self.keys = array('d', map(column.__getitem__, self.rows))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def bounds(self, low: Optional[float], high: Optional[float]) -> Tuple[int, int]:
+        """Возвращает границы среза rows со значениями из диапазона [low, high]."""
+        start = 0 if low is None else bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else bisect_right(self.keys, high)
+        return start, max(start, end)
+
+    def count(self, low: Optional[float], high: Optional[float]) -> int:
+        """Возвращает количество строк со значениями из диапазона."""
+        start, end = self.bounds(low, high)
+        return end - start
+
+    def range(self, low: Optional[float], high: Optional[float]) -> array:
+        """Возвращает номера строк со значениями из диапазона по возрастанию значения."""
+        start, end = self.bounds(low, high)
+        return self.rows[start:end]
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP-сервис запросов к загруженным прайс-листам.
+
+Прайсы загружаются и индексируются один раз, после чего сервис отвечает
+на запросы в формате JSON:
+
+    GET  /search?q=сыр&sort=price_per_kg&limit=20&offset=0&price_min=100&weight_max=1
+    GET  /fuzzy?q=сыр росийск&limit=20&min_score=0.5&stem=1
+    GET  /offers?q=сыр&min_suppliers=2&limit=50
+    GET  /status
+    POST /reload
+
+Каждый запрос обрабатывается в отдельном потоке и работает с тем экземпляром
+PriceMachine, который был текущим в момент его начала. Изменения в папке
+загружаются фоновым потоком в новый экземпляр (из снимка, с перечитыванием
+только изменённых файлов), который затем подменяет текущий одним
+присваиванием, поэтому читатели никогда не ждут перезагрузки.
+"""
+import json
+import threading
+import time
+import traceback
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from price_machine import PriceMachine
+from search_index import ValueRange
+
+# Количество результатов по умолчанию и наибольшее допустимое
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+
+class CatalogService:
+    """Загруженный каталог, который обновляется в фоне без блокировки запросов."""
+
+    def __init__(self, file_path: str = '', snapshot: Optional[str] = None, workers: int = 1,
+                 reload_interval: float = 30.0):
+        """
+        Args:
+            file_path: Путь к директории с прайсами
+            snapshot: Путь к файлу снимка для быстрой перезагрузки
+            workers: Количество процессов для разбора изменённых файлов
+            reload_interval: Период проверки папки на изменения в секундах
+        """
+        self.file_path = file_path
+        self.snapshot = snapshot
+        self.workers = workers
+        self.reload_interval = reload_interval
+        self.machine = PriceMachine()
+        self.loaded_at = 0.0
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Загружает каталог и запускает фоновую проверку изменений."""
+        self.machine = self._load()
+        self.loaded_at = time.time()
+
+        self._thread = threading.Thread(target=self._reload_loop, name='catalog-reload', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает фоновую проверку изменений."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def request_reload(self) -> None:
+        """Просит фоновый поток проверить папку немедленно."""
+        self._wake.set()
+
+    def reload(self) -> bool:
+        """
+        Загружает изменения папки в новый экземпляр и делает его текущим.
+
+        Returns:
+            True, если были изменения и каталог обновлён.
+        """
+        if not self.machine.pending_changes(self.file_path):
+            return False
+
+        machine = self._load()
+        # Присваивание атомарно: запросы, уже начатые со старым экземпляром,
+        # дорабатывают с ним, а новые получают новый.
+        self.machine = machine
+        self.loaded_at = time.time()
+        self.reloads += 1
+        return True
+
+    def status(self) -> dict:
+        """Возвращает сведения о загруженном каталоге."""
+        machine = self.machine
+        return {
+            'products': len(machine.products),
+            'files': len(machine.products.segments),
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+            'last_error': self.last_error,
+        }
+
+    def _load(self) -> PriceMachine:
+        """Загружает каталог в новый экземпляр и заранее строит его индексы."""
+        machine = PriceMachine()
+        machine.load_prices(self.file_path, self.workers, self.snapshot)
+        machine.build_indexes()
+        return machine
+
+    def _reload_loop(self) -> None:
+        """Периодически проверяет папку и перезагружает каталог при изменениях."""
+        while True:
+            self._wake.wait(self.reload_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                self.reload()
+                self.last_error = None
+            except Exception as e:
+                # Текущий каталог остаётся в работе до следующей удачной попытки
+                self.last_error = str(e)
+                print(f"Ошибка при перезагрузке каталога: {e}")
+
+
+def _int_param(params: Dict[str, List[str]], name: str, default: int, maximum: Optional[int] = None) -> int:
+    """Читает неотрицательный целый параметр запроса."""
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise ValueError(f"Параметр {name} должен быть целым числом") from None
+    if value < 0:
+        raise ValueError(f"Параметр {name} не может быть отрицательным")
+    return value if maximum is None else min(value, maximum)
+
+
+def _float_param(params: Dict[str, List[str]], name: str) -> Optional[float]:
+    """Читает необязательный числовой параметр запроса; допускается десятичная запятая."""
+    values = params.get(name)
+    if not values or not values[0]:
+        return None
+    try:
+        return float(values[0].replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"Параметр {name} должен быть числом") from None
+
+
+def _ranges(params: Dict[str, List[str]]) -> Dict[str, ValueRange]:
+    """Собирает диапазоны из параметров вида price_min и price_max."""
+    ranges = {}
+    for field in PriceMachine.RANGE_FIELDS:
+        bounds = _float_param(params, f"{field}_min"), _float_param(params, f"{field}_max")
+        if bounds != (None, None):
+            ranges[field] = bounds
+    return ranges
+
+
+def search(machine: PriceMachine, params: Dict[str, List[str]]) -> dict:
+    """Поиск по названию и диапазонам с сортировкой и постраничным выводом."""
+    term = params.get('q', [''])[0]
+    sort_by = params.get('sort', ['price_per_kg'])[0]
+    limit = _int_param(params, 'limit', DEFAULT_LIMIT, MAX_LIMIT)
+    offset = _int_param(params, 'offset', 0)
+    ranges = _ranges(params)
+
+    # Поиск выполняется один раз: по нему считается и общее количество, и страница
+    total, rows = machine.search_rows(term, sort_by, offset + limit, ranges)
+    return {
+        'total': total,
+        'offset': offset,
+        'items': [asdict(machine.products[row]) for row in rows[offset:]],
+    }
+
+
+def fuzzy(machine: PriceMachine, params: Dict[str, List[str]]) -> dict:
+    """Нечёткий поиск с ранжированием по сходству названий."""
+    term = params.get('q', [''])[0]
+    limit = _int_param(params, 'limit', DEFAULT_LIMIT, MAX_LIMIT)
+    min_score = _float_param(params, 'min_score')
+    stemming = params.get('stem', ['0'])[0].lower() in ('1', 'true', 'yes')
+
+    matches = machine.fuzzy_search_products(term, limit, 0.5 if min_score is None else min_score, stemming)
+    return {
+        'items': [dict(asdict(product), score=score) for product, score in matches],
+    }
+
+
+def offers(machine: PriceMachine, params: Dict[str, List[str]]) -> dict:
+    """Сравнение предложений поставщиков по продуктам."""
+    term = params.get('q', [''])[0]
+    min_suppliers = _int_param(params, 'min_suppliers', 1)
+    limit = _int_param(params, 'limit', DEFAULT_LIMIT, MAX_LIMIT)
+    offset = _int_param(params, 'offset', 0)
+
+    groups = machine.cheapest_offers(term, min_suppliers)
+    return {
+        'total': len(groups),
+        'offset': offset,
+        'items': [asdict(group) for group in groups[offset:offset + limit]],
+    }
+
+
+# Путь -> обработчик GET-запроса
+QUERIES: Dict[str, Callable[[PriceMachine, Dict[str, List[str]]], dict]] = {
+    '/search': search,
+    '/fuzzy': fuzzy,
+    '/offers': offers,
+}
+
+
+def make_handler(service: CatalogService) -> type:
+    """Создаёт класс обработчика запросов, привязанный к сервису."""
+
+    class CatalogHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == '/status':
+                self._send(200, service.status())
+                return
+
+            query = QUERIES.get(url.path)
+            if query is None:
+                self._send(404, {'error': f"Неизвестный путь: {url.path}"})
+                return
+
+            try:
+                # Весь запрос выполняется над одним экземпляром, даже если
+                # во время его обработки каталог будет перезагружен
+                self._send(200, query(service.machine, parse_qs(url.query)))
+            except ValueError as e:
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                # Непредвиденная ошибка не должна обрывать соединение без ответа
+                self.log_error("Ошибка при обработке %s: %r", self.path, e)
+                traceback.print_exc()
+                self._send(500, {'error': f"Внутренняя ошибка: {type(e).__name__}: {e}"})
+
+        def do_POST(self):
+            if urlsplit(self.path).path != '/reload':
+                self._send(404, {'error': f"Неизвестный путь: {self.path}"})
+                return
+            service.request_reload()
+            self._send(202, {'status': 'reload requested'})
+
+        def _send(self, status: int, body: dict) -> None:
+            """Отправляет ответ в формате JSON."""
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return CatalogHandler
+
+
+def serve(service: CatalogService, host: str = '127.0.0.1', port: int = 8080) -> None:
+    """Загружает каталог и обслуживает запросы до прерывания (Ctrl+C)."""
+    service.start()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    print(f"Загружено {len(service.machine.products)} продуктов, сервис слушает http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+def address(text: str) -> Tuple[str, int]:
+    """Разбирает адрес вида 'host:port' или 'port'."""
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import accumulate
+from typing import Dict, List, Tuple, Optional
+
+from product_store import ProductStore
+from search_index import TrigramIndex
+
+# Имя файла снимка в папке с прайсами
+SNAPSHOT_FILENAME = '.price_snapshot.bin'
+
+SNAPSHOT_MAGIC = b'PMSNAP01'
+SNAPSHOT_VERSION = 1
+
+# Сигнатура и длина JSON-заголовка
+_PREFIX = struct.Struct('<8sQ')
+# Выравнивание секций, чтобы массивы можно было читать прямо из отображения файла
+_ALIGNMENT = 8
+
+# Размер и время изменения файла-источника в наносекундах
+FileStat = Tuple[int, int]
+
+
+def save_snapshot(path: str, store: ProductStore, index: TrigramIndex, files: Dict[str, FileStat]) -> None:
+    """
+    Сохраняет столбцы хранилища и индекс поиска в бинарный файл снимка.
+
+    Файл состоит из сигнатуры, JSON-заголовка со сведениями о файлах-источниках
+    и смещениями секций, и самих секций - сырых массивов, выровненных по 8 байт.
+    Запись идёт во временный файл, который затем атомарно заменяет снимок.
+
+    Raises:
+        ValueError: Если в хранилище есть неуплотнённые удалённые строки.
+    """
+    if store.dead_rows:
+        raise ValueError("Перед сохранением снимка хранилище нужно уплотнить")
+
+    grams: List[str] = []
+    postings = array('I')
+    posting_offsets = array('Q', [0])
+    for gram, posting in index.items():
+        grams.append(gram)
+        postings.extend(posting)
+        posting_offsets.append(len(postings))
+
+    sections = {
+        'names': ''.join(store.names).encode('utf-8'),
+        'name_offsets': array('Q', accumulate(map(len, store.names), initial=0)),
+        'prices': store.prices,
+        'weights': store.weights,
+        'price_per_kg': store.price_per_kg,
+        'file_ids': store.file_ids,
+        'grams': ''.join(grams).encode('utf-8'),
+        'posting_offsets': posting_offsets,
+        'postings': postings,
+    }
+
+    header = {
+        'version': SNAPSHOT_VERSION,
+        'byteorder': sys.byteorder,
+        'rows': len(store),
+        'source_files': store.source_files,
+        'segments': store.segments,
+        'files': files,
+        'sections': {},
+    }
+
+    # Смещения секций отсчитываются от начала данных, а не от начала файла,
+    # поэтому их можно посчитать до того, как станет известна длина заголовка.
+    payload = []
+    offset = 0
+    for name, data in sections.items():
+        raw = data.tobytes() if isinstance(data, array) else data
+        typecode = data.typecode if isinstance(data, array) else 'B'
+        header['sections'][name] = [offset, len(raw), typecode, array(typecode).itemsize]
+        payload.append(raw)
+        offset = _align(offset + len(raw))
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = _align(_PREFIX.size + len(header_bytes))
+
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_PREFIX.pack(SNAPSHOT_MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b'\0' * (data_start - f.tell()))
+            for raw in payload:
+                f.write(raw)
+                written = f.tell() - data_start
+                f.write(b'\0' * (_align(written) - written))
+        os.replace(tmp_path, path)
+    except OSError:
+        # Недописанный снимок не оставляется занимать место, например на заполненном диске
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_snapshot(path: str) -> Optional[Tuple[ProductStore, TrigramIndex, Dict[str, FileStat]]]:
+    """
+    Загружает снимок, сохранённый save_snapshot.
+
+    Returns:
+        Кортеж (хранилище, индекс, сведения о файлах-источниках) или None,
+        если снимок отсутствует, повреждён или записан в несовместимом формате.
+    """
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _read_snapshot(mm)
+    except (OSError, ValueError, KeyError, UnicodeDecodeError):
+        return None
+
+
+def _read_snapshot(mm: mmap.mmap) -> Optional[Tuple[ProductStore, TrigramIndex, Dict[str, FileStat]]]:
+    """Разбирает отображённый в память файл снимка."""
+    magic, header_size = _PREFIX.unpack_from(mm)
+    if magic != SNAPSHOT_MAGIC:
+        return None
+
+    header = json.loads(mm[_PREFIX.size:_PREFIX.size + header_size].decode('utf-8'))
+    if header['version'] != SNAPSHOT_VERSION or header['byteorder'] != sys.byteorder:
+        return None
+
+    data_start = _align(_PREFIX.size + header_size)
+
+    def section(name: str):
+        offset, size, typecode, itemsize = header['sections'][name]
+        raw = mm[data_start + offset:data_start + offset + size]
+        if typecode == 'B':
+            return raw
+        if array(typecode).itemsize != itemsize:
+            raise ValueError(f"Несовместимый размер элемента секции {name}")
+        column = array(typecode)
+        column.frombytes(raw)
+        return column
+
+    names_blob = section('names').decode('utf-8')
+    name_offsets = section('name_offsets')
+    names = [sys.intern(names_blob[start:end]) for start, end in zip(name_offsets, name_offsets[1:])]
+
+    store = ProductStore.from_columns(names, section('prices'), section('weights'),
+                                      section('price_per_kg'), section('file_ids'),
+                                      header['source_files'],
+                                      {name: tuple(segment) for name, segment in header['segments'].items()})
+
+    grams_blob = section('grams').decode('utf-8')
+    posting_offsets = section('posting_offsets')
+    postings = section('postings')
+    index = TrigramIndex.restore(names, {
+        grams_blob[i * 3:i * 3 + 3]: postings[start:end]
+        for i, (start, end) in enumerate(zip(posting_offsets, posting_offsets[1:]))
+    })
+
+    if len(store) != header['rows']:
+        return None
+
+    files = {name: tuple(stat) for name, stat in header['files'].items()}
+    return store, index, files
+
+
+def _align(offset: int) -> int:
+    """Округляет смещение вверх до границы выравнивания."""
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковая обработка прайс-листов, которые не помещаются в память.
+
+Строки идут по цепочке файл -> разбор -> фильтр -> экспортёр и нигде не
+собираются целиком. Для вывода, отсортированного по цене за кг, используется
+внешняя сортировка слиянием: отсортированные порции не больше
+max_rows_in_memory строк сбрасываются во временные файлы и затем сливаются.
+"""
+import csv
+import heapq
+import os
+import pickle
+import tempfile
+from itertools import chain, islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, Generator, Iterable, Iterator, List, Optional
+
+from exporters import export_records
+from price_machine import PriceMachine, ErrorReport
+from product_store import PriceRecord
+from search_index import ValueRange
+
+# Количество строк в памяти по умолчанию при внешней сортировке
+DEFAULT_MAX_ROWS_IN_MEMORY = 500_000
+# Количество записей в одном блоке временного файла
+_SPILL_BATCH_ROWS = 4096
+
+_FIELD_POSITIONS = {'name': 0, 'price': 1, 'weight': 2, 'price_per_kg': 4}
+
+# Признак конца потока записей
+_END = object()
+
+
+def iter_file_records(file: Path, errors: ErrorReport) -> Generator[PriceRecord, None, None]:
+    """Построчно читает один прайс-лист, не загружая его в память целиком."""
+    source_file = file.name
+    try:
+        with open(file, 'r', encoding='utf-8', newline='') as f:
+            for names, prices, weights in PriceMachine._iter_chunks(csv.reader(f), source_file, errors):
+                for name, price, weight in zip(names, prices, weights):
+                    yield name, price, weight, source_file, price / weight if weight > 0 else 0.0
+    except Exception as e:
+        errors.add(f"Ошибка при обработке файла {file}: {e}")
+
+
+def iter_records(file_path: str = '', errors: Optional[Dict[str, ErrorReport]] = None) -> Iterator[PriceRecord]:
+    """
+    Построчно читает все прайс-листы папки.
+
+    Args:
+        file_path: Путь к директории с файлами. По умолчанию - текущая директория.
+        errors: Словарь, в который складываются отчёты об ошибках по файлам.
+    """
+    path = PriceMachine._price_dir(file_path)
+    for file in PriceMachine._price_files(path):
+        report = ErrorReport()
+        yield from iter_file_records(file, report)
+        if errors is not None and report:
+            errors[file.name] = report
+
+
+def filter_records(records: Iterable[PriceRecord], search_term: str = '',
+                   ranges: Optional[Dict[str, ValueRange]] = None) -> Iterator[PriceRecord]:
+    """Оставляет записи с подстрокой search_term в названии и значениями из диапазонов."""
+    query = search_term.casefold()
+    checks: List[Callable[[PriceRecord], bool]] = []
+
+    if query:
+        checks.append(lambda record: query in record[0].casefold())
+
+    for field, (low, high) in (ranges or {}).items():
+        if field not in PriceMachine.RANGE_FIELDS:
+            raise ValueError(f"Поиск по диапазону недоступен для поля: {field}")
+        position = _FIELD_POSITIONS[field]
+        low = float('-inf') if low is None else low
+        high = float('inf') if high is None else high
+        checks.append(lambda record, p=position, lo=low, hi=high: lo <= record[p] <= hi)
+
+    if not checks:
+        return iter(records)
+    return (record for record in records if all(check(record) for check in checks))
+
+
+def external_sort(records: Iterable[PriceRecord], sort_by: str = 'price_per_kg',
+                  max_rows_in_memory: int = DEFAULT_MAX_ROWS_IN_MEMORY,
+                  tmp_dir: Optional[str] = None) -> Generator[PriceRecord, None, None]:
+    """
+    Сортирует поток записей, держа в памяти не больше max_rows_in_memory записей.
+
+    Если все записи поместились в одну порцию, она сортируется в памяти.
+    Иначе каждая отсортированная порция записывается во временный файл,
+    а результат получается слиянием порций через heapq.merge.
+
+    Args:
+        sort_by: Поле для сортировки (name, price, weight, price_per_kg),
+            с префиксом '-' - по убыванию
+        tmp_dir: Папка для временных файлов. По умолчанию - системная.
+    """
+    if max_rows_in_memory <= 0:
+        raise ValueError("Количество строк в памяти должно быть положительным")
+
+    reverse = sort_by.startswith('-')
+    key = itemgetter(_FIELD_POSITIONS.get(sort_by.lstrip('-'), _FIELD_POSITIONS['price_per_kg']))
+    records = iter(records)
+
+    chunk = list(islice(records, max_rows_in_memory))
+    chunk.sort(key=key, reverse=reverse)
+    following = next(records, _END)
+
+    if following is _END:
+        yield from chunk
+        return
+
+    records = chain([following], records)
+    with tempfile.TemporaryDirectory(prefix='price_sort_', dir=tmp_dir) as spill_dir:
+        runs = []
+        while chunk:
+            run = os.path.join(spill_dir, f"run_{len(runs):05d}.bin")
+            _spill(run, chunk)
+            runs.append(run)
+            chunk = list(islice(records, max_rows_in_memory))
+            chunk.sort(key=key, reverse=reverse)
+
+        # Во время слияния в памяти держится только по одному блоку каждой порции
+        yield from heapq.merge(*(_read_run(run) for run in runs), key=key, reverse=reverse)
+
+
+def stream_export(file_path: str = '', filename: str = 'output.csv', search_term: str = '',
+                  ranges: Optional[Dict[str, ValueRange]] = None, sort_by: str = 'price_per_kg',
+                  max_rows_in_memory: int = DEFAULT_MAX_ROWS_IN_MEMORY,
+                  errors: Optional[Dict[str, ErrorReport]] = None) -> int:
+    """
+    Экспортирует все прайс-листы папки в отсортированном виде, не загружая их в память.
+
+    Формат определяется по расширению filename (.csv, .jsonl, .pmcol, .html).
+
+    Returns:
+        Количество записанных позиций.
+    """
+    records = filter_records(iter_records(file_path, errors), search_term, ranges)
+    return export_records(filename, external_sort(records, sort_by, max_rows_in_memory))
+
+
+def _spill(path: str, records: List[PriceRecord]) -> None:
+    """Записывает отсортированную порцию во временный файл блоками."""
+    with open(path, 'wb') as f:
+        for start in range(0, len(records), _SPILL_BATCH_ROWS):
+            pickle.dump(records[start:start + _SPILL_BATCH_ROWS], f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_run(path: str) -> Generator[PriceRecord, None, None]:
+    """Построчно читает порцию из временного файла."""
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
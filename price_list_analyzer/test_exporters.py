@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка экспорта в JSON Lines.
+
+Запуск: python -m unittest test_exporters
+"""
+import json
+import math
+import os
+import tempfile
+import unittest
+
+from exporters import write_jsonl
+
+
+class WriteJsonlTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, 'export.jsonl')
+
+    def read(self):
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_round_trip(self):
+        records = [('Сыр "Российский"', 0.1, 0.3, 'price_1.csv', 1 / 3)]
+        self.assertEqual(write_jsonl(self.filename, records), 1)
+
+        self.assertEqual(self.read(), [{'name': 'Сыр "Российский"', 'price': 0.1, 'weight': 0.3,
+                                        'source_file': 'price_1.csv', 'price_per_kg': 1 / 3}])
+
+    def test_non_finite_values_round_trip(self):
+        """NaN и бесконечности записываются как в json.dumps и читаются json.loads обратно."""
+        nan, inf = float('nan'), float('inf')
+        records = [('Молоко', nan, 1.0, 'price_1.csv', nan),
+                   ('Кефир', inf, -inf, 'price_2.csv', 0.0),
+                   ('Творог', 120.5, 0.5, 'price_1.csv', 241.0)]
+        self.assertEqual(write_jsonl(self.filename, records), 3)
+
+        milk, kefir, curd = self.read()
+        self.assertTrue(math.isnan(milk['price']))
+        self.assertEqual(milk['weight'], 1.0)
+        self.assertTrue(math.isnan(milk['price_per_kg']))
+        self.assertEqual((kefir['price'], kefir['weight'], kefir['price_per_kg']), (inf, -inf, 0.0))
+        self.assertEqual(curd, {'name': 'Творог', 'price': 120.5, 'weight': 0.5,
+                                'source_file': 'price_1.csv', 'price_per_kg': 241.0})
+
+    def test_output_is_strict_json(self):
+        """Строки без NaN и бесконечностей не содержат нестандартных токенов."""
+        write_jsonl(self.filename, [('Масло', 99.9, 0.18, 'price_1.csv', 555.0)])
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            json.loads(f.readline(), parse_constant=self.fail)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка загрузки прайс-листов, поиска и сравнения предложений.
+
+Запуск: python -m unittest test_price_machine
+"""
+import os
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from price_machine import PriceMachine, ErrorReport
+from streaming import iter_file_records
+
+
+def write_price(directory: str, name: str, lines) -> str:
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write('\n'.join(lines) + '\n')
+    return path
+
+
+def random_price_lines(seed: int, count: int):
+    """Строки прайса с различными ценами, весами и ценами за кг, чтобы порядок сортировки был однозначным."""
+    rng = random.Random(seed)
+    prices = rng.sample(range(10, 100_000), count)
+    weights = rng.sample(range(1, 10_000), count)
+    return ['товар,цена,вес'] + [f'Товар {seed}-{i},{price},{weight / 1000}'
+                                 for i, (price, weight) in enumerate(zip(prices, weights))]
+
+
+class LoadPricesTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def load(self) -> PriceMachine:
+        pm = PriceMachine()
+        pm.load_prices(self.directory)
+        return pm
+
+    def test_blank_lines_are_skipped(self):
+        """Пустые строки, в том числе перед заголовком и в конце файла, не считаются ошибками."""
+        write_price(self.directory, 'price_1.csv',
+                    ['', 'товар,цена,вес', 'Сыр,300,0.5', '', 'Молоко,80,1', '', ''])
+
+        pm = self.load()
+
+        self.assertEqual(sorted(product.name for product in pm.products), ['Молоко', 'Сыр'])
+        self.assertNotIn('price_1.csv', pm.errors)
+
+    def test_blank_lines_keep_fast_path(self):
+        """Пустая строка в пачке с ошибочной строкой не попадает в отчёт об ошибках."""
+        lines = ['товар,цена,вес'] + [f'Товар {i},{i + 1},1' for i in range(PriceMachine.PARSE_CHUNK_ROWS)]
+        lines[10] = ''
+        lines[20] = 'Брак,дорого,1'
+        write_price(self.directory, 'price_1.csv', lines)
+
+        pm = self.load()
+
+        self.assertEqual(len(pm.products), PriceMachine.PARSE_CHUNK_ROWS - 2)
+        self.assertEqual(pm.errors['price_1.csv'].count, 1)
+
+    def test_streaming_skips_blank_lines(self):
+        path = write_price(self.directory, 'price_1.csv', ['товар,цена,вес', '', 'Сыр,300,0.5', ''])
+        errors = ErrorReport()
+
+        records = list(iter_file_records(Path(path), errors))
+
+        self.assertEqual(records, [('Сыр', 300.0, 0.5, 'price_1.csv', 600.0)])
+        self.assertFalse(errors)
+
+
+class RefreshTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        write_price(self.directory, 'price_1.csv', ['товар,цена,вес', 'Сыр,300,0.5'])
+        write_price(self.directory, 'price_2.csv', ['товар,цена,вес', 'Молоко,80,1'])
+        self.pm = PriceMachine()
+        self.pm.load_prices(self.directory)
+
+    def names(self):
+        return sorted(product.name for product in self.pm.products)
+
+    def test_unchanged_folder(self):
+        changes = self.pm.refresh(self.directory)
+
+        self.assertFalse(changes)
+        self.assertEqual(self.names(), ['Молоко', 'Сыр'])
+
+    def test_added_modified_deleted(self):
+        write_price(self.directory, 'price_3.csv', ['товар,цена,вес', 'Хлеб,50,0.4'])
+        write_price(self.directory, 'price_1.csv', ['товар,цена,вес', 'Сыр плавленый,120,0.2', 'Масло,200,0.18'])
+        os.remove(os.path.join(self.directory, 'price_2.csv'))
+
+        changes = self.pm.refresh(self.directory)
+
+        self.assertEqual(changes.added, ['price_3.csv'])
+        self.assertEqual(changes.modified, ['price_1.csv'])
+        self.assertEqual(changes.deleted, ['price_2.csv'])
+        self.assertEqual(self.names(), ['Масло', 'Сыр плавленый', 'Хлеб'])
+        self.assertEqual([p.name for p in self.pm.search_products('сыр')], ['Сыр плавленый'])
+        self.assertEqual(self.pm.search_products('молоко'), [])
+
+    def test_empty_folder(self):
+        """После удаления всех файлов refresh убирает все строки, а не выбрасывает ошибку."""
+        for name in ('price_1.csv', 'price_2.csv'):
+            os.remove(os.path.join(self.directory, name))
+
+        changes = self.pm.refresh(self.directory)
+
+        self.assertEqual(sorted(changes.deleted), ['price_1.csv', 'price_2.csv'])
+        self.assertEqual(len(self.pm.products), 0)
+
+
+class SearchTest(unittest.TestCase):
+    FIELDS = ('name', 'price', 'weight', 'price_per_kg')
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        write_price(directory.name, 'price_1.csv', random_price_lines(1, 300))
+        write_price(directory.name, 'price_2.csv', random_price_lines(2, 300))
+        cls.pm = PriceMachine()
+        cls.pm.load_prices(directory.name)
+        cls.all = list(cls.pm.products)
+
+    def full_sort(self, products, sort_by):
+        field = sort_by.lstrip('-')
+        return sorted(products, key=lambda p: getattr(p, field), reverse=sort_by.startswith('-'))
+
+    def test_top_k_matches_full_sort(self):
+        """Частичная сортировка с limit и offset даёт тот же срез, что и полная сортировка."""
+        for sort_by in self.FIELDS + tuple('-' + field for field in self.FIELDS):
+            expected = self.full_sort(self.all, sort_by)
+            for limit, offset in ((1, 0), (10, 0), (10, 25), (50, 580), (700, 0)):
+                with self.subTest(sort_by=sort_by, limit=limit, offset=offset):
+                    found = self.pm.search_products('', sort_by, limit=limit, offset=offset)
+                    self.assertEqual(found, expected[offset:offset + limit])
+
+    def test_top_k_with_search_term(self):
+        expected = self.full_sort([p for p in self.all if 'товар 2-1' in p.name.casefold()], '-price')
+
+        self.assertEqual(self.pm.search_products('Товар 2-1', '-price', limit=5, offset=3), expected[3:8])
+
+    def test_ranges_match_brute_force(self):
+        cases = [
+            {'price': (1000, 20_000)},
+            {'price': (None, 500)},
+            {'weight': (5, None)},
+            {'price_per_kg': (10_000, 50_000), 'weight': (1, 3)},
+            {'price': (50_000, 50_000)},
+            {'price': (None, None)},
+        ]
+        for ranges in cases:
+            for term in ('', 'товар 1-'):
+                with self.subTest(ranges=ranges, term=term):
+                    expected = [p for p in self.all if term in p.name.casefold() and all(
+                        (low is None or low <= getattr(p, field)) and (high is None or getattr(p, field) <= high)
+                        for field, (low, high) in ranges.items())]
+
+                    found = self.pm.search_products(term, 'price', ranges=ranges)
+
+                    self.assertEqual(found, self.full_sort(expected, 'price'))
+                    self.assertEqual(self.pm.count_products(term, ranges), len(expected))
+
+    def test_unknown_range_field(self):
+        with self.assertRaises(ValueError):
+            self.pm.search_products('', ranges={'name': ('а', 'я')})
+
+
+class CheapestOffersTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        write_price(directory.name, 'price_1.csv',
+                    ['товар,цена,вес', 'Сыр Российский 500 г,300,0.5', 'Хлеб,50,0.4', 'Соль,20,0'])
+        write_price(directory.name, 'price_2.csv',
+                    ['товар,цена,вес', '"сыр российский, 0,5кг",250,0.5', 'Сыр  Российский 500 г,280,0.5'])
+        write_price(directory.name, 'price_3.csv', ['товар,цена,вес', 'СЫР РОССИЙСКИЙ 0.5 кг,400,0.5'])
+        self.pm = PriceMachine()
+        self.pm.load_prices(directory.name)
+
+    def test_groups_by_normalized_name(self):
+        offers = self.pm.cheapest_offers()
+
+        self.assertEqual([group.name for group in offers], ['сыр российский 0.5кг', 'хлеб'])
+        cheese = offers[0]
+        self.assertEqual((cheese.offers, cheese.suppliers), (4, 3))
+        self.assertEqual(cheese.min_price_per_kg, 500)
+        self.assertEqual(cheese.median_price_per_kg, 580)
+        self.assertEqual(cheese.max_price_per_kg, 800)
+        self.assertEqual(cheese.best_source_file, 'price_2.csv')
+
+    def test_min_suppliers_and_search_term(self):
+        self.assertEqual([group.name for group in self.pm.cheapest_offers(min_suppliers=2)],
+                         ['сыр российский 0.5кг'])
+        self.assertEqual([group.name for group in self.pm.cheapest_offers('хлеб')], ['хлеб'])
+
+
+if __name__ == '__main__':
+    unittest.main()
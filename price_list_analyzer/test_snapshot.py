@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка снимков загруженных прайс-листов.
+
+Запуск: python -m unittest test_snapshot
+"""
+import os
+import tempfile
+import unittest
+
+from price_machine import PriceMachine
+from snapshot import SNAPSHOT_FILENAME, load_snapshot
+from test_price_machine import write_price
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.snapshot = os.path.join(self.directory, SNAPSHOT_FILENAME)
+        write_price(self.directory, 'price_1.csv', ['товар,цена,вес', 'Сыр Российский,300,0.5', 'Хлеб,50,0.4'])
+        write_price(self.directory, 'price_2.csv', ['товар,цена,вес', 'Молоко,80,1'])
+
+    def load(self) -> PriceMachine:
+        pm = PriceMachine()
+        pm.load_prices(self.directory, snapshot=self.snapshot)
+        return pm
+
+    def test_round_trip(self):
+        saved = self.load()
+        self.assertTrue(os.path.exists(self.snapshot))
+
+        store, index, files = load_snapshot(self.snapshot)
+
+        self.assertEqual(list(store), list(saved.products))
+        self.assertEqual(files, saved._processed_files)
+        self.assertEqual(sorted(index.search('сыр')), sorted(saved._index.search('сыр')))
+
+        restored = self.load()
+        self.assertEqual(list(restored.products), list(saved.products))
+        self.assertEqual([p.name for p in restored.search_products('сыр')], ['Сыр Российский'])
+        self.assertEqual([p.name for p, _ in restored.fuzzy_search_products('сыр росийский')], ['Сыр Российский'])
+
+    def test_stale_snapshot(self):
+        """Файлы, изменённые или удалённые после записи снимка, перечитываются, а снимок обновляется."""
+        self.load()
+        write_price(self.directory, 'price_1.csv', ['товар,цена,вес', 'Сыр Гауда,450,0.45'])
+        os.remove(os.path.join(self.directory, 'price_2.csv'))
+        write_price(self.directory, 'price_3.csv', ['товар,цена,вес', 'Кефир,70,0.9'])
+
+        pm = self.load()
+
+        self.assertEqual(sorted(p.name for p in pm.products), ['Кефир', 'Сыр Гауда'])
+        self.assertEqual(pm.search_products('хлеб'), [])
+        self.assertEqual(sorted(load_snapshot(self.snapshot)[2]), ['price_1.csv', 'price_3.csv'])
+
+    def test_corrupt_snapshot(self):
+        """Повреждённый или обрезанный снимок не читается, и данные загружаются из CSV."""
+        expected = sorted(p.name for p in self.load().products)
+        with open(self.snapshot, 'rb') as f:
+            data = f.read()
+
+        for damaged in (b'', b'garbage' * 10, data[:len(data) // 2], b'\0' * len(data)):
+            with self.subTest(size=len(damaged)):
+                with open(self.snapshot, 'wb') as f:
+                    f.write(damaged)
+
+                self.assertIsNone(load_snapshot(self.snapshot))
+                self.assertEqual(sorted(p.name for p in self.load().products), expected)
+                self.assertIsNotNone(load_snapshot(self.snapshot))
+
+    def test_missing_snapshot(self):
+        self.assertIsNone(load_snapshot(os.path.join(self.directory, 'missing.bin')))
+
+
+if __name__ == '__main__':
+    unittest.main()
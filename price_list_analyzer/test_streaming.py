@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка внешней сортировки.
+
+Запуск: python -m unittest test_streaming
+"""
+import os
+import random
+import tempfile
+import unittest
+
+from streaming import external_sort, filter_records
+
+
+def make_records(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    prices = rng.sample(range(10, 100_000), count)
+    weights = rng.sample(range(1, 10_000), count)
+    return [(f'Товар {i}', float(price), weight / 1000, f'price_{i % 3}.csv', price / (weight / 1000))
+            for i, (price, weight) in enumerate(zip(prices, weights))]
+
+
+class ExternalSortTest(unittest.TestCase):
+    FIELDS = {'name': 0, 'price': 1, 'weight': 2, 'price_per_kg': 4}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.tmp_dir = directory.name
+        self.records = make_records(100)
+
+    def test_matches_sorted(self):
+        """Слияние порций по 7 строк даёт тот же порядок, что и sorted, а временные файлы удаляются."""
+        for field, position in self.FIELDS.items():
+            for reverse in (False, True):
+                sort_by = '-' + field if reverse else field
+                with self.subTest(sort_by=sort_by):
+                    result = list(external_sort(iter(self.records), sort_by, max_rows_in_memory=7,
+                                                tmp_dir=self.tmp_dir))
+
+                    self.assertEqual(result, sorted(self.records, key=lambda r: r[position], reverse=reverse))
+                    self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_chunk_boundaries(self):
+        for count in (0, 1, 6, 7, 8, 14, 15):
+            with self.subTest(count=count):
+                records = self.records[:count]
+                result = list(external_sort(records, 'price', max_rows_in_memory=7, tmp_dir=self.tmp_dir))
+                self.assertEqual(result, sorted(records, key=lambda r: r[1]))
+
+    def test_with_filter(self):
+        records = filter_records(self.records, 'товар 1', {'price': (None, 50_000)})
+        expected = sorted((r for r in self.records if r[0].startswith('Товар 1') and r[1] <= 50_000),
+                          key=lambda r: r[4])
+
+        self.assertEqual(list(external_sort(records, max_rows_in_memory=3, tmp_dir=self.tmp_dir)), expected)
+
+    def test_non_positive_limit(self):
+        with self.assertRaises(ValueError):
+            list(external_sort(self.records, max_rows_in_memory=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш ответов API прогнозов: LRU в памяти и постоянный уровень на диске.
+
+Ключ кэша - координаты, округлённые до ячейки сетки grid градусов, и
+параметры запроса (limit, hours, extra, lang), поэтому магазины,
+стоящие в одной ячейке, получают один прогноз. Каждая запись хранит
+время получения и свой срок жизни ttl:
+
+    свежая      - моложе ttl, отдаётся без запроса к API;
+    устаревшая  - моложе ttl + stale_while_revalidate, отдаётся сразу,
+                  а клиент обновляет её в фоне;
+    просроченная - требует запроса; если запрос не удался, клиент всё
+                  равно может отдать её вместо ошибки.
+
+Диск служит вторым уровнем: по одному JSON-файлу на ключ, запись через
+временный файл и os.replace, так что прерванный запуск не оставляет
+повреждённых файлов. Кэш не потокобезопасен и рассчитан на один
+цикл событий asyncio.
+"""
+import hashlib
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# Размер ячейки сетки в градусах: 0.01° - около километра
+DEFAULT_GRID = 0.01
+# Срок жизни записи, с: прогноз обновляется не чаще, чем раз в полчаса
+DEFAULT_TTL = 30 * 60
+# Сколько после истечения ttl запись ещё отдаётся, пока обновляется в фоне, с
+DEFAULT_STALE_WHILE_REVALIDATE = 2 * 60 * 60
+# Наибольшее количество записей в памяти
+DEFAULT_MAX_ENTRIES = 1024
+
+# Параметры, которые не входят в ключ: координаты заменяются ячейкой сетки
+_LOCATION_PARAMS = ('lat', 'lon')
+
+
+@dataclass
+class CacheEntry:
+    """Закэшированный ответ API."""
+    data: dict
+    fetched_at: float
+    ttl: float
+
+    @property
+    def expires_at(self) -> float:
+        return self.fetched_at + self.ttl
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+    def age(self, now: float) -> float:
+        return now - self.fetched_at
+
+
+class ForecastCache:
+    """Двухуровневый кэш ответов API прогнозов."""
+
+    def __init__(self, directory: Optional[str] = None, grid: float = DEFAULT_GRID, ttl: float = DEFAULT_TTL,
+                 stale_while_revalidate: float = DEFAULT_STALE_WHILE_REVALIDATE,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            directory: Папка дискового уровня; None - только память
+            grid: Размер ячейки сетки координат в градусах
+            ttl: Срок жизни записи по умолчанию в секундах
+            stale_while_revalidate: Сколько секунд после истечения ttl запись отдаётся с обновлением в фоне
+            max_entries: Наибольшее количество записей в памяти
+        """
+        if grid <= 0:
+            raise ValueError("Размер ячейки сетки должен быть положительным")
+        if max_entries <= 0:
+            raise ValueError("Размер кэша должен быть положительным")
+
+        self.directory = directory
+        self.grid = grid
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, lat: float, lon: float, params: Dict[str, object]) -> str:
+        """Возвращает ключ кэша для координат и параметров запроса."""
+        cell = f"{math.floor(lat / self.grid + 0.5)}:{math.floor(lon / self.grid + 0.5)}@{self.grid:g}"
+        query = '&'.join(f"{name}={_param_value(value)}" for name, value in sorted(params.items())
+                         if name not in _LOCATION_PARAMS)
+        return f"{cell}?{query}"
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Возвращает запись по ключу из памяти или с диска, независимо от её возраста."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+
+        entry = self._read(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, data: dict, ttl: Optional[float] = None, fetched_at: Optional[float] = None) -> CacheEntry:
+        """Сохраняет ответ в памяти и на диске."""
+        entry = CacheEntry(data, time.time() if fetched_at is None else fetched_at, self.ttl if ttl is None else ttl)
+        self._remember(key, entry)
+        self._write(key, entry)
+        return entry
+
+    def is_revalidatable(self, entry: CacheEntry, now: float) -> bool:
+        """Проверяет, можно ли отдать устаревшую запись, обновляя её в фоне."""
+        return now < entry.expires_at + self.stale_while_revalidate
+
+    def prune(self, max_age: Optional[float] = None) -> int:
+        """
+        Удаляет с диска записи старше max_age секунд; по умолчанию - те,
+        что уже нельзя отдать даже с обновлением в фоне.
+
+        Returns:
+            Количество удалённых файлов.
+        """
+        if not self.directory:
+            return 0
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            entry = self._load(path)
+            if entry is not None:
+                limit = entry.ttl + self.stale_while_revalidate if max_age is None else max_age
+                if entry.age(now) < limit:
+                    continue
+            os.remove(path)
+            removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        """Кладёт запись в память, вытесняя давно не использованные."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        # Ключ содержит символы, недопустимые в именах файлов, поэтому имя - хеш ключа
+        return os.path.join(self.directory, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json")
+
+    def _read(self, key: str) -> Optional[CacheEntry]:
+        """Читает запись с диска; повреждённый или чужой файл считается промахом."""
+        if not self.directory:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        return self._load(path, key)
+
+    @staticmethod
+    def _load(path: str, key: Optional[str] = None) -> Optional[CacheEntry]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if key is not None and stored['key'] != key:
+                return None
+            return CacheEntry(stored['data'], float(stored['fetched_at']), float(stored['ttl']))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write(self, key: str, entry: CacheEntry) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'fetched_at': entry.fetched_at, 'ttl': entry.ttl, 'data': entry.data},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def _param_value(value: object) -> str:
+    """Приводит значение параметра к виду, в котором оно уходит в запрос."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+Асинхронный клиент API прогнозов погоды для многих точек сразу.
+
+Запросы по списку координат выполняются параллельно, но не больше
+concurrency одновременно, через общий пул соединений keep-alive, так что
+сотни точек обслуживаются несколькими TCP-соединениями. Ошибка по одной
+точке не прерывает остальные: для каждой точки возвращается отдельный
+ForecastResult.
+
+С кэшем (forecast_cache.py) свежие ответы отдаются без запроса к API,
+устаревшие - сразу, с обновлением в фоне, а одновременные запросы точек
+из одной ячейки сетки сливаются в один запрос.
+
+Запросы к API проходят через ограничитель частоты и правило повторов
+(rate_limit.py), а учёт квоты ключа прекращает запросы, как только она
+исчерпана, и клиент переходит на данные из кэша. Счётчики запросов
+доступны в ForecastClient.stats.
+
+Для проверок без обращения к API ответы можно записать (--record) и
+воспроизводить локальной заглушкой stub_server.py (--base-url).
+
+Запуск: python forecast_client.py locations.csv [--concurrency 20] [--base-url URL] [--json результат.json]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional, Set
+
+import httpx
+
+from forecast_cache import DEFAULT_GRID, DEFAULT_TTL, ForecastCache
+from rate_limit import ClientStats, QuotaGuard, RetryPolicy, TokenBucket
+from timeseries import TimeSeriesStore
+
+# Адрес API прогнозов
+FORECAST_URL = 'https://api.weather.yandex.ru/v2/forecast'
+
+# Параметры запроса по умолчанию
+DEFAULT_PARAMS = {
+    'lang': 'ru_RU',  # язык ответа
+    'limit': 7,  # срок прогноза в днях
+    'hours': 'true',  # наличие почасового прогноза
+    'extra': 'false',  # подробный прогноз осадков
+}
+
+# Количество одновременных запросов по умолчанию
+DEFAULT_CONCURRENCY = 10
+# Запросов в секунду по умолчанию
+DEFAULT_RATE = 10.0
+
+# Текст ошибки для запросов, не отправленных из-за исчерпанной квоты
+QUOTA_EXHAUSTED = "Квота запросов исчерпана"
+
+
+@dataclass(frozen=True)
+class Location:
+    """Точка, для которой запрашивается прогноз."""
+    lat: float
+    lon: float
+    name: str = ''
+
+
+@dataclass
+class ForecastResult:
+    """Результат запроса прогноза для одной точки."""
+    location: Location
+    status: Optional[int] = None
+    data: Optional[dict] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    # Ответ взят из кэша; stale - запись устарела и отдана вместо запроса или ошибки
+    cached: bool = False
+    stale: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200 and self.data is not None
+
+
+class ForecastClient:
+    """
+    Клиент API прогнозов с пулом соединений и ограничением параллельности.
+
+    Используется как асинхронный контекстный менеджер:
+
+        async with ForecastClient(api_key, concurrency=20) as client:
+            results = await client.fetch_many(locations)
+    """
+
+    def __init__(self, api_key: str, base_url: str = FORECAST_URL, concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: float = 10.0, params: Optional[Dict[str, object]] = None,
+                 cache: Optional[ForecastCache] = None, rate_limiter: Optional[TokenBucket] = None,
+                 retry: Optional[RetryPolicy] = None, quota: Optional[QuotaGuard] = None):
+        """
+        Args:
+            api_key: Ключ API, передаётся в заголовке X-Yandex-API-Key
+            base_url: Адрес API; для проверок - адрес локальной заглушки
+            concurrency: Наибольшее количество одновременных запросов и соединений в пуле
+            timeout: Время ожидания ответа в секундах
+            params: Параметры запроса вместо DEFAULT_PARAMS
+            cache: Кэш ответов; None - каждый вызов fetch обращается к API
+            rate_limiter: Ограничитель частоты запросов; None - без ограничения
+            retry: Правило повторов; по умолчанию RetryPolicy()
+            quota: Учёт квоты ключа; по умолчанию QuotaGuard() без предела,
+                который после первого 403 останавливает запросы до конца работы клиента
+        """
+        if concurrency <= 0:
+            raise ValueError("Количество одновременных запросов должно быть положительным")
+
+        self.base_url = base_url
+        self.params = dict(DEFAULT_PARAMS if params is None else params)
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.retry = RetryPolicy() if retry is None else retry
+        self.quota = QuotaGuard() if quota is None else quota
+        self.stats = ClientStats()
+        # Выполняющиеся запросы по ключу кэша и фоновые обновления устаревших записей
+        self._inflight: Dict[str, 'asyncio.Task[ForecastResult]'] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client = httpx.AsyncClient(
+            headers={'X-Yandex-API-Key': api_key},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+
+    async def __aenter__(self) -> 'ForecastClient':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Дожидается фоновых обновлений кэша, сохраняет учёт квоты и закрывает соединения пула."""
+        if self._refreshes:
+            await asyncio.gather(*self._refreshes, return_exceptions=True)
+        self.quota.save()
+        await self._client.aclose()
+
+    async def fetch(self, location: Location) -> ForecastResult:
+        """
+        Возвращает прогноз для одной точки: из кэша, если он есть, иначе запросом к API.
+
+        Ошибки возвращаются в результате, а не выбрасываются.
+        """
+        if self.cache is None:
+            return await self._request(location)
+
+        key = self.cache.key(location.lat, location.lon, self.params)
+        entry = self.cache.get(key)
+        now = time.time()
+        if entry is not None:
+            if entry.is_fresh(now):
+                self.stats.served_from_cache += 1
+                return ForecastResult(location, 200, entry.data, cached=True)
+            if self.cache.is_revalidatable(entry, now):
+                # При исчерпанной квоте обновление не запускается: запрос всё равно не будет отправлен
+                if key not in self._inflight and self.quota.available:
+                    refresh = self._start_request(key, location)
+                    self._refreshes.add(refresh)
+                    refresh.add_done_callback(self._refreshes.discard)
+                self.stats.served_from_cache += 1
+                return ForecastResult(location, 200, entry.data, cached=True, stale=True)
+
+        # Вызовы для одного ключа ждут один общий запрос; shield не даёт
+        # отмене одного из ожидающих прервать запрос для остальных
+        task = self._inflight.get(key) or self._start_request(key, location)
+        result = await asyncio.shield(task)
+        if not result.ok and entry is not None:
+            # Просроченный прогноз полезнее ошибки, например при исчерпанной квоте
+            self.stats.served_from_cache += 1
+            return ForecastResult(location, 200, entry.data, error=result.error, cached=True, stale=True)
+        if result.location != location:
+            result = ForecastResult(location, result.status, result.data, result.error, result.elapsed)
+        return result
+
+    def _start_request(self, key: str, location: Location) -> 'asyncio.Task[ForecastResult]':
+        """Запускает запрос, результат которого сохраняется в кэш и достаётся всем ожидающим ключа."""
+        async def request() -> ForecastResult:
+            result = await self._request(location)
+            if result.ok:
+                self.cache.put(key, result.data)
+            return result
+
+        task = asyncio.ensure_future(request())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _request(self, location: Location) -> ForecastResult:
+        """Запрашивает прогноз для точки у API, повторяя запрос по правилу self.retry."""
+        params = dict(self.params, lat=location.lat, lon=location.lon)
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            if self.quota.available and self.rate_limiter is not None and await self.rate_limiter.acquire():
+                self.stats.throttled += 1
+
+            # Задержка перед повтором выдерживается вне семафора, чтобы
+            # не занимать место других запросов
+            async with self._semaphore:
+                # Квота проверяется непосредственно перед отправкой: пока запрос
+                # ждал своей очереди, другой мог получить 403
+                if not self.quota.try_acquire():
+                    self.stats.quota_blocked += 1
+                    return ForecastResult(location, error=QUOTA_EXHAUSTED, elapsed=time.perf_counter() - start)
+                self.stats.sent += 1
+                try:
+                    response = await self._client.get(self.base_url, params=params)
+                    error = None
+                except httpx.HTTPError as e:
+                    response = None
+                    error = f"{type(e).__name__}: {e}"
+
+            status = None if response is None else response.status_code
+            if not self.retry.should_retry(status, attempt):
+                break
+            retry_after = None if response is None else response.headers.get('Retry-After')
+            await asyncio.sleep(self.retry.delay(attempt, retry_after))
+            self.stats.retried += 1
+            attempt += 1
+
+        elapsed = time.perf_counter() - start
+        if response is None:
+            return ForecastResult(location, error=error, elapsed=elapsed)
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+
+        if response.status_code != 200:
+            if response.status_code == 403:
+                # API отвечает 403 и на неверный ключ, и на исчерпанную квоту;
+                # в обоих случаях дальнейшие запросы этого запуска бесполезны,
+                # но в сохраняемый учёт квоты остановка не попадает
+                self.quota.exhaust()
+            message = data.get('message') if isinstance(data, dict) else None
+            return ForecastResult(location, response.status_code, error=message or response.reason_phrase,
+                                  elapsed=elapsed)
+        if data is None:
+            return ForecastResult(location, response.status_code, error="Ответ не в формате JSON", elapsed=elapsed)
+        return ForecastResult(location, response.status_code, data, elapsed=elapsed)
+
+    async def fetch_many(self, locations: Iterable[Location]) -> List[ForecastResult]:
+        """Запрашивает прогнозы для всех точек; результаты идут в том же порядке, что и точки."""
+        return list(await asyncio.gather(*(self.fetch(location) for location in locations)))
+
+
+def fetch_forecasts(locations: Iterable[Location], api_key: str, base_url: str = FORECAST_URL,
+                    concurrency: int = DEFAULT_CONCURRENCY, timeout: float = 10.0,
+                    cache: Optional[ForecastCache] = None, rate: Optional[float] = None,
+                    retry: Optional[RetryPolicy] = None, quota: Optional[QuotaGuard] = None,
+                    stats: Optional[ClientStats] = None) -> List[ForecastResult]:
+    """
+    Синхронная обёртка над ForecastClient.fetch_many для вызова из обычного кода.
+
+    Args:
+        rate: Запросов в секунду; None - без ограничения
+        stats: Счётчики, которые будет пополнять клиент
+    """
+    async def run() -> List[ForecastResult]:
+        # Ограничитель создаётся внутри цикла событий, в котором будет работать
+        rate_limiter = None if rate is None else TokenBucket(rate)
+        async with ForecastClient(api_key, base_url, concurrency, timeout, cache=cache, rate_limiter=rate_limiter,
+                                  retry=retry, quota=quota) as client:
+            if stats is not None:
+                client.stats = stats
+            return await client.fetch_many(locations)
+
+    return asyncio.run(run())
+
+
+def read_locations(path: str) -> List[Location]:
+    """
+    Читает точки из CSV-файла со столбцами lat, lon и необязательным name.
+
+    Raises:
+        ValueError: Если в файле нет нужных столбцов или координаты некорректны.
+    """
+    locations = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or not {'lat', 'lon'} <= set(reader.fieldnames):
+            raise ValueError(f"В файле {path} нужны столбцы lat и lon")
+        for line, row in enumerate(reader, 2):
+            try:
+                locations.append(Location(float(row['lat']), float(row['lon']), row.get('name') or ''))
+            except (TypeError, ValueError):
+                raise ValueError(f"Некорректные координаты в строке {line}: {row}") from None
+    return locations
+
+
+def save_recordings(results: Iterable[ForecastResult], directory: str) -> int:
+    """
+    Сохраняет полученные ответы в формате записей stub_server.py.
+
+    Returns:
+        Количество сохранённых записей.
+    """
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for result in results:
+        if result.status is None:
+            continue
+        location = result.location
+        body = result.data if result.data is not None else {'message': result.error}
+        path = os.path.join(directory, f"{location.lat:.4f}_{location.lon:.4f}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'lat': location.lat, 'lon': location.lon, 'status': result.status, 'body': body},
+                      f, ensure_ascii=False)
+        count += 1
+    return count
+
+
+def summary(result: ForecastResult) -> str:
+    """Возвращает строку с текущей погодой или ошибкой для точки."""
+    location = result.location
+    title = location.name or f"{location.lat}, {location.lon}"
+    if not result.ok:
+        status = f" {result.status}" if result.status else ''
+        return f"{title}: ошибка{status}: {result.error}"
+    fact = result.data.get('fact', {})
+    source = ' (устаревший, из кэша)' if result.stale else ' (из кэша)' if result.cached else ''
+    return (f"{title}: {fact.get('temp', 'Неизвестно')} °C, ощущается как {fact.get('feels_like', 'Неизвестно')} °C, "
+            f"{fact.get('condition', 'Неизвестно')}{source}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Прогнозы погоды для списка точек")
+    parser.add_argument('locations', help="CSV-файл со столбцами lat, lon, name")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="одновременных запросов")
+    parser.add_argument('--base-url', default=FORECAST_URL, help="адрес API, например локальной заглушки")
+    parser.add_argument('--timeout', type=float, default=10.0, help="время ожидания ответа, с")
+    parser.add_argument('--cache', default='.forecast_cache', metavar='DIR', help="папка кэша ответов")
+    parser.add_argument('--no-cache', action='store_true', help="не использовать кэш")
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL, help="срок жизни ответа в кэше, с")
+    parser.add_argument('--grid', type=float, default=DEFAULT_GRID, help="размер ячейки сетки координат, градусов")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="запросов в секунду")
+    parser.add_argument('--retries', type=int, default=3, help="повторов на 429, 5xx и сетевых ошибках")
+    parser.add_argument('--daily-quota', type=int, default=0, help="суточная квота ключа; 0 - не отслеживать")
+    parser.add_argument('--json', metavar='FILE', help="сохранить результаты в JSON")
+    parser.add_argument('--record', metavar='DIR', help="сохранить ответы как записи для stub_server.py")
+    parser.add_argument('--store', metavar='DIR', help="дописать почасовые прогнозы в хранилище рядов")
+    args = parser.parse_args()
+
+    # Ключ API берётся из переменной окружения, чтобы не хранить его в коде
+    api_key = os.environ.get('YANDEX_WEATHER_API_KEY', '')
+
+    try:
+        locations = read_locations(args.locations)
+        cache = None if args.no_cache else ForecastCache(args.cache, args.grid, args.ttl)
+        retry = RetryPolicy(args.retries)
+        # Учёт квоты хранится рядом с кэшем, чтобы переживать перезапуски
+        quota_path = '.forecast_quota.json' if args.no_cache else os.path.join(args.cache, 'quota.json')
+        # Без --daily-quota учёт не сохраняется: 403 останавливает запросы только до конца запуска
+        quota = QuotaGuard(args.daily_quota, state_path=quota_path) if args.daily_quota else QuotaGuard()
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}")
+        return
+
+    stats = ClientStats()
+    start = time.perf_counter()
+    results = fetch_forecasts(locations, api_key, args.base_url, args.concurrency, args.timeout, cache,
+                              args.rate or None, retry, quota, stats)
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        print(summary(result))
+    succeeded = sum(result.ok for result in results)
+    cached = sum(result.cached for result in results)
+    print(f"Получено {succeeded} из {len(results)} прогнозов ({cached} из кэша) за {elapsed:.2f} с")
+    print(f"Запросов отправлено: {stats.sent}, повторено: {stats.retried}, задержано ограничителем: "
+          f"{stats.throttled}, отдано из кэша: {stats.served_from_cache}, не отправлено из-за квоты: "
+          f"{stats.quota_blocked}")
+    if quota.limit is not None:
+        print(f"Осталось запросов по квоте: {quota.remaining} из {quota.limit}")
+    if quota.forbidden:
+        print("API ответил 403 (неверный ключ или исчерпанная квота), остальные запросы не отправлялись")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([asdict(result) for result in results], f, ensure_ascii=False, indent=2)
+    if args.record:
+        print(f"Записано ответов: {save_recordings(results, args.record)} в {args.record}")
+    if args.store:
+        store = TimeSeriesStore(args.store)
+        hours = sum(store.append(result.location.lat, result.location.lon, result.data)
+                    for result in results if result.ok)
+        print(f"Сохранено {hours} часов прогноза в {args.store}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Ограничение частоты запросов к API прогнозов и повторы при ошибках.
+
+    TokenBucket  - не больше rate запросов в секунду с пачками до capacity;
+    RetryPolicy  - повтор на 429, 5xx и сетевых ошибках с экспоненциальной
+                   задержкой и случайным разбросом (full jitter), чтобы
+                   повторы многих точек не приходили к API одновременно;
+    QuotaGuard   - учёт суточной квоты ключа; исчерпанная квота
+                   останавливает запросы до следующего периода, а 403 от
+                   API, даже если предел квоты не задан, - до конца
+                   работы; клиент при этом отдаёт данные из кэша;
+    ClientStats  - счётчики отправленных, повторённых, задержанных
+                   ограничителем и отданных из кэша запросов.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+# Коды ответа, после которых запрос стоит повторить
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Длина периода квоты по умолчанию, с: квота ключа суточная
+QUOTA_PERIOD = 24 * 60 * 60
+
+
+@dataclass
+class ClientStats:
+    """Счётчики запросов клиента."""
+    # Запросов, действительно отправленных в API, включая повторы
+    sent: int = 0
+    # Повторов после 429, 5xx и сетевых ошибок
+    retried: int = 0
+    # Запросов, задержанных ограничителем частоты
+    throttled: int = 0
+    # Ответов, отданных из кэша без запроса или вместо ошибки
+    served_from_cache: int = 0
+    # Запросов, не отправленных из-за исчерпанной квоты
+    quota_blocked: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class TokenBucket:
+    """Ограничитель частоты: маркеры пополняются со скоростью rate в секунду, не больше capacity."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Маркеров в секунду
+            capacity: Наибольшее количество маркеров, то есть размер пачки; по умолчанию - rate, но не меньше 1
+        """
+        if rate <= 0:
+            raise ValueError("Частота запросов должна быть положительной")
+        self.rate = rate
+        self.capacity = max(1.0, rate if capacity is None else capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """
+        Забирает маркер, при необходимости дожидаясь его.
+
+        Returns:
+            Время ожидания в секундах; 0 - маркер был сразу.
+        """
+        # Блокировка выстраивает ожидающих в очередь, и маркеры
+        # достаются им в порядке обращения
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+
+            wait = (1 - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+            return wait
+
+
+class RetryPolicy:
+    """Правило повторов с экспоненциальной задержкой и случайным разбросом."""
+
+    def __init__(self, retries: int = 3, base_delay: float = 0.5, max_delay: float = 30.0):
+        """
+        Args:
+            retries: Наибольшее количество повторов одного запроса
+            base_delay: Верхняя граница задержки перед первым повтором, с
+            max_delay: Наибольшая задержка, с
+        """
+        if retries < 0:
+            raise ValueError("Количество повторов не может быть отрицательным")
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, status: Optional[int], attempt: int) -> bool:
+        """Проверяет, нужно ли повторять запрос; status None - сетевая ошибка."""
+        return attempt < self.retries and (status is None or status in RETRY_STATUSES)
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Возвращает задержку перед повтором номер attempt (с нуля), учитывая заголовок Retry-After."""
+        if retry_after:
+            try:
+                return min(self.max_delay, max(0.0, float(retry_after)))
+            except ValueError:
+                # Retry-After в виде даты не используется: задержка считается как обычно
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class QuotaGuard:
+    """
+    Учёт квоты запросов за период.
+
+    Количество запросов можно хранить в файле, чтобы квота учитывалась
+    между запусками; файл записывается при исчерпании квоты и при save().
+    Остановка после 403 в файл не попадает: API отвечает 403 и на неверный
+    ключ, и исправленный ключ должен работать со следующего запуска.
+    """
+
+    def __init__(self, limit: Optional[int] = None, period: float = QUOTA_PERIOD, state_path: Optional[str] = None):
+        """
+        Args:
+            limit: Запросов за период; None - предел неизвестен, и запросы
+                останавливаются только после exhaust(), то есть после 403
+            period: Длина периода в секундах; периоды отсчитываются от полуночи UTC
+            state_path: JSON-файл с состоянием квоты
+        """
+        if limit is not None and limit <= 0:
+            raise ValueError("Квота должна быть положительной")
+        self.limit = limit
+        self.period = period
+        self.state_path = state_path
+        self._period_start = self._current_period()
+        self.used = 0
+        # Запросы остановлены ответом 403; только до конца работы, в файл не записывается
+        self.forbidden = False
+        self._load()
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Сколько запросов ещё можно отправить; None - предел не задан и запросы не остановлены."""
+        self._roll()
+        if self.forbidden:
+            return 0
+        return None if self.limit is None else max(0, self.limit - self.used)
+
+    @property
+    def available(self) -> bool:
+        """Можно ли отправить ещё хотя бы один запрос."""
+        return self.remaining != 0
+
+    def try_acquire(self) -> bool:
+        """Учитывает запрос, если квота позволяет его отправить."""
+        if not self.available:
+            return False
+        self.used += 1
+        if self.used == self.limit:
+            self.save()
+        return True
+
+    def exhaust(self) -> None:
+        """Останавливает запросы до конца работы или периода, например после 403 от API."""
+        self._roll()
+        self.forbidden = True
+
+    def save(self) -> None:
+        """Записывает состояние квоты в файл."""
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'period_start': self._period_start, 'used': self.used}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _current_period(self) -> float:
+        return time.time() // self.period * self.period
+
+    def _roll(self) -> None:
+        """Начинает новый период, если прежний закончился."""
+        period_start = self._current_period()
+        if period_start != self._period_start:
+            self._period_start = period_start
+            self.used = 0
+            self.forbidden = False
+
+    def _load(self) -> None:
+        if not self.state_path:
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            # Прежние версии записывали и остановку после 403 ('exhausted'): она не учитывается
+            if state['period_start'] == self._period_start:
+                self.used = int(state['used'])
+        except (OSError, ValueError, KeyError, TypeError):
+            # Нет файла или он повреждён: квота считается с нуля
+            pass
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная заглушка API прогнозов, воспроизводящая записанные ответы.
+
+Ответы лежат в папке записей по одному JSON-файлу на точку:
+
+    {"lat": 55.117082, "lon": 36.597014, "status": 200, "body": {...}}
+
+Такие файлы создаёт forecast_client.py с ключом --record. Запрос
+сопоставляется с записью по координатам, округлённым до ROUND_DIGITS
+знаков; для точек без записи отдаётся запись default.json, если она есть,
+иначе 404. Без заголовка X-Yandex-API-Key заглушка, как и настоящий API,
+отвечает 403.
+
+Заглушка поддерживает keep-alive и считает принятые соединения
+(GET /stats), чтобы проверять переиспользование соединений клиентом.
+Для проверки повторов и учёта квоты она может отвечать 503 на долю
+запросов (--fail-rate) и 403 после исчерпания квоты (--quota).
+
+Запуск: python stub_server.py [--port 8081] [--recordings recordings] [--latency 0.05] [--fail-rate 0.1] [--quota 50]
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# Точность сопоставления координат запроса с записями
+ROUND_DIGITS = 4
+
+# Имя файла записи, отдаваемой для точек без собственной записи
+DEFAULT_RECORDING = 'default.json'
+
+# Ответ: код статуса и тело
+Recording = Tuple[int, dict]
+
+
+def recording_key(lat: float, lon: float) -> Tuple[float, float]:
+    """Возвращает ключ записи по координатам."""
+    return round(lat, ROUND_DIGITS), round(lon, ROUND_DIGITS)
+
+
+def load_recordings(directory: str) -> Tuple[Dict[Tuple[float, float], Recording], Optional[Recording]]:
+    """
+    Читает записи ответов из папки.
+
+    Returns:
+        Словарь ключ координат -> ответ и ответ по умолчанию (или None).
+    """
+    recordings = {}
+    default = None
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            recording = json.load(f)
+        response = recording.get('status', 200), recording['body']
+        if os.path.basename(path) == DEFAULT_RECORDING:
+            default = response
+        else:
+            recordings[recording_key(recording['lat'], recording['lon'])] = response
+    return recordings, default
+
+
+class StubServer(ThreadingHTTPServer):
+    """HTTP-сервер заглушки с записанными ответами и счётчиками."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], recordings_dir: str, latency: float = 0.0,
+                 fail_rate: float = 0.0, quota: Optional[int] = None):
+        """
+        Args:
+            address: Адрес (хост, порт); порт 0 - любой свободный
+            recordings_dir: Папка с записями ответов
+            latency: Задержка перед каждым ответом в секундах, имитирующая сеть
+            fail_rate: Доля запросов, на которые отвечается 503
+            quota: Количество запросов, после которого отвечается 403; None - без квоты
+        """
+        super().__init__(address, StubHandler)
+        self.recordings, self.default = load_recordings(recordings_dir)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.quota = quota
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self, connection: bool = False) -> int:
+        """Увеличивает счётчик запросов или соединений и возвращает его значение."""
+        with self._lock:
+            if connection:
+                self.connections += 1
+                return self.connections
+            self.requests += 1
+            return self.requests
+
+    @property
+    def url(self) -> str:
+        """Адрес, который передаётся клиенту как base_url."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v2/forecast"
+
+    def find(self, lat: float, lon: float) -> Optional[Recording]:
+        """Возвращает записанный ответ для координат."""
+        return self.recordings.get(recording_key(lat, lon), self.default)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.count(connection=True)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/stats':
+            self._send(200, {'connections': self.server.connections, 'requests': self.server.requests})
+            return
+        if url.path != '/v2/forecast':
+            self._send(404, {'message': f"Неизвестный путь: {url.path}"})
+            return
+
+        number = self.server.count()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not self.headers.get('X-Yandex-API-Key') or (self.server.quota is not None and number > self.server.quota):
+            self._send(403, {'message': 'Forbidden'})
+            return
+        if random.random() < self.server.fail_rate:
+            self._send(503, {'message': 'Service Unavailable'})
+            return
+
+        params = parse_qs(url.query)
+        try:
+            lat, lon = float(params['lat'][0]), float(params['lon'][0])
+        except (KeyError, ValueError):
+            self._send(400, {'message': 'Некорректные координаты'})
+            return
+
+        recording = self.server.find(lat, lon)
+        if recording is None:
+            self._send(404, {'message': f"Нет записанного ответа для {lat}, {lon}"})
+            return
+        self._send(*recording)
+
+    def _send(self, status: int, body: dict) -> None:
+        """Отправляет ответ в формате JSON."""
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Журнал каждого запроса не нужен: сотни строк на один прогон клиента
+        pass
+
+
+def start_stub(recordings_dir: str, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+               fail_rate: float = 0.0, quota: Optional[int] = None) -> StubServer:
+    """Запускает заглушку в фоновом потоке; остановка - server.shutdown()."""
+    server = StubServer((host, port), recordings_dir, latency, fail_rate, quota)
+    threading.Thread(target=server.serve_forever, name='forecast-stub', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка API прогнозов с записанными ответами")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--recordings', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             'recordings'),
+                        help="папка с записями ответов")
+    parser.add_argument('--latency', type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument('--quota', type=int, help="запросов до ответов 403")
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), args.recordings, args.latency, args.fail_rate, args.quota)
+    print(f"Записей: {len(server.recordings)}, заглушка слушает {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
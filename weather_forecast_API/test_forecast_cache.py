@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка кэша прогнозов: срок жизни записей и обновление устаревших в фоне.
+
+Запуск: python -m unittest test_forecast_cache
+"""
+import os
+import tempfile
+import time
+import unittest
+
+from forecast_cache import ForecastCache
+from forecast_client import DEFAULT_PARAMS, Location, fetch_forecasts
+from rate_limit import ClientStats
+from stub_server import start_stub
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings')
+
+
+class ForecastCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = ForecastCache(self.directory, ttl=60, stale_while_revalidate=600)
+        self.key = self.cache.key(55.75, 37.62, DEFAULT_PARAMS)
+
+    def test_key_uses_grid_cell(self):
+        """Точки одной ячейки сетки получают один ключ, координаты в параметрах не учитываются."""
+        self.assertEqual(self.cache.key(55.7512, 37.6188, dict(DEFAULT_PARAMS, lat=1, lon=2)), self.key)
+        self.assertNotEqual(self.cache.key(55.77, 37.62, DEFAULT_PARAMS), self.key)
+        self.assertNotEqual(self.cache.key(55.75, 37.62, dict(DEFAULT_PARAMS, limit=3)), self.key)
+
+    def test_fresh_stale_expired(self):
+        now = time.time()
+        entry = self.cache.put(self.key, {'fact': {}}, fetched_at=now - 30)
+        self.assertTrue(entry.is_fresh(now))
+
+        entry = self.cache.put(self.key, {'fact': {}}, fetched_at=now - 120)
+        self.assertFalse(entry.is_fresh(now))
+        self.assertTrue(self.cache.is_revalidatable(entry, now))
+
+        entry = self.cache.put(self.key, {'fact': {}}, fetched_at=now - 700)
+        self.assertFalse(entry.is_fresh(now))
+        self.assertFalse(self.cache.is_revalidatable(entry, now))
+
+    def test_entry_ttl(self):
+        now = time.time()
+        entry = self.cache.put(self.key, {}, ttl=10, fetched_at=now - 20)
+
+        self.assertEqual(entry.expires_at, now - 10)
+        self.assertFalse(entry.is_fresh(now))
+
+    def test_disk_level(self):
+        """Запись читается с диска новым экземпляром кэша, а prune удаляет только просроченные."""
+        now = time.time()
+        self.cache.put(self.key, {'fact': {'temp': 3}}, fetched_at=now - 120)
+        other = self.cache.key(59.94, 30.31, DEFAULT_PARAMS)
+        self.cache.put(other, {'fact': {'temp': 5}}, fetched_at=now - 700)
+
+        reopened = ForecastCache(self.directory, ttl=60, stale_while_revalidate=600)
+        self.assertEqual(reopened.get(self.key).data, {'fact': {'temp': 3}})
+        self.assertEqual(reopened.prune(), 1)
+        self.assertIsNone(ForecastCache(self.directory).get(other))
+
+    def test_max_entries(self):
+        cache = ForecastCache(ttl=60, max_entries=2)
+        for i in range(3):
+            cache.put(str(i), {})
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('0'))
+
+
+class StaleWhileRevalidateTest(unittest.TestCase):
+    """Клиент с кэшем против заглушки API."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = ForecastCache(directory.name, ttl=60, stale_while_revalidate=600)
+        self.location = Location(55.75, 37.62, 'Москва')
+        self.key = self.cache.key(self.location.lat, self.location.lon, DEFAULT_PARAMS)
+
+    def fetch(self, quota=None):
+        stub = start_stub(RECORDINGS, quota=quota)
+        self.addCleanup(stub.server_close)
+        self.addCleanup(stub.shutdown)
+        stats = ClientStats()
+        result = fetch_forecasts([self.location], 'key', stub.url, cache=self.cache, stats=stats)[0]
+        return result, stats, stub
+
+    def test_fresh_entry_without_request(self):
+        self.cache.put(self.key, {'fact': {'temp': 1}}, fetched_at=time.time() - 30)
+
+        result, stats, stub = self.fetch()
+
+        self.assertTrue(result.ok and result.cached and not result.stale)
+        self.assertEqual(result.data, {'fact': {'temp': 1}})
+        self.assertEqual(stub.requests, 0)
+
+    def test_stale_entry_revalidated_in_background(self):
+        """Устаревшая запись отдаётся сразу, а обновлённая попадает в кэш к закрытию клиента."""
+        fetched_at = time.time() - 120
+        self.cache.put(self.key, {'fact': {'temp': 1}}, fetched_at=fetched_at)
+
+        result, stats, stub = self.fetch()
+
+        self.assertTrue(result.cached and result.stale)
+        self.assertEqual(result.data, {'fact': {'temp': 1}})
+        self.assertEqual(stub.requests, 1)
+        entry = self.cache.get(self.key)
+        self.assertGreater(entry.fetched_at, fetched_at)
+        self.assertNotEqual(entry.data, {'fact': {'temp': 1}})
+
+    def test_expired_entry_requested(self):
+        self.cache.put(self.key, {'fact': {'temp': 1}}, fetched_at=time.time() - 700)
+
+        result, stats, stub = self.fetch()
+
+        self.assertTrue(result.ok and not result.cached)
+        self.assertNotEqual(result.data, {'fact': {'temp': 1}})
+        self.assertEqual(stub.requests, 1)
+
+    def test_expired_entry_instead_of_error(self):
+        """При 403 просроченная запись отдаётся вместо ошибки."""
+        self.cache.put(self.key, {'fact': {'temp': 1}}, fetched_at=time.time() - 700)
+
+        result, stats, stub = self.fetch(quota=0)
+
+        self.assertTrue(result.ok and result.cached and result.stale)
+        self.assertIsNotNone(result.error)
+        self.assertEqual(result.data, {'fact': {'temp': 1}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка ограничителя частоты и учёта квоты.
+
+Запуск: python -m unittest test_rate_limit
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from rate_limit import QuotaGuard, TokenBucket
+
+
+class TokenBucketTest(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_then_rate(self):
+        """Пачка до capacity проходит без ожидания, следующий маркер ждёт около 1/rate."""
+        bucket = TokenBucket(rate=20, capacity=5)
+
+        waits = [await bucket.acquire() for _ in range(5)]
+        self.assertEqual(waits, [0.0] * 5)
+
+        start = time.monotonic()
+        wait = await bucket.acquire()
+        self.assertAlmostEqual(wait, 1 / 20, delta=0.01)
+        self.assertGreaterEqual(time.monotonic() - start, wait * 0.9)
+
+    async def test_concurrent_rate(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(11)))
+
+        self.assertGreaterEqual(time.monotonic() - start, 10 / 50 * 0.9)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+class QuotaGuardTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.state_path = os.path.join(directory.name, 'quota.json')
+
+    def read_state(self):
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_state(self, **state):
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(state, period_start=QuotaGuard()._period_start), f)
+
+    def test_limit(self):
+        quota = QuotaGuard(limit=3)
+
+        self.assertEqual([quota.try_acquire() for _ in range(4)], [True, True, True, False])
+        self.assertEqual(quota.remaining, 0)
+        self.assertFalse(quota.available)
+
+    def test_state_saved_when_exhausted(self):
+        """Файл записывается при исчерпании квоты, и следующий запуск продолжает с того же счёта."""
+        quota = QuotaGuard(limit=2, state_path=self.state_path)
+        quota.try_acquire()
+        self.assertFalse(os.path.exists(self.state_path))
+
+        quota.try_acquire()
+        self.assertEqual(self.read_state()['used'], 2)
+        self.assertFalse(QuotaGuard(limit=2, state_path=self.state_path).available)
+
+    def test_save_partial_usage(self):
+        quota = QuotaGuard(limit=5, state_path=self.state_path)
+        quota.try_acquire()
+        quota.save()
+
+        self.assertEqual(QuotaGuard(limit=5, state_path=self.state_path).remaining, 4)
+
+    def test_exhaust_not_persisted(self):
+        """Остановка после 403 действует до конца работы и не попадает в файл."""
+        quota = QuotaGuard(limit=5, state_path=self.state_path)
+        quota.try_acquire()
+        quota.exhaust()
+        self.assertEqual(quota.remaining, 0)
+        self.assertFalse(quota.try_acquire())
+        quota.save()
+
+        self.assertNotIn('exhausted', self.read_state())
+        self.assertEqual(QuotaGuard(limit=5, state_path=self.state_path).remaining, 4)
+
+    def test_legacy_exhausted_ignored(self):
+        self.write_state(used=1, exhausted=True)
+
+        quota = QuotaGuard(state_path=self.state_path)
+
+        self.assertTrue(quota.available)
+        self.assertEqual(quota.used, 1)
+
+    def test_previous_period_ignored(self):
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump({'period_start': 0, 'used': 10}, f)
+
+        self.assertEqual(QuotaGuard(limit=10, state_path=self.state_path).remaining, 10)
+
+    def test_corrupt_state(self):
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            f.write('{')
+
+        self.assertEqual(QuotaGuard(limit=3, state_path=self.state_path).remaining, 3)
+
+    def test_unlimited(self):
+        quota = QuotaGuard()
+        for _ in range(100):
+            self.assertTrue(quota.try_acquire())
+
+        self.assertIsNone(quota.remaining)
+        quota.exhaust()
+        self.assertFalse(quota.available)
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ValueError):
+            QuotaGuard(limit=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Компактное хранилище почасовых прогнозов по точкам.
+
+Для каждой точки ведётся отдельный файл: заголовок HTS_MAGIC и записи
+фиксированной длины RECORD.size байт, по одной на час, в порядке
+возрастания времени. Значения хранятся целыми числами: температура,
+скорость ветра и осадки - в десятых долях, состояние погоды - номером
+в CONDITIONS. Неделя почасового прогноза занимает около 3 КБ против
+~30 КБ JSON.
+
+Новый прогноз дописывается в конец ряда. Часы, которые уже есть в
+ряду, заменяются более свежим прогнозом: записи, начиная с первого
+часа нового прогноза, отбрасываются, так что записи остаются
+упорядоченными и без повторов. Прошедшие часы сохраняются как история.
+Ряд переписывается во временный файл, который заменяет прежний, поэтому
+прерванная запись не портит уже сохранённые часы.
+
+Запросы по диапазону времени находят границы двоичным поиском по файлу
+и читают только нужные записи, разбирая их struct.iter_unpack без JSON:
+
+    store = TimeSeriesStore('forecast_series')
+    store.append(55.117082, 36.597014, data)           # ответ API
+    store.summary(55.117082, 36.597014, start, end)    # мин./макс. температура, осадки
+    store.summaries(start, end)                        # то же по всем точкам
+    store.precipitation_windows(55.117082, 36.597014, start, end, min_mm=0.5)
+
+Запуск: python timeseries.py DIR [--from 2025-10-18T00:00] [--to 2025-10-20T00:00] [--min-mm 0.5]
+"""
+import argparse
+import os
+import struct
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+HTS_MAGIC = b'WFHTS01\0'
+HTS_EXTENSION = '.hts'
+
+# Время часа (unix, с), температура и ощущаемая температура (0.1 °C),
+# ветер (0.1 м/с), давление (мм рт. ст.), влажность (%), вероятность
+# осадков (%), осадки (0.1 мм), состояние погоды (номер в CONDITIONS)
+RECORD = struct.Struct('<IhhHHBBHB')
+FIELDS = ('hour_ts', 'temp', 'feels_like', 'wind_speed', 'pressure_mm', 'humidity', 'prec_prob', 'prec_mm',
+          'condition')
+# Множители для полей, хранящихся в десятых долях
+SCALES = {'temp': 10, 'feels_like': 10, 'wind_speed': 10, 'prec_mm': 10}
+
+# Состояния погоды API; номер 0 - неизвестное состояние
+CONDITIONS = (
+    '', 'clear', 'partly-cloudy', 'cloudy', 'overcast', 'light-rain', 'rain', 'heavy-rain', 'showers',
+    'wet-snow', 'light-snow', 'snow', 'snow-showers', 'hail', 'thunderstorm', 'thunderstorm-with-rain',
+    'thunderstorm-with-hail', 'drizzle',
+)
+_CONDITION_CODES = {condition: code for code, condition in enumerate(CONDITIONS)}
+
+_TIMESTAMP = struct.Struct('<I')
+
+# Запись в том виде, в каком она хранится в файле
+RawRecord = Tuple[int, int, int, int, int, int, int, int, int]
+
+
+@dataclass
+class Summary:
+    """Сводка по диапазону времени для одной точки."""
+    hours: int
+    min_temp: float
+    max_temp: float
+    mean_temp: float
+    total_prec_mm: float
+    # Часы с осадками
+    wet_hours: int
+
+
+@dataclass
+class PrecipitationWindow:
+    """Непрерывный промежуток часов с осадками; end - начало часа, следующего за последним."""
+    start: int
+    end: int
+    total_mm: float
+
+    @property
+    def hours(self) -> int:
+        return (self.end - self.start) // 3600
+
+
+def _scaled(value, scale: int, low: int, high: int) -> int:
+    """Переводит значение в целое с множителем scale в пределах типа поля; пропуск - 0."""
+    if value is None:
+        return 0
+    return min(high, max(low, round(float(value) * scale)))
+
+
+def hourly_records(data: dict) -> List[RawRecord]:
+    """
+    Извлекает почасовой прогноз из ответа API.
+
+    Часы без времени или температуры пропускаются.
+
+    Returns:
+        Записи, упорядоченные по времени, без повторов.
+    """
+    records = {}
+    for day in data.get('forecasts', ()):
+        for hour in day.get('hours', ()):
+            hour_ts = hour.get('hour_ts')
+            if hour_ts is None or hour.get('temp') is None:
+                continue
+            records[int(hour_ts)] = (
+                int(hour_ts),
+                _scaled(hour['temp'], 10, -32768, 32767),
+                _scaled(hour['temp'] if hour.get('feels_like') is None else hour['feels_like'], 10, -32768, 32767),
+                _scaled(hour.get('wind_speed'), 10, 0, 65535),
+                _scaled(hour.get('pressure_mm'), 1, 0, 65535),
+                _scaled(hour.get('humidity'), 1, 0, 255),
+                _scaled(hour.get('prec_prob'), 1, 0, 255),
+                _scaled(hour.get('prec_mm'), 10, 0, 65535),
+                _CONDITION_CODES.get(hour.get('condition'), 0),
+            )
+    return [records[hour_ts] for hour_ts in sorted(records)]
+
+
+class Series:
+    """Почасовой ряд одной точки в виде столбцов array с обычными единицами измерения."""
+
+    def __init__(self, records: List[RawRecord]):
+        columns = list(zip(*records)) or [()] * len(FIELDS)
+        self.hour_ts = array('I', columns[0])
+        for field, column in zip(FIELDS[1:], columns[1:]):
+            if field in SCALES:
+                scale = SCALES[field]
+                setattr(self, field, array('f', [value / scale for value in column]))
+            elif field == 'condition':
+                self.condition = [CONDITIONS[code] if code < len(CONDITIONS) else '' for code in column]
+            else:
+                setattr(self, field, array('B' if field in ('humidity', 'prec_prob') else 'H', column))
+
+    def __len__(self) -> int:
+        return len(self.hour_ts)
+
+
+class TimeSeriesStore:
+    """Папка с файлами почасовых рядов, по файлу на точку."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, lat: float, lon: float) -> str:
+        """Возвращает путь к файлу ряда точки."""
+        return os.path.join(self.directory, f"{lat:.4f}_{lon:.4f}{HTS_EXTENSION}")
+
+    def locations(self) -> List[Tuple[float, float]]:
+        """Возвращает координаты точек, для которых есть ряды."""
+        locations = []
+        for name in sorted(os.listdir(self.directory)):
+            stem, extension = os.path.splitext(name)
+            if extension != HTS_EXTENSION:
+                continue
+            lat, _, lon = stem.partition('_')
+            try:
+                locations.append((float(lat), float(lon)))
+            except ValueError:
+                continue
+        return locations
+
+    def append(self, lat: float, lon: float, data: dict) -> int:
+        """
+        Дописывает почасовой прогноз из ответа API в ряд точки.
+
+        Returns:
+            Количество записанных часов.
+        """
+        return self.append_records(lat, lon, hourly_records(data))
+
+    def append_records(self, lat: float, lon: float, records: List[RawRecord]) -> int:
+        """
+        Дописывает упорядоченные записи; часы начиная с первой записи заменяются.
+
+        Returns:
+            Количество записанных часов.
+        """
+        if not records:
+            return 0
+        path = self.path(lat, lon)
+        history = b''
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                count = _record_count(f, path)
+                cut = _lower_bound(f, count, records[0][0])
+                f.seek(len(HTS_MAGIC))
+                history = f.read(cut * RECORD.size)
+
+        # Ряд записывается целиком под временным именем и подменяет прежний
+        # файл одним os.replace: прерванная запись оставит прежний ряд как был
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HTS_MAGIC)
+            f.write(history)
+            f.write(b''.join(RECORD.pack(*record) for record in records))
+        os.replace(tmp_path, path)
+        return len(records)
+
+    def read(self, lat: float, lon: float, start: Optional[int] = None, end: Optional[int] = None) -> List[RawRecord]:
+        """Читает записи точки с start включительно до end не включительно (unix-время, с)."""
+        path = self.path(lat, lon)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'rb') as f:
+            count = _record_count(f, path)
+            first = 0 if start is None else _lower_bound(f, count, start)
+            last = count if end is None else _lower_bound(f, count, end)
+            if first >= last:
+                return []
+            f.seek(len(HTS_MAGIC) + first * RECORD.size)
+            return list(RECORD.iter_unpack(f.read((last - first) * RECORD.size)))
+
+    def series(self, lat: float, lon: float, start: Optional[int] = None, end: Optional[int] = None) -> Series:
+        """Возвращает записи диапазона в виде столбцов."""
+        return Series(self.read(lat, lon, start, end))
+
+    def summary(self, lat: float, lon: float, start: Optional[int] = None,
+                end: Optional[int] = None) -> Optional[Summary]:
+        """Возвращает сводку по диапазону или None, если в нём нет записей."""
+        return summarize(self.read(lat, lon, start, end))
+
+    def summaries(self, start: Optional[int] = None, end: Optional[int] = None,
+                  locations: Optional[Iterable[Tuple[float, float]]] = None) -> Dict[Tuple[float, float], Summary]:
+        """Возвращает сводки по диапазону для всех точек или только для locations."""
+        summaries = {}
+        for lat, lon in self.locations() if locations is None else locations:
+            summary = self.summary(lat, lon, start, end)
+            if summary is not None:
+                summaries[(lat, lon)] = summary
+        return summaries
+
+    def precipitation_windows(self, lat: float, lon: float, start: Optional[int] = None, end: Optional[int] = None,
+                              min_mm: float = 0.1, min_hours: int = 1) -> List[PrecipitationWindow]:
+        """
+        Находит промежутки подряд идущих часов, в каждый из которых ожидается не меньше min_mm осадков.
+
+        Промежуток прерывается и пропуском в ряду, и сухим часом. Промежутки
+        короче min_hours часов не возвращаются.
+        """
+        threshold = round(min_mm * SCALES['prec_mm'])
+        windows = []
+        window_start = previous = None
+        total = 0
+        for record in self.read(lat, lon, start, end):
+            hour_ts, prec = record[0], record[7]
+            wet = prec >= threshold and prec > 0
+            if window_start is not None and (not wet or hour_ts != previous + 3600):
+                windows.append(PrecipitationWindow(window_start, previous + 3600, total / SCALES['prec_mm']))
+                window_start = None
+            if wet:
+                if window_start is None:
+                    window_start, total = hour_ts, 0
+                total += prec
+                previous = hour_ts
+        if window_start is not None:
+            windows.append(PrecipitationWindow(window_start, previous + 3600, total / SCALES['prec_mm']))
+        return [window for window in windows if window.hours >= min_hours]
+
+
+def summarize(records: List[RawRecord]) -> Optional[Summary]:
+    """Считает сводку по записям; вычисления идут в целых, перевод в единицы - в конце."""
+    if not records:
+        return None
+    temps = [record[1] for record in records]
+    precipitation = [record[7] for record in records]
+    scale = SCALES['temp']
+    return Summary(
+        hours=len(records),
+        min_temp=min(temps) / scale,
+        max_temp=max(temps) / scale,
+        mean_temp=round(sum(temps) / len(temps) / scale, 1),
+        total_prec_mm=sum(precipitation) / SCALES['prec_mm'],
+        wet_hours=sum(1 for value in precipitation if value),
+    )
+
+
+def _record_count(f, path: str) -> int:
+    """Проверяет заголовок файла ряда и возвращает количество записей в нём."""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    if f.read(len(HTS_MAGIC)) != HTS_MAGIC:
+        raise ValueError(f"Файл {path} не является рядом прогнозов")
+    # Неполная запись в конце - след прерванного дописывания, она не учитывается
+    return (size - len(HTS_MAGIC)) // RECORD.size
+
+
+def _lower_bound(f, count: int, hour_ts: int) -> int:
+    """Возвращает номер первой записи со временем не раньше hour_ts; двоичный поиск по файлу."""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        f.seek(len(HTS_MAGIC) + middle * RECORD.size)
+        value, = _TIMESTAMP.unpack(f.read(_TIMESTAMP.size))
+        if value < hour_ts:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _timestamp(text: Optional[str]) -> Optional[int]:
+    """Разбирает дату ISO 8601; без часового пояса считается UTC."""
+    if not text:
+        return None
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def _format(hour_ts: int) -> str:
+    return datetime.fromtimestamp(hour_ts, timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сводки по сохранённым почасовым прогнозам")
+    parser.add_argument('directory', help="папка с рядами прогнозов")
+    parser.add_argument('--from', dest='start', help="начало диапазона, ISO 8601 (UTC)")
+    parser.add_argument('--to', dest='end', help="конец диапазона, ISO 8601 (UTC), не включительно")
+    parser.add_argument('--min-mm', type=float, default=0.1, help="осадков в час для промежутков с осадками, мм")
+    parser.add_argument('--min-hours', type=int, default=1, help="наименьшая длина промежутка с осадками, ч")
+    args = parser.parse_args()
+
+    try:
+        start, end = _timestamp(args.start), _timestamp(args.end)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return
+
+    store = TimeSeriesStore(args.directory)
+    for (lat, lon), summary in store.summaries(start, end).items():
+        print(f"{lat:.4f}, {lon:.4f}: {summary.hours} ч, от {summary.min_temp:g} до {summary.max_temp:g} °C "
+              f"(в среднем {summary.mean_temp:g}), осадки {summary.total_prec_mm:g} мм за {summary.wet_hours} ч")
+        for window in store.precipitation_windows(lat, lon, start, end, args.min_mm, args.min_hours):
+            print(f"    осадки {_format(window.start)} - {_format(window.end)} UTC: {window.total_mm:g} мм")
+
+
+if __name__ == '__main__':
+    main()